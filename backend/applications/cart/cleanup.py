@@ -0,0 +1,98 @@
+"""
+Purga de carritos abandonados y sesiones expiradas.
+
+Recorre la tabla por rangos de primary key acotados: cada rango es una
+transacción corta que bloquea solo los carritos viejos que encuentra
+(saltando los que estén en uso) y borra sus items y los carritos. Entre
+lotes se duerme un momento para no saturar la réplica.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+
+def stale_carts(anonymous_days=None, inactive_days=None, now=None):
+    """
+    Carritos anónimos sin actividad en `anonymous_days` y carritos de
+    usuario ya desactivados hace más de `inactive_days`. La actividad
+    considera también el último item agregado (agregar no toca updated_at).
+    """
+    now = now or timezone.now()
+    anonymous_cutoff = now - timedelta(days=settings.CART_ANONYMOUS_TTL_DAYS if anonymous_days is None else anonymous_days)
+    inactive_cutoff = now - timedelta(days=settings.CART_INACTIVE_TTL_DAYS if inactive_days is None else inactive_days)
+    recent_items = CartItem.objects.filter(
+        cart=OuterRef('pk'),
+        added_at__gte=anonymous_cutoff,
+    )
+    return Cart.objects.filter(
+        Q(user__isnull=True, updated_at__lt=anonymous_cutoff)
+        | Q(user__isnull=False, is_active=False, updated_at__lt=inactive_cutoff)
+    ).exclude(Exists(recent_items))
+
+
+@transaction.atomic
+def _purge_range(candidates, start, end):
+    ids = list(
+        candidates.filter(pk__gte=start, pk__lt=end)
+        .select_for_update(skip_locked=True)
+        .values_list('pk', flat=True)
+    )
+    if not ids:
+        return 0
+    CartItem.objects.filter(cart_id__in=ids).delete()
+    Cart.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def purge_stale_carts(anonymous_days=None, inactive_days=None, batch_size=None, pause=None, log=None):
+    """
+    Borra los carritos viejos (con sus items) por rangos de `batch_size`
+    ids. Retorna la cantidad de carritos eliminados.
+    """
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+    pause = settings.CART_PURGE_SLEEP if pause is None else pause
+    candidates = stale_carts(anonymous_days, inactive_days)
+    bounds = Cart.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+
+    deleted = 0
+    start = bounds['first']
+    while start <= bounds['last']:
+        end = start + batch_size
+        removed = _purge_range(candidates, start, end)
+        deleted += removed
+        if log:
+            log(end - 1, bounds['last'], deleted)
+        if removed and pause:
+            time.sleep(pause)
+        start = end
+    return deleted
+
+
+def purge_expired_sessions(batch_size=None, pause=None, log=None):
+    """
+    Equivalente por lotes de `clearsessions` para el backend de base de datos
+    """
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+    pause = settings.CART_PURGE_SLEEP if pause is None else pause
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(pk__in=keys, expire_date__lt=timezone.now()).delete()[0]
+        if log:
+            log(deleted)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from applications.cart.cleanup import purge_expired_sessions, purge_stale_carts
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes los carritos abandonados y las sesiones expiradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anonymous-days', type=int, default=None, help='Antigüedad de carritos anónimos (CART_ANONYMOUS_TTL_DAYS)')
+        parser.add_argument('--inactive-days', type=int, default=None, help='Antigüedad de carritos desactivados (CART_INACTIVE_TTL_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Ids por lote (CART_PURGE_BATCH_SIZE)')
+        parser.add_argument('--sleep', type=float, default=None, help='Segundos de pausa entre lotes (CART_PURGE_SLEEP)')
+        parser.add_argument('--skip-sessions', action='store_true', help='No purgar sesiones expiradas')
+
+    def handle(self, *args, **options):
+        def log_carts(position, last, deleted):
+            self.stdout.write(f'  Carritos: id {position}/{last}, {deleted} eliminados')
+
+        carts = purge_stale_carts(
+            anonymous_days=options['anonymous_days'],
+            inactive_days=options['inactive_days'],
+            batch_size=options['batch_size'],
+            pause=options['sleep'],
+            log=log_carts if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ {carts} carritos eliminados'))
+
+        if not options['skip_sessions']:
+            sessions = purge_expired_sessions(batch_size=options['batch_size'], pause=options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f'✓ {sessions} sesiones expiradas eliminadas'))
@@ -1,7 +1,35 @@
 from django.db import models
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, When, Window
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
-from applications.products.models import Product
+from django.utils.functional import cached_property
+from applications.products.models import Product, ProductImage
+from applications.orders.pricing import ZERO, line_subtotal, quote, to_money
+
+# Columnas del producto que necesita una línea del carrito
+CART_PRODUCT_FIELDS = ('name', 'slug', 'sku', 'price', 'discount_price', 'stock')
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+def unit_price_expression(prefix='product__'):
+    """Precio final en SQL (equivalente a Product.final_price)"""
+    discount = F(f'{prefix}discount_price')
+    return Case(
+        When(Q(**{f'{prefix}discount_price__isnull': False}) & ~Q(**{f'{prefix}discount_price': 0}), then=discount),
+        default=F(f'{prefix}price'),
+        output_field=MONEY,
+    )
+
+def cart_totals(cart_id):
+    """Totales del carrito calculados en una sola consulta de agregación"""
+    totals = CartItem.objects.filter(cart_id=cart_id).aggregate(
+        total_price=Coalesce(Sum(unit_price_expression() * F('quantity'), output_field=MONEY), ZERO, output_field=MONEY),
+        total_items=Coalesce(Sum('quantity'), 0),
+        item_count=Count('pk'),
+    )
+    totals['total_price'] = to_money(totals['total_price'])
+    return totals
 
 class Cart(models.Model):
     """Carrito de compras"""
@@ -25,18 +53,60 @@ class Cart(models.Model):
             return f"Carrito de {self.user.username}"
         return f"Carrito anónimo ({self.session_id})"
 
+    @cached_property
+    def lines(self):
+        """Items con su producto resumido y los totales del carrito, en una consulta"""
+        return list(CartItem.objects.filter(cart_id=self.pk).for_summary())
+
+    def totals(self):
+        if 'lines' in self.__dict__:
+            if not self.lines:
+                return {'total_price': to_money(ZERO), 'total_items': 0, 'item_count': 0}
+            first = self.lines[0]
+            return {
+                'total_price': to_money(first.cart_total_price),
+                'total_items': first.cart_total_items,
+                'item_count': first.cart_item_count,
+            }
+        return cart_totals(self.pk)
+
+    def price_lines(self):
+        """Líneas (product_id, precio unitario, cantidad) para el motor de precios"""
+        return [(item.product_id, item.unit_price, item.quantity) for item in self.lines]
+
+    def quote(self, coupon=None):
+        return quote(self.price_lines(), coupon)
+
     @property
     def total_price(self):
-        total = sum(item.subtotal for item in self.items.all())
-        return round(total, 2)
+        return self.totals()['total_price']
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()['total_items']
 
     @property
     def item_count(self):
-        return self.items.count()
+        return self.totals()['item_count']
+
+class CartItemQuerySet(models.QuerySet):
+    def for_summary(self):
+        """
+        Carga solo las columnas del producto que usa el carrito, la ruta de
+        la imagen principal y los totales del carrito (funciones de ventana
+        sobre las mismas filas), todo en una única consulta.
+        """
+        primary_image = ProductImage.objects.filter(product=OuterRef('product_id'), is_primary=True)
+        line_total = unit_price_expression() * F('quantity')
+        return self.select_related('product').only(
+            'cart', 'quantity', 'added_at',
+            *[f'product__{field}' for field in CART_PRODUCT_FIELDS],
+        ).annotate(
+            primary_image_path=Subquery(primary_image.values('image')[:1]),
+            cart_total_price=Window(Sum(line_total, output_field=MONEY)),
+            cart_total_items=Window(Sum('quantity')),
+            cart_item_count=Window(Count('pk')),
+        )
 
 class CartItem(models.Model):
     """Item individual del carrito"""
@@ -45,6 +115,8 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)], verbose_name='Cantidad')
     added_at = models.DateTimeField(auto_now_add=True, verbose_name='Agregado')
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Item del Carrito'
         verbose_name_plural = 'Items del Carrito'
@@ -59,8 +131,7 @@ class CartItem(models.Model):
 
     @property
     def subtotal(self):
-        price = self.product.final_price
-        return round(price * self.quantity, 2)
+        return line_subtotal(self.product.final_price, self.quantity)
 
     @property
     def unit_price(self):
@@ -1,19 +1,21 @@
 from rest_framework import permissions
 
+from .tokens import request_cart_key
+
 class IsOwnerOfCart(permissions.BasePermission):
     """
     Permiso personalizado: El usuario solo puede acceder a su propio carrito.
     """
     def has_object_permission(self, request, view, obj):
         if request.user.is_authenticated:
-            return obj.user == request.user
-        # Para sesión anónima (carritos sin usuario asignado)
-        session_id = request.session.session_key
-        return obj.session_id == session_id
+            return obj.user_id == request.user.pk
+        # Carritos anónimos: la clave viene del token firmado (ver tokens.py)
+        key = request_cart_key(request)
+        return key is not None and obj.user_id is None and obj.session_id == key
 
 class IsOwnerOfWishlist(permissions.BasePermission):
     """
     Permiso personalizado: Solo el usuario dueño puede acceder a su wishlist.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return request.user.is_authenticated and obj.user_id == request.user.pk
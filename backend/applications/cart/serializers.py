@@ -1,11 +1,34 @@
 from rest_framework import serializers
+from django.db.models import Exists, OuterRef
 from .models import Cart, CartItem, Wishlist
-from applications.products.serializers import ProductListSerializer
-from applications.products.models import Product
+from applications.products.models import Product, ProductImage
+
+MAX_BATCH_OPERATIONS = 100
+
+class CartProductSerializer(serializers.ModelSerializer):
+    """
+    Producto resumido para las líneas del carrito. Usa solo columnas ya
+    cargadas por `CartItem.objects.for_summary()` (sin consultas extra).
+    """
+    final_price = serializers.ReadOnlyField()
+    is_in_stock = serializers.ReadOnlyField()
+    primary_image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'sku', 'price', 'discount_price', 'final_price', 'stock', 'is_in_stock', 'primary_image']
+
+    def get_primary_image(self, obj):
+        path = getattr(obj, 'primary_image_path', None)
+        if not path:
+            return None
+        url = ProductImage._meta.get_field('image').storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 class CartItemSerializer(serializers.ModelSerializer):
     """Serializer para items del carrito"""
-    product = ProductListSerializer(read_only=True)
+    product = CartProductSerializer(read_only=True)
     subtotal = serializers.ReadOnlyField()
     unit_price = serializers.ReadOnlyField()
 
@@ -14,32 +37,33 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'unit_price', 'subtotal', 'added_at']
         read_only_fields = ['added_at']
 
+    def to_representation(self, instance):
+        # La imagen principal viene anotada en la línea (ver for_summary)
+        instance.product.primary_image_path = getattr(instance, 'primary_image_path', None)
+        return super().to_representation(instance)
+
 class CartItemCreateSerializer(serializers.Serializer):
-    """Serializer para agregar productos"""
+    """
+    Serializer para agregar productos. Carga el producto una sola vez y
+    lo deja en `validated_data['product']` para la escritura.
+    """
     product_id = serializers.IntegerField(required=True)
     quantity = serializers.IntegerField(default=1, min_value=1)
 
-    def validate_product_id(self, value):
-        try:
-            Product.objects.get(id=value, is_active=True)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Producto no encontrado o inactivo.")
-        return value
-
     def validate_quantity(self, value):
         if value < 1:
             raise serializers.ValidationError("La cantidad debe ser al menos 1.")
         return value
 
     def validate(self, data):
-        try:
-            product = Product.objects.get(id=data['product_id'])
-            if data['quantity'] > product.stock:
-                raise serializers.ValidationError({
-                    "quantity": f"Stock insuficiente. Solo hay {product.stock} unidades."
-                })
-        except Product.DoesNotExist:
-            pass
+        product = Product.objects.filter(id=data['product_id'], is_active=True).first()
+        if product is None:
+            raise serializers.ValidationError({"product_id": "Producto no encontrado o inactivo."})
+        if data['quantity'] > product.stock:
+            raise serializers.ValidationError({
+                "quantity": f"Stock insuficiente. Solo hay {product.stock} unidades."
+            })
+        data['product'] = product
         return data
 
 class CartItemUpdateSerializer(serializers.ModelSerializer):
@@ -62,9 +86,29 @@ class CartItemUpdateSerializer(serializers.ModelSerializer):
             })
         return data
 
+class CartOperationSerializer(serializers.Serializer):
+    """Operación de /api/cart/batch/ (set con cantidad 0 elimina la línea)"""
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=0)
+
+    def validate(self, data):
+        if data['op'] == 'add' and data['quantity'] < 1:
+            raise serializers.ValidationError({"quantity": "La cantidad debe ser al menos 1."})
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    """Lista de operaciones aplicadas en una sola transacción"""
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, value):
+        if len(value) > MAX_BATCH_OPERATIONS:
+            raise serializers.ValidationError(f"Máximo {MAX_BATCH_OPERATIONS} operaciones por lote.")
+        return value
+
 class CartSerializer(serializers.ModelSerializer):
-    """Serializer completo del carrito"""
-    items = CartItemSerializer(many=True, read_only=True)
+    """Serializer completo del carrito (items y totales salen de `Cart.lines`)"""
+    items = CartItemSerializer(source='lines', many=True, read_only=True)
     total_price = serializers.ReadOnlyField()
     total_items = serializers.ReadOnlyField()
     item_count = serializers.ReadOnlyField()
@@ -81,8 +125,8 @@ class CartSerializer(serializers.ModelSerializer):
         return None
 
 class WishlistSerializer(serializers.ModelSerializer):
-    """Serializer para wishlist"""
-    product = ProductListSerializer(read_only=True)
+    """Serializer para wishlist (producto resumido, ver WishlistViewSet.get_queryset)"""
+    product = CartProductSerializer(read_only=True)
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
@@ -90,8 +134,12 @@ class WishlistSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'product', 'notes', 'added_at']
         read_only_fields = ['added_at']
 
+    def to_representation(self, instance):
+        instance.product.primary_image_path = getattr(instance, 'primary_image_path', None)
+        return super().to_representation(instance)
+
 class WishlistCreateSerializer(serializers.ModelSerializer):
-    """Serializer para crear wishlist"""
+    """Serializer para crear wishlist (producto y duplicado en una consulta)"""
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     product_id = serializers.IntegerField(write_only=True)
 
@@ -99,22 +147,28 @@ class WishlistCreateSerializer(serializers.ModelSerializer):
         model = Wishlist
         fields = ['user', 'product_id', 'notes']
 
-    def validate_product_id(self, value):
-        try:
-            Product.objects.get(id=value, is_active=True)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Producto no encontrado.")
-        return value
-
     def validate(self, data):
-        user = self.context['request'].user
-        product_id = data['product_id']
-        if Wishlist.objects.filter(user=user, product_id=product_id).exists():
+        already_added = Wishlist.objects.filter(user=data['user'], product=OuterRef('pk'))
+        product = (
+            Product.objects.filter(id=data['product_id'], is_active=True)
+            .annotate(in_wishlist=Exists(already_added))
+            .values('in_wishlist')
+            .first()
+        )
+        if product is None:
+            raise serializers.ValidationError({"product_id": "Producto no encontrado."})
+        if product['in_wishlist']:
             raise serializers.ValidationError("Este producto ya está en tu lista de deseos.")
         return data
 
-    def create(self, validated_data):
-        product_id = validated_data.pop('product_id')
-        product = Product.objects.get(id=product_id)
-        wishlist_item = Wishlist.objects.create(product=product, **validated_data)
-        return wishlist_item
+class WishlistBulkSerializer(serializers.Serializer):
+    """Ids de productos para las operaciones masivas de la wishlist"""
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=MAX_BATCH_OPERATIONS
+    )
+
+class WishlistMoveSerializer(serializers.Serializer):
+    """Sin `product_ids` se mueve toda la wishlist"""
+    product_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=MAX_BATCH_OPERATIONS
+    )
@@ -0,0 +1,419 @@
+"""
+Almacenamiento del carrito.
+
+`CartViewSet` no toca los modelos directamente sino un backend con la
+misma interfaz (`load`, `get_line`, `add`, `set_quantity`, `remove`,
+`clear`, `totals`, `quantities`, `write`, `discard`):
+
+- `DatabaseCartStorage`: tablas Cart/CartItem (usuarios autenticados).
+- `CacheCartStorage`: carritos anónimos en la caché de Django; no escribe
+  en la base hasta que el carrito se fusiona al iniciar sesión
+  (`utils.merge_carts`).
+
+El backend de los carritos anónimos se elige con CART_ANONYMOUS_STORAGE y
+la clave del carrito anónimo sale del token firmado (tokens.py).
+
+Cada backend expone `locked()`, que serializa las escrituras de un mismo
+carrito entre requests: la fila de Cart con SELECT ... FOR UPDATE en la
+base y una clave de bloqueo con TTL corto en la caché.
+"""
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from applications.orders.pricing import ZERO, line_subtotal, to_money
+from applications.products.models import Product, ProductImage
+from .models import CART_PRODUCT_FIELDS, Cart, CartItem, cart_totals
+from .tokens import anonymous_cart_key
+
+
+class CartBusy(APIException):
+    """Otro request retiene el carrito por más de CART_LOCK_WAIT segundos"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El carrito se está actualizando, intenta de nuevo.'
+    default_code = 'cart_busy'
+
+
+def get_cart_storage(request):
+    """
+    Backend del carrito del request: base de datos para usuarios
+    autenticados y CART_ANONYMOUS_STORAGE para visitantes.
+    """
+    if request.user.is_authenticated:
+        return DatabaseCartStorage(user=request.user)
+    return anonymous_storage(anonymous_cart_key(request))
+
+
+def anonymous_storage(key):
+    return import_string(settings.CART_ANONYMOUS_STORAGE)(key=key)
+
+
+def add_to_cart(cart, product, quantity):
+    """
+    Agrega `quantity` unidades con un único INSERT ... ON CONFLICT que suma
+    sobre la cantidad existente, sin leer antes el item (evita carreras con
+    unique_together). La suma solo se aplica si no supera el stock.
+    Retorna (item_id, cantidad, creado) o None si no hay stock suficiente.
+    """
+    table = CartItem._meta.db_table
+    sql = f"""
+        INSERT INTO {table} (cart_id, product_id, quantity, added_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (cart_id, product_id) DO UPDATE
+            SET quantity = {table}.quantity + EXCLUDED.quantity
+            WHERE {table}.quantity + EXCLUDED.quantity <= %s
+        RETURNING id, quantity, (xmax = 0)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [cart.pk, product.pk, quantity, timezone.now(), product.stock])
+        return cursor.fetchone()
+
+
+def merge_lines(cart, quantities):
+    """
+    Suma `quantities` ({product_id: cantidad}) al carrito con un único
+    INSERT ... SELECT ... ON CONFLICT. Las cantidades se limitan al stock
+    y se omiten productos inactivos, eliminados o sin stock.
+    Retorna los ids de los productos escritos.
+    """
+    if not quantities:
+        return []
+    table = CartItem._meta.db_table
+    products = Product._meta.db_table
+    values = ', '.join(['(%s::bigint, %s::integer)'] * len(quantities))
+    sql = f"""
+        INSERT INTO {table} (cart_id, product_id, quantity, added_at)
+        SELECT %s, p.id, LEAST(v.quantity, p.stock), %s
+        FROM (VALUES {values}) AS v (product_id, quantity)
+        JOIN {products} p ON p.id = v.product_id
+        WHERE p.is_active AND p.stock > 0
+        ON CONFLICT (cart_id, product_id) DO UPDATE
+            SET quantity = LEAST(
+                {table}.quantity + EXCLUDED.quantity,
+                (SELECT stock FROM {products} WHERE id = EXCLUDED.product_id)
+            )
+        RETURNING product_id
+    """
+    params = [cart.pk, timezone.now()]
+    for product_id, quantity in quantities.items():
+        params.extend([product_id, quantity])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class DatabaseCartStorage:
+    """Carrito en las tablas Cart/CartItem"""
+
+    def __init__(self, key=None, user=None):
+        self.key = key
+        self.user = user
+
+    @cached_property
+    def cart(self):
+        if self.user is not None:
+            cart, _ = Cart.objects.select_related('user').get_or_create(user=self.user, is_active=True)
+            return cart
+        cart, _ = Cart.objects.get_or_create(session_id=self.key, user=None, defaults={'is_active': True})
+        if not cart.is_active:
+            cart.is_active = True
+            cart.save(update_fields=['is_active', 'updated_at'])
+        return cart
+
+    @contextmanager
+    def locked(self):
+        """
+        Transacción con la fila del Cart bloqueada: las operaciones en lote
+        y los `add` del mismo carrito se serializan, incluso cuando insertan
+        líneas que todavía no existen.
+        """
+        with transaction.atomic():
+            list(Cart.objects.select_for_update().filter(pk=self.cart.pk).values_list('pk', flat=True))
+            yield
+
+    def load(self):
+        """Carrito listo para serializar (items y totales en `Cart.lines`)"""
+        return self.cart
+
+    def get_line(self, line_id):
+        return CartItem.objects.for_summary().filter(id=line_id, cart=self.cart).first()
+
+    def add(self, product, quantity):
+        """Retorna (línea, creada) o None si no hay stock suficiente"""
+        with self.locked():
+            added = add_to_cart(self.cart, product, quantity)
+        if added is None:
+            return None
+        item_id, _, created = added
+        return CartItem.objects.for_summary().get(pk=item_id), created
+
+    def set_quantity(self, line, quantity):
+        line.quantity = quantity
+        line.save(update_fields=['quantity'])
+
+    def remove(self, line_id):
+        """Elimina la línea y retorna el nombre del producto (o None)"""
+        line = CartItem.objects.select_related('product').only('product__name').filter(id=line_id, cart=self.cart).first()
+        if line is None:
+            return None
+        line.delete()
+        return line.product.name
+
+    def clear(self):
+        deleted, _ = CartItem.objects.filter(cart=self.cart).delete()
+        return deleted
+
+    def totals(self):
+        return cart_totals(self.cart.pk)
+
+    def quantities(self):
+        """{product_id: cantidad}; no crea el carrito"""
+        if self.user is not None:
+            items = CartItem.objects.filter(cart__user=self.user, cart__is_active=True)
+        else:
+            items = CartItem.objects.filter(cart__session_id=self.key, cart__user=None)
+        return dict(items.values_list('product_id', 'quantity'))
+
+    def write(self, quantities, removed):
+        """Fija cantidades absolutas con un upsert masivo y borra `removed`"""
+        if quantities:
+            now = timezone.now()
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(cart=self.cart, product_id=product_id, quantity=quantity, added_at=now)
+                    for product_id, quantity in quantities.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        if removed:
+            CartItem.objects.filter(cart=self.cart, product_id__in=removed).delete()
+
+    def discard(self):
+        Cart.objects.filter(session_id=self.key, user=None).delete()
+
+
+class CacheCartStorage:
+    """
+    Carrito anónimo guardado como un solo valor en la caché:
+    {'created_at', 'updated_at', 'items': {product_id: [cantidad, agregado]}}.
+    Las líneas usan el id del producto como id, y productos y precios se
+    leen de la base en una consulta al mostrarlas. Las escrituras leen,
+    modifican y guardan el valor completo dentro de `locked()`.
+    """
+
+    def __init__(self, key=None, user=None):
+        self.key = key
+        self.cache = caches[settings.CART_CACHE_ALIAS]
+        self._locked = False
+
+    @property
+    def cache_key(self):
+        return f'cart:anon:{self.key}'
+
+    @contextmanager
+    def locked(self):
+        """
+        Toma `cart:lock:<clave>` con `cache.add` (atómico en Redis y en
+        LocMem) y relee el carrito, así otro request no pisa los cambios
+        entre la lectura y el `set`. El TTL de CART_LOCK_TIMEOUT libera el
+        bloqueo si el proceso muere; tras CART_LOCK_WAIT se responde 409.
+        Reentrante en la misma instancia (apply_operations → write).
+        """
+        if self._locked:
+            yield
+            return
+        lock_key, token = f'cart:lock:{self.key}', uuid4().hex
+        deadline = time.monotonic() + settings.CART_LOCK_WAIT
+        while not self.cache.add(lock_key, token, settings.CART_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise CartBusy()
+            time.sleep(0.01)
+        self._locked = True
+        self.__dict__.pop('data', None)
+        try:
+            yield
+        finally:
+            self._locked = False
+            # Si el TTL venció, la clave puede ser ya de otro request
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    @cached_property
+    def data(self):
+        data = self.cache.get(self.cache_key)
+        if data is None:
+            now = timezone.now().isoformat()
+            data = {'created_at': now, 'updated_at': now, 'items': {}}
+        return data
+
+    def _save(self):
+        self.data['updated_at'] = timezone.now().isoformat()
+        self.cache.set(self.cache_key, self.data, settings.CART_ANONYMOUS_TTL_DAYS * 24 * 3600)
+
+    def _lines(self, product_ids):
+        """Arma CartItem sin guardar para las líneas pedidas (una consulta)"""
+        primary_image = ProductImage.objects.filter(product=OuterRef('pk'), is_primary=True)
+        products = (
+            Product.objects.filter(pk__in=product_ids, is_active=True)
+            .only(*CART_PRODUCT_FIELDS)
+            .annotate(primary_image_path=Subquery(primary_image.values('image')[:1]))
+        )
+        lines = []
+        for product in products:
+            quantity, added_at = self.data['items'][str(product.pk)]
+            line = CartItem(id=product.pk, product=product, quantity=quantity, added_at=parse_datetime(added_at))
+            line.primary_image_path = product.primary_image_path
+            lines.append(line)
+        lines.sort(key=lambda line: line.added_at, reverse=True)
+        return lines
+
+    def load(self):
+        lines = self._lines(list(self.data['items']))
+        totals = self._totals(lines)
+        for line in lines:
+            line.cart_total_price = totals['total_price']
+            line.cart_total_items = totals['total_items']
+            line.cart_item_count = totals['item_count']
+        cart = Cart(
+            session_id=self.key,
+            created_at=parse_datetime(self.data['created_at']),
+            updated_at=parse_datetime(self.data['updated_at']),
+        )
+        cart.lines = lines
+        return cart
+
+    def get_line(self, line_id):
+        if str(line_id) not in self.data['items']:
+            return None
+        lines = self._lines([line_id])
+        return lines[0] if lines else None
+
+    def add(self, product, quantity):
+        with self.locked():
+            items = self.data['items']
+            current = items.get(str(product.pk))
+            new_quantity = quantity + (current[0] if current else 0)
+            if new_quantity > product.stock:
+                return None
+            added_at = current[1] if current else timezone.now().isoformat()
+            items[str(product.pk)] = [new_quantity, added_at]
+            self._save()
+        return self._lines([product.pk])[0], current is None
+
+    def set_quantity(self, line, quantity):
+        line.quantity = quantity
+        with self.locked():
+            current = self.data['items'].get(str(line.pk))
+            added_at = current[1] if current else line.added_at.isoformat()
+            self.data['items'][str(line.pk)] = [quantity, added_at]
+            self._save()
+
+    def remove(self, line_id):
+        with self.locked():
+            if self.data['items'].pop(str(line_id), None) is None:
+                return None
+            self._save()
+        return Product.objects.filter(pk=line_id).values_list('name', flat=True).first()
+
+    def clear(self):
+        with self.locked():
+            count = len(self.data['items'])
+            self.data['items'] = {}
+            self._save()
+        return count
+
+    @staticmethod
+    def _totals(lines):
+        return {
+            'total_price': to_money(sum((line_subtotal(line.unit_price, line.quantity) for line in lines), ZERO)),
+            'total_items': sum(line.quantity for line in lines),
+            'item_count': len(lines),
+        }
+
+    def totals(self):
+        return self._totals(self._lines(list(self.data['items'])))
+
+    def quantities(self):
+        return {int(product_id): quantity for product_id, (quantity, _) in self.data['items'].items()}
+
+    def write(self, quantities, removed):
+        with self.locked():
+            items = self.data['items']
+            now = timezone.now().isoformat()
+            for product_id, quantity in quantities.items():
+                current = items.get(str(product_id))
+                items[str(product_id)] = [quantity, current[1] if current else now]
+            for product_id in removed:
+                items.pop(str(product_id), None)
+            self._save()
+
+    def discard(self):
+        self.cache.delete(self.cache_key)
+        self.__dict__.pop('data', None)
+
+
+def apply_operations(storage, operations):
+    """
+    Aplica una lista de operaciones ({'op': add|set|remove, 'product_id',
+    'quantity'}) en orden. Valida todos los productos con una consulta y
+    escribe el resultado final de una vez con el carrito bloqueado
+    (`storage.locked()`), así ningún `add` concurrente se pierde entre la
+    lectura y la escritura; una operación inválida se informa y no afecta
+    a las demás.
+    Retorna la lista de resultados por operación.
+    """
+    products = Product.objects.filter(
+        pk__in={operation['product_id'] for operation in operations}, is_active=True
+    ).only('name', 'stock').in_bulk()
+
+    with storage.locked():
+        current = storage.quantities()
+        quantities = dict(current)
+        results = []
+        for index, operation in enumerate(operations):
+            product_id = operation['product_id']
+            product = products.get(product_id)
+            result = {'index': index, 'op': operation['op'], 'product_id': product_id}
+            results.append(result)
+            if product is None:
+                result.update(status='error', error='Producto no encontrado o inactivo.')
+                continue
+
+            existing = quantities.get(product_id, 0)
+            if operation['op'] == 'add':
+                quantity = existing + operation['quantity']
+            elif operation['op'] == 'set':
+                quantity = operation['quantity']
+            else:
+                quantity = 0
+            if quantity > product.stock:
+                result.update(status='error', error=f"Stock insuficiente. Solo hay {product.stock} unidades.")
+                continue
+            if operation['op'] == 'remove' and product_id not in quantities:
+                result.update(status='error', error='Item no encontrado.')
+                continue
+
+            if quantity:
+                quantities[product_id] = quantity
+            else:
+                quantities.pop(product_id, None)
+            result.update(status='ok', quantity=quantity)
+
+        changed = {pid: qty for pid, qty in quantities.items() if current.get(pid) != qty}
+        removed = set(current) - set(quantities)
+        if changed or removed:
+            storage.write(changed, removed)
+    return results
@@ -1,12 +1,34 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Cart, CartItem
-from applications.products.models import Product
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from applications.orders.models import Coupon, Order
+from .cleanup import purge_expired_sessions, purge_stale_carts
+from .storage import DatabaseCartStorage, anonymous_storage, apply_operations
+from .tokens import parse_cart_token
+from .models import Cart, CartItem, Wishlist
+from .utils import merge_carts
+from applications.products.models import Category, Product
+
+# Los tests del backend en caché lo fijan explícitamente: sin REDIS_URL el
+# default es DatabaseCartStorage
+CACHE_STORAGE = 'applications.cart.storage.CacheCartStorage'
 
 class CartModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='test', password='pass')
-        self.product = Product.objects.create(name="Mesa", price=100, stock=10, is_active=True)
+        self.category = Category.objects.create(name="Mesas")
+        self.product = Product.objects.create(
+            name="Mesa", sku="MES-001", description="Mesa", category=self.category,
+            price=100, stock=10, is_active=True
+        )
         self.cart = Cart.objects.create(user=self.user)
     
     def test_add_item_cart(self):
@@ -18,3 +40,312 @@ class CartModelTest(TestCase):
         item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
         item.delete()
         self.assertEqual(self.cart.items.count(), 0)
+
+class CartQuoteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='quote', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Sillas")
+        product = Product.objects.create(
+            name="Silla", sku="SIL-001", description="Silla", category=category,
+            price=50, discount_price=40, stock=10, is_active=True
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=product, quantity=2)
+        Coupon.objects.create(code='MENOS5', discount_type='amount', discount_value=5)
+
+    def test_quote_prices_cart_without_orders(self):
+        response = self.client.get('/api/cart/quote/', {'coupon_code': 'MENOS5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['subtotal'], '80.00')
+        self.assertEqual(response.data['tax'], '14.40')
+        self.assertEqual(response.data['discount'], '5.00')
+        self.assertEqual(response.data['total'], '99.40')
+        self.assertEqual(response.data['lines'][0]['unit_price'], '40.00')
+        self.assertTrue(response.data['coupon_valid'])
+        self.assertFalse(Order.objects.exists())
+
+class CartApiMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='resumen', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name="Mesas")
+        self.products = [
+            Product.objects.create(
+                name=f"Mesa {i}", sku=f"MES-{i:03d}", description="Mesa", category=category,
+                price=100, discount_price=80 if i % 2 else None, stock=10, is_active=True
+            )
+            for i in range(5)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+
+    def count(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return len(ctx.captured_queries), response
+
+class CartSummaryTest(CartApiMixin, TestCase):
+    def test_cart_read_is_constant_and_slim(self):
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        single, _ = self.count('get', '/api/cart/')
+        for product in self.products[1:]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        many, response = self.count('get', '/api/cart/')
+        self.assertEqual(single, many)
+        self.assertEqual(response.data['total_price'], Decimal('820.00'))
+        self.assertEqual(response.data['total_items'], 9)
+        self.assertEqual(response.data['item_count'], 5)
+        self.assertNotIn('category', response.data['items'][0]['product'])
+
+    def test_mutations_are_constant(self):
+        first = CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        counts = [
+            self.count('patch', f'/api/cart/{first.pk}/update/', {'quantity': 2})[0],
+            self.count('delete', f'/api/cart/{first.pk}/remove/')[0],
+            self.count('post', '/api/cart/items/', {'product_id': self.products[0].pk, 'quantity': 1})[0],
+        ]
+        for product in self.products[1:]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        second = CartItem.objects.get(cart=self.cart, product=self.products[0])
+        _, response = self.count('patch', f'/api/cart/{second.pk}/update/', {'quantity': 3})
+        self.assertEqual(response.data['cart_total'], Decimal('660.00'))
+        self.assertEqual(counts, [
+            self.count('patch', f'/api/cart/{second.pk}/update/', {'quantity': 2})[0],
+            self.count('delete', f'/api/cart/{second.pk}/remove/')[0],
+            self.count('post', '/api/cart/items/', {'product_id': self.products[0].pk, 'quantity': 1})[0],
+        ])
+
+    def test_add_item_upserts_quantity_within_stock(self):
+        url = '/api/cart/items/'
+        payload = {'product_id': self.products[0].pk, 'quantity': 4}
+        _, response = self.count('post', url, payload)
+        self.assertEqual(response.data['message'], 'Producto agregado al carrito')
+        _, response = self.count('post', url, payload)
+        self.assertEqual(response.data['message'], 'Cantidad actualizada')
+        self.assertEqual(response.data['item']['quantity'], 8)
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 8)
+
+class CartBatchTest(CartApiMixin, TestCase):
+    def test_batch_applies_operations_with_constant_queries(self):
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.products[1], quantity=1)
+        operations = [
+            {'op': 'add', 'product_id': self.products[0].pk, 'quantity': 2},
+            {'op': 'remove', 'product_id': self.products[1].pk},
+            {'op': 'set', 'product_id': self.products[2].pk, 'quantity': 4},
+            {'op': 'add', 'product_id': self.products[3].pk, 'quantity': 11},
+            {'op': 'add', 'product_id': 999999},
+        ]
+        _, response = self.count('post', '/api/cart/batch/', {'operations': operations})
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['ok', 'ok', 'ok', 'error', 'error'])
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity')),
+            {self.products[0].pk: 3, self.products[2].pk: 4},
+        )
+        self.assertEqual(response.data['cart']['total_items'], 7)
+
+        single, _ = self.count('post', '/api/cart/batch/', {'operations': operations[:1]})
+        many, _ = self.count('post', '/api/cart/batch/', {'operations': [
+            {'op': 'set', 'product_id': product.pk, 'quantity': 1} for product in self.products
+        ]})
+        self.assertEqual(single, many)
+
+    @override_settings(CART_ANONYMOUS_STORAGE=CACHE_STORAGE)
+    def test_batch_on_anonymous_cache_cart(self):
+        client = APIClient()
+        response = client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': product.pk, 'quantity': 1} for product in self.products[:3]
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cart']['item_count'], 3)
+        self.assertFalse(CartItem.objects.exists())
+
+class CartBatchConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lote', password='pass')
+        category = Category.objects.create(name="Mesas")
+        self.product = Product.objects.create(
+            name="Mesa", sku="MES-001", description="Mesa", category=category,
+            price=100, stock=10, is_active=True
+        )
+
+    def run_batch_with_concurrent_add(self, storage, concurrent):
+        """
+        Corre un lote que suma 2 unidades y, entre su lectura y su escritura,
+        lanza en otro hilo un `add` de 1 unidad del mismo producto.
+        """
+        def add():
+            try:
+                concurrent.add(self.product, 1)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=add)
+        read = storage.quantities
+
+        def quantities():
+            current = read()
+            thread.start()
+            thread.join(0.5)  # con el carrito bloqueado el add sigue esperando
+            return current
+
+        storage.quantities = quantities
+        apply_operations(storage, [{'op': 'add', 'product_id': self.product.pk, 'quantity': 2}])
+        thread.join()
+
+    def test_database_batch_serializes_with_add(self):
+        Cart.objects.create(user=self.user)
+        self.run_batch_with_concurrent_add(DatabaseCartStorage(user=self.user), DatabaseCartStorage(user=self.user))
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 3)
+
+    @override_settings(CART_ANONYMOUS_STORAGE=CACHE_STORAGE)
+    def test_cache_batch_serializes_with_add(self):
+        self.run_batch_with_concurrent_add(anonymous_storage('lote'), anonymous_storage('lote'))
+        self.assertEqual(anonymous_storage('lote').quantities(), {self.product.pk: 3})
+
+class WishlistBulkTest(CartApiMixin, TestCase):
+    def test_bulk_add_list_and_remove(self):
+        ids = [product.pk for product in self.products]
+        _, response = self.count('post', '/api/cart/wishlist/bulk-add/', {'product_ids': ids[:2]})
+        self.assertEqual(response.data['added'], 2)
+        _, response = self.count('post', '/api/cart/wishlist/bulk-add/', {'product_ids': ids + [999999]})
+        self.assertEqual(response.data['added'], 3)
+        self.assertEqual(response.data['skipped'], ids[:2] + [999999])
+
+        listed, response = self.count('get', '/api/cart/wishlist/')
+        self.assertEqual(response.data['count'], 5)
+        self.assertNotIn('category', response.data['results'][0]['product'])
+        Wishlist.objects.filter(product__in=self.products[1:]).delete()
+        single, _ = self.count('get', '/api/cart/wishlist/')
+        self.assertEqual(listed, single)
+
+        _, response = self.count('post', '/api/cart/wishlist/bulk-remove/', {'product_ids': ids})
+        self.assertEqual(response.data['removed'], 1)
+
+    def test_move_all_to_cart_clamps_stock(self):
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=10)
+        Product.objects.filter(pk=self.products[1].pk).update(stock=0)
+        for product in self.products[:3]:
+            Wishlist.objects.create(user=self.user, product=product)
+        _, response = self.count('post', '/api/cart/wishlist/move-to-cart/', {})
+        self.assertEqual(sorted(response.data['moved']), [self.products[0].pk, self.products[2].pk])
+        self.assertEqual(response.data['skipped'], [self.products[1].pk])
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity')),
+            {self.products[0].pk: 10, self.products[2].pk: 1},
+        )
+        self.assertEqual(list(Wishlist.objects.values_list('product_id', flat=True)), [self.products[1].pk])
+
+@override_settings(CART_ANONYMOUS_STORAGE=CACHE_STORAGE)
+class AnonymousCacheCartTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Mesas")
+        self.product = Product.objects.create(
+            name="Mesa", sku="MES-001", description="Mesa", category=category,
+            price=100, discount_price=90, stock=10, is_active=True
+        )
+        self.client = APIClient()
+
+    def test_anonymous_cart_lives_in_cache_until_merge(self):
+        response = self.client.post('/api/cart/items/', {'product_id': self.product.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['cart_total'], Decimal('180.00'))
+        token = response['X-Cart-Token']
+        line_id = response.data['item']['id']
+        response = self.client.patch(f'/api/cart/{line_id}/update/', {'quantity': 3}, format='json')
+        self.assertEqual(response.data['item']['quantity'], 3)
+
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['total_items'], 3)
+        self.assertEqual(response.data['items'][0]['product']['name'], 'Mesa')
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        user = User.objects.create_user(username='cliente', password='pass')
+        cart, _ = merge_carts(user, parse_cart_token(token))
+        self.assertEqual(list(cart.items.values_list('product_id', 'quantity')), [(self.product.pk, 3)])
+        self.assertEqual(self.client.get('/api/cart/').data['item_count'], 0)
+
+    @override_settings(CART_ANONYMOUS_STORAGE='applications.cart.storage.DatabaseCartStorage')
+    def test_database_backend_for_anonymous_carts(self):
+        response = self.client.post('/api/cart/items/', {'product_id': self.product.pk, 'quantity': 1}, format='json')
+        self.assertEqual(CartItem.objects.get().cart.session_id, parse_cart_token(response['X-Cart-Token']))
+
+    def test_signed_token_replaces_sessions(self):
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('cart_token', response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+        response = self.client.post('/api/cart/items/', {'product_id': self.product.pk}, format='json')
+        self.assertIn('cart_token', response.cookies)
+        self.assertEqual(self.client.get('/api/cart/').data['total_items'], 1)
+        self.assertFalse(Session.objects.exists())
+
+        header = APIClient(HTTP_X_CART_TOKEN=response['X-Cart-Token'])
+        self.assertEqual(header.get('/api/cart/').data['total_items'], 1)
+        tampered = APIClient(HTTP_X_CART_TOKEN=response['X-Cart-Token'][:-1] + 'x')
+        self.assertEqual(tampered.get('/api/cart/').data['total_items'], 0)
+
+    def test_interleaved_adds_keep_both_quantities(self):
+        first, second = anonymous_storage('compartido'), anonymous_storage('compartido')
+        # Los dos requests leyeron el carrito vacío antes de escribir
+        self.assertEqual(first.quantities(), {})
+        self.assertEqual(second.quantities(), {})
+        first.add(self.product, 1)
+        second.add(self.product, 2)
+        self.assertEqual(anonymous_storage('compartido').quantities(), {self.product.pk: 3})
+
+    @override_settings(CART_LOCK_WAIT=0)
+    def test_locked_cart_answers_conflict(self):
+        response = self.client.post('/api/cart/items/', {'product_id': self.product.pk}, format='json')
+        with anonymous_storage(parse_cart_token(response['X-Cart-Token'])).locked():
+            response = self.client.post('/api/cart/items/', {'product_id': self.product.pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.get('/api/cart/').data['total_items'], 1)
+
+class CartPurgeTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Mesas")
+        self.product = Product.objects.create(
+            name="Mesa", sku="MES-001", description="Mesa", category=category,
+            price=100, stock=10, is_active=True
+        )
+        self.user = User.objects.create_user(username='purge', password='pass')
+        old = timezone.now() - timedelta(days=120)
+        self.abandoned = [Cart.objects.create(session_id=f'viejo-{i}') for i in range(5)]
+        for cart in self.abandoned:
+            CartItem.objects.create(cart=cart, product=self.product)
+        self.revived = Cart.objects.create(session_id='revivido')
+        self.fresh = Cart.objects.create(session_id='nuevo')
+        self.closed = Cart.objects.create(user=self.user, is_active=False)
+        self.current = Cart.objects.create(user=self.user)
+        Cart.objects.exclude(pk=self.fresh.pk).update(updated_at=old)
+        CartItem.objects.update(added_at=old)
+        CartItem.objects.create(cart=self.revived, product=self.product)
+
+    def test_purges_only_stale_carts_in_batches(self):
+        progress = []
+        deleted = purge_stale_carts(batch_size=2, pause=0, log=lambda *args: progress.append(args))
+        self.assertEqual(deleted, 6)
+        self.assertEqual(
+            set(Cart.objects.values_list('pk', flat=True)),
+            {self.revived.pk, self.fresh.pk, self.current.pk},
+        )
+        self.assertEqual(CartItem.objects.count(), 1)
+        self.assertGreater(len(progress), 3)
+
+    def test_purges_expired_sessions(self):
+        for _ in range(3):
+            SessionStore().create()
+        Session.objects.update(expire_date=timezone.now() - timedelta(days=1))
+        live = SessionStore()
+        live.create()
+        self.assertEqual(purge_expired_sessions(batch_size=2, pause=0), 3)
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), [live.session_key])
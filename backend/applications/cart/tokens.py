@@ -0,0 +1,71 @@
+"""
+Identidad de carritos anónimos sin sesión de Django.
+
+El visitante lleva un token `v1.<clave>:<firma>` (HMAC de SECRET_KEY vía
+django.core.signing) en la cookie CART_TOKEN_COOKIE o en la cabecera
+CART_TOKEN_HEADER. Leerlo no toca la base: no se crea una fila en
+django_session por cada visitante o bot. La clave identifica el carrito
+en el backend anónimo (`Cart.session_id` o la clave de caché).
+"""
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+TOKEN_VERSION = 'v1'
+TOKEN_SALT = 'applications.cart.tokens'
+
+
+def issue_cart_token():
+    """Genera una clave nueva y su token firmado"""
+    key = uuid.uuid4().hex
+    return key, signing.Signer(salt=TOKEN_SALT).sign(f'{TOKEN_VERSION}.{key}')
+
+
+def parse_cart_token(token):
+    """Clave del carrito si el token es válido y de la versión actual, o None"""
+    if not token:
+        return None
+    try:
+        value = signing.Signer(salt=TOKEN_SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    version, _, key = value.partition('.')
+    if version != TOKEN_VERSION or not key:
+        return None
+    return key
+
+
+def request_cart_key(request):
+    """Clave del carrito anónimo enviada en la cabecera o la cookie (o None)"""
+    token = request.headers.get(settings.CART_TOKEN_HEADER) or request.COOKIES.get(settings.CART_TOKEN_COOKIE)
+    return parse_cart_token(token)
+
+
+def anonymous_cart_key(request):
+    """
+    Clave del carrito anónimo del request. Si no trae un token válido se
+    emite uno nuevo y queda en `request.issued_cart_token` para que la
+    vista lo devuelva.
+    """
+    key = request_cart_key(request)
+    if key is None:
+        key, request.issued_cart_token = issue_cart_token()
+    return key
+
+
+def attach_cart_token(request, response):
+    """Devuelve el token recién emitido (cookie y cabecera) si hubo escritura"""
+    token = getattr(request, 'issued_cart_token', None)
+    if not token or request.method in ('GET', 'HEAD', 'OPTIONS'):
+        return response
+    response[settings.CART_TOKEN_HEADER] = token
+    response.set_cookie(
+        settings.CART_TOKEN_COOKIE,
+        token,
+        max_age=settings.CART_ANONYMOUS_TTL_DAYS * 24 * 3600,
+        httponly=True,
+        samesite='Lax',
+        secure=not settings.DEBUG,
+    )
+    return response
@@ -11,5 +11,7 @@ urlpatterns = [
     path('<int:pk>/update/', CartViewSet.as_view({'put': 'update_item', 'patch': 'update_item'}), name='cart-update-item'),
     path('<int:pk>/remove/', CartViewSet.as_view({'delete': 'remove_item'}), name='cart-remove-item'),
     path('clear/', CartViewSet.as_view({'delete': 'clear_cart'}), name='cart-clear'),
+    path('batch/', CartViewSet.as_view({'post': 'batch'}), name='cart-batch'),
+    path('quote/', CartViewSet.as_view({'get': 'quote'}), name='cart-quote'),
     path('', include(router.urls)),
 ]
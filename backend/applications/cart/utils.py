@@ -1,46 +1,51 @@
-from .models import Cart, CartItem
+from django.db import transaction
+
+from .models import Wishlist
+from .storage import DatabaseCartStorage, anonymous_storage, get_cart_storage, merge_lines
 
 def get_or_create_cart(request):
     """
-    Obtiene o crea un carrito según si está autenticado o es anónimo.
+    Obtiene o crea el carrito del request a través de su backend de
+    almacenamiento (base de datos o caché para anónimos).
+    """
+    return get_cart_storage(request).load()
+
+@transaction.atomic
+def merge_carts(user, cart_key):
+    """
+    Fusiona un carrito anónimo (de cualquier backend, identificado por la
+    clave de su token) con el del usuario
+    en una transacción: un upsert masivo de todas las líneas (limitadas al
+    stock) y un borrado del carrito anónimo. Es el momento en que un
+    carrito anónimo en caché llega a la base.
+    Retorna (carrito del usuario, líneas fusionadas); el carrito es None
+    si no había nada que fusionar.
     """
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(
-            user=request.user,
-            is_active=True
-        )
-    else:
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.create()
-            session_id = request.session.session_key
-        cart, created = Cart.objects.get_or_create(
-            session_id=session_id,
-            is_active=True
-        )
-    return cart
+    anonymous = anonymous_storage(cart_key)
+    quantities = anonymous.quantities()
+    if not quantities:
+        return None, 0
+    user_cart = DatabaseCartStorage(user=user).cart
+    merged = merge_lines(user_cart, quantities)
+    anonymous.discard()
+    return user_cart, len(merged)
 
-def merge_carts(user, session_id):
+@transaction.atomic
+def move_wishlist_to_cart(user, product_ids=None):
     """
-    Fusiona un carrito anónimo con el del usuario.
-    Se puede llamar tras login para juntar ambos carritos.
+    Mueve productos de la wishlist (todos si `product_ids` es None) al
+    carrito: un upsert masivo que suma una unidad limitada al stock y un
+    único borrado de los que entraron al carrito. Los productos sin stock
+    o inactivos quedan en la wishlist.
+    Retorna (ids movidos, ids que quedaron).
     """
-    try:
-        user_cart = Cart.objects.get(user=user, is_active=True)
-    except Cart.DoesNotExist:
-        user_cart = Cart.objects.create(user=user, is_active=True)
-    try:
-        anon_cart = Cart.objects.get(session_id=session_id, is_active=True, user__isnull=True)
-        for item in anon_cart.items.all():
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=user_cart,
-                product=item.product,
-                defaults={'quantity': item.quantity}
-            )
-            if not created:
-                cart_item.quantity += item.quantity
-                cart_item.save()
-        anon_cart.delete()
-    except Cart.DoesNotExist:
-        pass
-    return user_cart
+    wishlist = Wishlist.objects.filter(user=user)
+    if product_ids is not None:
+        wishlist = wishlist.filter(product_id__in=product_ids)
+    wanted = list(wishlist.select_for_update().values_list('product_id', flat=True))
+    if not wanted:
+        return [], []
+    moved = merge_lines(DatabaseCartStorage(user=user).cart, dict.fromkeys(wanted, 1))
+    if moved:
+        Wishlist.objects.filter(user=user, product_id__in=moved).delete()
+    return moved, [product_id for product_id in wanted if product_id not in set(moved)]
@@ -3,14 +3,20 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Prefetch
-from .models import Cart, CartItem, Wishlist
+from django.db.models import Exists, OuterRef, Subquery
+from applications.monitoring.mixins import InstrumentedViewMixin
+from .models import CART_PRODUCT_FIELDS, Wishlist
+from .storage import DatabaseCartStorage, apply_operations, get_cart_storage
+from .tokens import attach_cart_token
 from .serializers import (
-    CartSerializer, CartItemSerializer, CartItemCreateSerializer,
-    CartItemUpdateSerializer, WishlistSerializer, WishlistCreateSerializer
+    CartSerializer, CartItemSerializer, CartItemCreateSerializer, CartBatchSerializer,
+    CartItemUpdateSerializer, WishlistSerializer, WishlistCreateSerializer,
+    WishlistBulkSerializer, WishlistMoveSerializer
 )
 from drf_spectacular.utils import extend_schema
-from applications.products.models import Product
+from applications.orders.coupons import find_coupon
+from applications.products.models import Product, ProductImage
+from .utils import move_wishlist_to_cart
 
 @extend_schema(tags=['Cart'])
 class CartViewSet(viewsets.ViewSet):
@@ -19,30 +25,15 @@ class CartViewSet(viewsets.ViewSet):
     def get_permissions(self):
         return [AllowAny()]
     
-    def get_cart(self, request):
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.prefetch_related(
-                Prefetch('items__product')
-            ).get_or_create(user=request.user, is_active=True)
-        else:
-            # Asegurar que la sesión existe y está persistida
-            if not request.session.session_key:
-                request.session.create()
-            
-            session_id = request.session.session_key
-            cart, created = Cart.objects.prefetch_related(
-                Prefetch('items__product')
-            ).get_or_create(session_id=session_id, user=None, defaults={'is_active': True})
-            
-            # Si el carrito fue creado recientemente, marcar is_active como True
-            if not cart.is_active:
-                cart.is_active = True
-                cart.save()
-        
-        return cart
+    def get_storage(self, request):
+        return get_cart_storage(request)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return attach_cart_token(request, response)
     
     def list(self, request):
-        cart = self.get_cart(request)
+        cart = self.get_storage(request).load()
         serializer = CartSerializer(cart, context={'request': request})
         return Response(serializer.data)
     
@@ -52,86 +43,111 @@ class CartViewSet(viewsets.ViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        cart = self.get_cart(request)
-        product_id = serializer.validated_data['product_id']
-        quantity = serializer.validated_data['quantity']
-        
-        try:
-            cart_item = CartItem.objects.select_related('product').get(cart=cart, product_id=product_id)
-            new_quantity = cart_item.quantity + quantity
-            product = cart_item.product
-            if new_quantity > product.stock:
-                return Response({
-                    "error": f"Stock insuficiente. Solo hay {product.stock} unidades."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            cart_item.quantity = new_quantity
-            cart_item.save()
-            message = "Cantidad actualizada"
-        except CartItem.DoesNotExist:
-            product = Product.objects.get(id=product_id)
-            cart_item = CartItem.objects.create(cart=cart, product=product, quantity=quantity)
-            message = "Producto agregado al carrito"
+        storage = self.get_storage(request)
+        product = serializer.validated_data['product']
+        added = storage.add(product, serializer.validated_data['quantity'])
+        if added is None:
+            return Response({
+                "error": f"Stock insuficiente. Solo hay {product.stock} unidades."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        cart_item, created = added
+        message = "Producto agregado al carrito" if created else "Cantidad actualizada"
         
         item_serializer = CartItemSerializer(cart_item, context={'request': request})
+        totals = storage.totals()
         return Response({
             "message": message,
             "item": item_serializer.data,
-            "cart_total": cart.total_price,
-            "cart_items_count": cart.total_items
+            "cart_total": totals['total_price'],
+            "cart_items_count": totals['total_items']
         }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['put', 'patch'], url_path='update')
     def update_item(self, request, pk=None):
-        cart = self.get_cart(request)
-        try:
-            cart_item = CartItem.objects.select_related('product').get(id=pk, cart=cart)
-        except CartItem.DoesNotExist:
+        storage = self.get_storage(request)
+        cart_item = storage.get_line(pk)
+        if cart_item is None:
             return Response({"error": "Item no encontrado."}, status=status.HTTP_404_NOT_FOUND)
         
         serializer = CartItemUpdateSerializer(cart_item, data=request.data, partial=True)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer.save()
+        storage.set_quantity(cart_item, serializer.validated_data.get('quantity', cart_item.quantity))
         return Response({
             "message": "Cantidad actualizada",
             "item": CartItemSerializer(cart_item, context={'request': request}).data,
-            "cart_total": cart.total_price
+            "cart_total": storage.totals()['total_price']
         })
     
     @action(detail=True, methods=['delete'], url_path='remove')
     def remove_item(self, request, pk=None):
-        cart = self.get_cart(request)
-        try:
-            cart_item = CartItem.objects.get(id=pk, cart=cart)
-            product_name = cart_item.product.name
-            cart_item.delete()
-            return Response({
-                "message": f"{product_name} eliminado del carrito",
-                "cart_total": cart.total_price,
-                "cart_items_count": cart.total_items
-            })
-        except CartItem.DoesNotExist:
+        storage = self.get_storage(request)
+        product_name = storage.remove(pk)
+        if product_name is None:
             return Response({"error": "Item no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        totals = storage.totals()
+        return Response({
+            "message": f"{product_name} eliminado del carrito",
+            "cart_total": totals['total_price'],
+            "cart_items_count": totals['total_items']
+        })
     
     @action(detail=False, methods=['delete'], url_path='clear')
     def clear_cart(self, request):
-        cart = self.get_cart(request)
-        items_count = cart.items.count()
-        cart.items.all().delete()
+        items_count = self.get_storage(request).clear()
         return Response({
             "message": f"Carrito vaciado. {items_count} productos eliminados.",
             "cart_total": 0,
             "cart_items_count": 0
         })
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Varias operaciones sobre el carrito en un solo request (ej. repetir
+        una orden o agregar un bundle). Retorna el resultado de cada
+        operación y el carrito final.
+        POST /api/cart/batch/
+        Body: { "operations": [{"op": "add|set|remove", "product_id": 1, "quantity": 2}] }
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        storage = self.get_storage(request)
+        results = apply_operations(storage, serializer.validated_data['operations'])
+        return Response({
+            "results": results,
+            "cart": CartSerializer(storage.load(), context={'request': request}).data
+        })
+
+    @action(detail=False, methods=['get'], url_path='quote')
+    def quote(self, request):
+        """
+        Cotiza el carrito (subtotal, envío, impuestos y cupón) sin crear la orden
+        GET /api/cart/quote/?coupon_code=...
+        """
+        cart = self.get_storage(request).load()
+        coupon_code = request.query_params.get('coupon_code')
+        coupon = find_coupon(coupon_code)
+        data = cart.quote(coupon).as_dict()
+        data['coupon_valid'] = coupon is not None if coupon_code else None
+        return Response(data)
+
 @extend_schema(tags=['Cart'])
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user).select_related('product')
+        queryset = Wishlist.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            primary_image = ProductImage.objects.filter(product=OuterRef('product_id'), is_primary=True)
+            queryset = queryset.select_related('product').only(
+                'user', 'notes', 'added_at', *[f'product__{field}' for field in CART_PRODUCT_FIELDS]
+            ).annotate(primary_image_path=Subquery(primary_image.values('image')[:1]))
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -143,21 +159,65 @@ class WishlistViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'], url_path='move-to-cart')
     def move_to_cart(self, request, pk=None):
-        try:
-            wishlist_item = self.get_queryset().get(pk=pk)
-            cart, _ = Cart.objects.get_or_create(user=request.user, is_active=True)
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=wishlist_item.product,
-                defaults={'quantity': 1}
-            )
-            if not created:
-                cart_item.quantity += 1
-                cart_item.save()
-            wishlist_item.delete()
-            return Response({
-                "message": f"{cart_item.product.name} movido al carrito",
-                "cart_total": cart.total_price
-            })
-        except Wishlist.DoesNotExist:
+        wishlist_item = Wishlist.objects.filter(pk=pk, user=request.user).values('product_id', 'product__name').first()
+        if wishlist_item is None:
             return Response({"error": "Producto no encontrado en wishlist."}, status=status.HTTP_404_NOT_FOUND)
+        moved, _ = move_wishlist_to_cart(request.user, [wishlist_item['product_id']])
+        if not moved:
+            return Response({"error": "Producto sin stock disponible."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": f"{wishlist_item['product__name']} movido al carrito",
+            "cart_total": DatabaseCartStorage(user=request.user).totals()['total_price']
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-add')
+    def bulk_add(self, request):
+        """
+        Agrega varios productos a la wishlist (ignora los que ya están)
+        POST /api/cart/wishlist/bulk-add/  Body: { "product_ids": [1, 2] }
+        """
+        serializer = WishlistBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_ids = serializer.validated_data['product_ids']
+        already_added = Wishlist.objects.filter(user=request.user, product=OuterRef('pk'))
+        new_ids = list(
+            Product.objects.filter(pk__in=product_ids, is_active=True)
+            .exclude(Exists(already_added))
+            .values_list('pk', flat=True)
+        )
+        Wishlist.objects.bulk_create(
+            [Wishlist(user=request.user, product_id=product_id) for product_id in new_ids],
+            ignore_conflicts=True,
+        )
+        return Response({
+            "added": len(new_ids),
+            "skipped": [product_id for product_id in product_ids if product_id not in set(new_ids)],
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-remove')
+    def bulk_remove(self, request):
+        """
+        Quita varios productos de la wishlist con un solo DELETE
+        POST /api/cart/wishlist/bulk-remove/  Body: { "product_ids": [1, 2] }
+        """
+        serializer = WishlistBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        removed, _ = Wishlist.objects.filter(
+            user=request.user, product_id__in=serializer.validated_data['product_ids']
+        ).delete()
+        return Response({"removed": removed})
+
+    @action(detail=False, methods=['post'], url_path='move-to-cart')
+    def bulk_move_to_cart(self, request):
+        """
+        Mueve varios productos (o toda la wishlist) al carrito
+        POST /api/cart/wishlist/move-to-cart/  Body: { "product_ids": [1, 2] } (opcional)
+        """
+        serializer = WishlistMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moved, skipped = move_wishlist_to_cart(request.user, serializer.validated_data.get('product_ids'))
+        return Response({
+            "moved": moved,
+            "skipped": skipped,
+            "cart_total": DatabaseCartStorage(user=request.user).totals()['total_price']
+        })
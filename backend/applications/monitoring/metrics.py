@@ -0,0 +1,167 @@
+"""
+Métricas por request y su agregado en histogramas del proceso.
+
+`RequestMetrics` se crea en el middleware y se publica en una ContextVar
+para que el wrapper de consultas y el mixin de las vistas lo encuentren
+sin pasarlo de mano en mano. Las consultas se agrupan por su SQL con
+placeholders (las listas `IN (%s, %s, ...)` se colapsan), de modo que una
+misma plantilla ejecutada varias veces delata un N+1.
+
+Los histogramas viven en memoria del proceso (cada worker tiene los suyos)
+y usan buckets fijos, así que registrar un request es O(1).
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Límites superiores de los buckets (el último es "más que eso")
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_metrics', default=None)
+
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+def fingerprint(sql):
+    return _PLACEHOLDER_LIST.sub('%s', sql)
+
+
+def current_metrics():
+    return _current.get()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_queries = 0
+        self.fingerprints = Counter()
+        self._serializing = 0
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def record_query(self, execute, sql, params, many, context):
+        """Wrapper para `connection.execute_wrapper`"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            if self._serializing:
+                self.serialize_queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @contextmanager
+    def serializing(self):
+        self._serializing += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._serializing -= 1
+            if not self._serializing:
+                self.serialize_time += time.perf_counter() - start
+
+    def duplicates(self):
+        """Plantillas de SQL ejecutadas más de una vez, de más a menos"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Límite superior del bucket que contiene el percentil (aproximado)"""
+        target = fraction * sum(self.counts)
+        seen = 0
+        for bound, count in zip(self.bounds + (None,), self.counts):
+            seen += count
+            if count and seen >= target:
+                return bound if bound is not None else self.max
+        return 0
+
+    def as_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'total': round(self.total, 2),
+            'max': round(self.max, 2),
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duplicate_queries = 0
+        self.duration = Histogram(DURATION_BUCKETS_MS)
+        self.db_time = Histogram(DURATION_BUCKETS_MS)
+        self.serialize_time = Histogram(DURATION_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'duplicate_queries': self.duplicate_queries,
+            'duration_ms': self.duration.as_dict(),
+            'db_ms': self.db_time.as_dict(),
+            'serialize_ms': self.serialize_time.as_dict(),
+            'queries': self.queries.as_dict(),
+        }
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def record(view, status_code, duration_ms, db_ms, serialize_ms, queries, duplicate_queries):
+    with _lock:
+        stats = _stats.get(view)
+        if stats is None:
+            stats = _stats[view] = ViewStats()
+        stats.requests += 1
+        stats.errors += status_code >= 500
+        stats.duplicate_queries += duplicate_queries
+        stats.duration.add(duration_ms)
+        stats.db_time.add(db_ms)
+        stats.serialize_time.add(serialize_ms)
+        stats.queries.add(queries)
+
+
+def snapshot():
+    with _lock:
+        return {view: stats.as_dict() for view, stats in sorted(_stats.items())}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
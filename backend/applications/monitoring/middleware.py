@@ -0,0 +1,101 @@
+"""
+Middleware de instrumentación: tiempo total, consultas SQL (cantidad,
+tiempo y plantillas repetidas) y tiempo de serialización por request.
+
+Los datos se envían en la cabecera `Server-Timing` (visible en las
+herramientas de desarrollo del navegador), en un log estructurado del
+logger `applications.monitoring` y en los histogramas de `metrics`.
+Se desactiva con PERF_METRICS = False.
+"""
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('applications.monitoring')
+
+
+def view_name(request, view_func):
+    """
+    `Clase.acción` para vistas de DRF (el router guarda el mapeo método →
+    acción en la función de la vista); si no, el nombre de la ruta.
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        match = request.resolver_match
+        return match.view_name if match else None
+    actions = getattr(view_func, 'actions', None) or {}
+    return f"{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERF_METRICS:
+            return self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = request_metrics.activate()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            request_metrics.deactivate(token)
+
+        self.report(request, response, request_metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_metrics = metrics.current_metrics()
+        if request_metrics is not None:
+            request_metrics.view = view_name(request, view_func)
+
+    def report(self, request, response, request_metrics):
+        total_ms = request_metrics.elapsed() * 1000
+        db_ms = request_metrics.db_time * 1000
+        serialize_ms = request_metrics.serialize_time * 1000
+        duplicates = request_metrics.duplicates()
+        duplicate_queries = sum(count - 1 for _, count in duplicates)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total_ms:.1f}',
+                f'db;dur={db_ms:.1f};desc="{request_metrics.queries} queries"',
+                f'serialize;dur={serialize_ms:.1f};desc="{request_metrics.serialize_queries} queries"',
+                f'dup;desc="{duplicate_queries} duplicate queries"',
+            ])
+
+        view = request_metrics.view or 'unresolved'
+        metrics.record(
+            view, response.status_code, total_ms, db_ms, serialize_ms,
+            request_metrics.queries, duplicate_queries,
+        )
+
+        slow = total_ms >= settings.PERF_SLOW_REQUEST_MS
+        noisy = duplicate_queries >= settings.PERF_DUPLICATE_QUERY_THRESHOLD
+        level = logging.WARNING if slow or noisy else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        payload = {
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': request_metrics.queries,
+            'serialize_ms': round(serialize_ms, 2),
+            'serialize_queries': request_metrics.serialize_queries,
+            'duplicate_queries': duplicate_queries,
+            'duplicates': [{'sql': sql[:300], 'count': count} for sql, count in duplicates[:5]],
+        }
+        logger.log(level, json.dumps(payload), extra={'perf': payload})
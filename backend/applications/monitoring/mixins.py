@@ -0,0 +1,23 @@
+from .metrics import current_metrics
+
+
+class InstrumentedViewMixin:
+    """
+    Mide cuánto tarda la serialización de la respuesta (y cuántas
+    consultas dispara, el síntoma de un N+1 en los serializers).
+    Va antes de la clase base de DRF: `class X(InstrumentedViewMixin, ModelViewSet)`.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        request_metrics = current_metrics()
+        if request_metrics is not None:
+            serializer.to_representation = _timed(request_metrics, serializer.to_representation)
+        return serializer
+
+
+def _timed(request_metrics, to_representation):
+    def wrapper(instance):
+        with request_metrics.serializing():
+            return to_representation(instance)
+    return wrapper
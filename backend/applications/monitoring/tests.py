@@ -0,0 +1,69 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from applications.products.models import Category, Product
+from . import metrics
+from .metrics import Histogram, fingerprint
+
+
+class MetricsTest(TestCase):
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s, %s) AND a = %s'),
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s) AND a = %s'),
+        )
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram((10, 100))
+        for value in (1, 2, 3, 50, 500):
+            histogram.add(value)
+        self.assertEqual(histogram.as_dict()['buckets'], {'<=10': 3, '<=100': 1, '>100': 1})
+        self.assertEqual((histogram.percentile(0.5), histogram.percentile(0.95)), (10, 500))
+
+
+@override_settings(PERF_METRICS=True, PERF_SERVER_TIMING=True)
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        category = Category.objects.create(name='Mesas')
+        for i in range(3):
+            Product.objects.create(
+                name=f'Mesa {i}', sku=f'MES-{i:03d}', description='Mesa', category=category,
+                price=100, stock=5, is_active=True
+            )
+        self.client = APIClient()
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'serialize;dur=', 'dup;desc='):
+            self.assertIn(metric, timing)
+
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.client.force_authenticate(staff)
+        stats = self.client.get('/api/metrics/').data
+        self.assertEqual(stats['ProductViewSet.list']['requests'], 1)
+        self.assertGreater(stats['ProductViewSet.list']['queries']['total'], 0)
+
+        self.assertEqual(self.client.delete('/api/metrics/').status_code, 204)
+        self.assertEqual(list(self.client.get('/api/metrics/').data), ['request_metrics.delete'])
+
+    def test_metrics_endpoint_is_staff_only(self):
+        user = User.objects.create_user(username='cliente', password='pass')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    @override_settings(PERF_DUPLICATE_QUERY_THRESHOLD=0)
+    def test_structured_log_lists_duplicate_queries(self):
+        with self.assertLogs('applications.monitoring', 'WARNING') as logs:
+            self.client.get('/api/products/')
+        payload = json.loads(logs.records[0].getMessage())
+        self.assertEqual(payload['view'], 'ProductViewSet.list')
+        self.assertEqual(payload['status'], 200)
+        self.assertEqual(payload['queries'], logs.records[0].perf['queries'])
+        self.assertIn('duplicates', payload)
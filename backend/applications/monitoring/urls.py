@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import request_metrics
+
+urlpatterns = [
+    path('', request_metrics, name='request-metrics'),
+]
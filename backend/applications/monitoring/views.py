@@ -0,0 +1,22 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from . import metrics
+
+
+@extend_schema(tags=['Monitoring'])
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def request_metrics(request):
+    """
+    Histogramas de duración, consultas y serialización por vista
+    (de este proceso desde su arranque o el último reset)
+    GET /api/metrics/
+    DELETE /api/metrics/ - Reinicia los contadores
+    """
+    if request.method == 'DELETE':
+        metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(metrics.snapshot())
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import OutboxEmail, WishlistAlert
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['to', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails reprogramados.')
+    retry_now.short_description = 'Reintentar ahora'
+
+@admin.register(WishlistAlert)
+class WishlistAlertAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'product', 'kind', 'old_price', 'new_price', 'created_at', 'sent_at']
+    list_filter = ['kind', 'sent_at']
+    search_fields = ['user__email', 'product__name']
+    raw_id_fields = ['user', 'product']
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.notifications.outbox import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envía los emails pendientes del outbox por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails por lote (EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Seguir drenando la cola indefinidamente')
+        parser.add_argument('--interval', type=float, default=5, help='Segundos de espera entre pasadas con --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = dispatch_outbox(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f'Emails enviados: {sent}, con error: {failed}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from applications.notifications.wishlist_alerts import run_wishlist_alerts
+
+
+class Command(BaseCommand):
+    help = 'Detecta bajadas de precio y reposiciones de stock en wishlists y encola los emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Productos/usuarios por lote (WISHLIST_ALERT_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        result = run_wishlist_alerts(batch_size=options['batch_size'])
+        self.stdout.write(
+            f"Alertas nuevas: {result['alerts']}, snapshots nuevos: {result['snapshots']}, "
+            f"emails encolados: {result['emails']}"
+        )
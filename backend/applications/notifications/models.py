@@ -0,0 +1,97 @@
+from django.db import models
+from django.utils import timezone
+
+class OutboxEmail(models.Model):
+    """
+    Email transaccional pendiente de envío. Se escribe en la misma
+    transacción que el evento de negocio y lo envía el dispatcher (outbox.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    kind = models.CharField(max_length=50, blank=True, help_text="Tipo de email (ej. welcome, password_reset)")
+    to = models.EmailField()
+    from_email = models.EmailField(blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Email en Cola'
+        verbose_name_plural = 'Emails en Cola'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind or 'email'} → {self.to} ({self.status})"
+
+class JobWatermark(models.Model):
+    """
+    Marca de agua de un job incremental (hasta dónde procesó)
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Marca de Agua'
+        verbose_name_plural = 'Marcas de Agua'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class ProductSnapshot(models.Model):
+    """
+    Último precio final y disponibilidad vistos por el job de alertas de
+    wishlist; solo existe para productos que están en alguna wishlist.
+    """
+    product = models.OneToOneField('products.Product', on_delete=models.CASCADE, primary_key=True, related_name='alert_snapshot')
+    final_price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField()
+    seen_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Estado de Producto'
+        verbose_name_plural = 'Estados de Productos'
+
+    def __str__(self):
+        return f"{self.product_id}: {self.final_price} ({'con' if self.in_stock else 'sin'} stock)"
+
+class WishlistAlert(models.Model):
+    """
+    Cambio detectado en un producto de la wishlist de un usuario; se
+    agrupan por usuario en un solo email (ver wishlist_alerts.py).
+    """
+    KIND_CHOICES = [
+        ('price_drop', 'Bajó de precio'),
+        ('back_in_stock', 'Volvió a tener stock'),
+    ]
+
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='wishlist_alerts')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='wishlist_alerts')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Alerta de Wishlist'
+        verbose_name_plural = 'Alertas de Wishlist'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'sent_at']),
+            models.Index(fields=['sent_at', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.product_id} ({self.kind})"
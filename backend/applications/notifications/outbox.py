@@ -0,0 +1,123 @@
+"""
+Outbox de emails transaccionales.
+
+`enqueue_email` solo inserta una fila, así que el email se confirma o se
+descarta junto con la transacción del evento que lo origina (registro,
+reset de contraseña, orden). `dispatch_outbox` drena la cola por lotes
+reutilizando una sola conexión del backend de email (`get_connection` +
+`send_messages`); los fallos se reintentan con backoff exponencial hasta
+EMAIL_OUTBOX_MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def enqueue_email(to, subject, body, kind='', from_email=None):
+    """
+    Agrega un email a la cola. Llamar dentro de la transacción del evento.
+    """
+    return OutboxEmail.objects.create(
+        kind=kind,
+        to=to,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+    )
+
+
+def enqueue_emails(emails):
+    """
+    Variante masiva: `emails` son instancias de OutboxEmail sin guardar
+    """
+    for email in emails:
+        email.from_email = email.from_email or settings.DEFAULT_FROM_EMAIL
+    return OutboxEmail.objects.bulk_create(emails)
+
+
+def retry_delay(attempts):
+    """
+    Backoff exponencial: base * 2^(intentos - 1), con tope
+    """
+    seconds = settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_MAX_RETRY_SECONDS))
+
+
+@transaction.atomic
+def _claim_batch(batch_size):
+    """
+    Toma un lote de emails vencidos y los reserva moviendo su próximo
+    intento al final del lease, para que otro dispatcher no los repita
+    si este proceso muere a mitad del envío.
+    """
+    now = timezone.now()
+    batch = list(
+        OutboxEmail.objects.select_for_update(skip_locked=True)
+        .filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')[:batch_size]
+    )
+    if batch:
+        lease = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=lease)
+    return batch
+
+
+def _send_batch(batch, connection):
+    now = timezone.now()
+    for email in batch:
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[email.to],
+            connection=connection,
+        )
+        email.attempts += 1
+        try:
+            sent = connection.send_messages([message])
+            if not sent:
+                raise RuntimeError('El backend no aceptó el mensaje.')
+        except Exception as exc:
+            email.last_error = str(exc)[:1000]
+            if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status = 'failed'
+            else:
+                email.next_attempt_at = now + retry_delay(email.attempts)
+        else:
+            email.status = 'sent'
+            email.sent_at = now
+            email.last_error = ''
+    OutboxEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+
+def dispatch_outbox(batch_size=None, max_batches=None):
+    """
+    Envía los emails pendientes por lotes sobre una sola conexión.
+    Retorna (enviados, fallidos) de esta ejecución.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    sent = failed = batches = 0
+    connection = None
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = _claim_batch(batch_size)
+            if not batch:
+                break
+            if connection is None:
+                connection = get_connection(fail_silently=False)
+                connection.open()
+            _send_batch(batch, connection)
+            sent += sum(1 for email in batch if email.status == 'sent')
+            failed += sum(1 for email in batch if email.status != 'sent')
+            batches += 1
+    finally:
+        if connection is not None:
+            connection.close()
+    return sent, failed
@@ -0,0 +1,13 @@
+from celery import shared_task
+from .outbox import dispatch_outbox
+from .wishlist_alerts import run_wishlist_alerts
+
+@shared_task
+def dispatch_email_outbox():
+    # Programar periódicamente (celery beat) para drenar la cola de emails
+    return dispatch_outbox()
+
+@shared_task
+def send_wishlist_alerts():
+    # Programar periódicamente (celery beat); el intervalo por usuario lo limita el job
+    return run_wishlist_alerts()
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from applications.cart.models import Wishlist
+from applications.products.models import Category, Product
+from .models import OutboxEmail, WishlistAlert
+from .outbox import dispatch_outbox, enqueue_email
+from .wishlist_alerts import run_wishlist_alerts
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    EMAIL_OUTBOX_RETRY_SECONDS=60,
+)
+class OutboxDispatchTest(TestCase):
+    def test_batches_share_one_connection(self):
+        for i in range(5):
+            enqueue_email(f'cliente{i}@example.com', 'Hola', 'Mensaje', kind='welcome')
+        with mock.patch('applications.notifications.outbox.get_connection', wraps=mail.get_connection) as factory:
+            sent, failed = dispatch_outbox(batch_size=2)
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(factory.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(dispatch_outbox(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        email = enqueue_email('cliente@example.com', 'Hola', 'Mensaje')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('smtp caído')):
+            self.assertEqual(dispatch_outbox(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(dispatch_outbox(), (0, 0))
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            dispatch_outbox()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+        self.assertIn('smtp caído', email.last_error)
+
+
+@override_settings(WISHLIST_ALERT_INTERVAL_HOURS=24)
+class WishlistAlertsTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Sofás")
+        self.sofa = Product.objects.create(
+            name="Sofá", sku="SOF-001", description="Sofá", category=category, price=1000, stock=5, is_active=True
+        )
+        self.lamp = Product.objects.create(
+            name="Lámpara", sku="LAM-001", description="Lámpara", category=category, price=200, stock=0, is_active=True
+        )
+        self.other = Product.objects.create(
+            name="Mesa", sku="MES-001", description="Mesa", category=category, price=300, stock=5, is_active=True
+        )
+        self.users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.com', password='pass') for i in range(2)]
+        for user in self.users:
+            Wishlist.objects.create(user=user, product=self.sofa)
+        Wishlist.objects.create(user=self.users[0], product=self.lamp)
+        self.start = timezone.now()
+        run_wishlist_alerts(now=self.start)
+
+    def test_groups_changes_per_user(self):
+        changed_at = self.start + timedelta(minutes=5)
+        Product.objects.filter(pk=self.sofa.pk).update(discount_price=800, updated_at=changed_at)
+        Product.objects.filter(pk=self.lamp.pk).update(stock=3, updated_at=changed_at)
+        Product.objects.filter(pk=self.other.pk).update(discount_price=100, updated_at=changed_at)
+
+        with self.assertNumQueries(15):
+            result = run_wishlist_alerts(now=self.start + timedelta(minutes=10))
+        self.assertEqual(result, {'alerts': 3, 'snapshots': 0, 'emails': 2})
+        emails = {email.to: email for email in OutboxEmail.objects.filter(kind='wishlist_alert')}
+        self.assertEqual(set(emails), {'u0@example.com', 'u1@example.com'})
+        self.assertIn('Sofá: bajó de S/ 1000.00 a S/ 800.00', emails['u0@example.com'].body)
+        self.assertIn('Lámpara: volvió a tener stock', emails['u0@example.com'].body)
+        self.assertNotIn('Lámpara', emails['u1@example.com'].body)
+
+        # Sin cambios nuevos no se repiten alertas aunque se repase la ventana
+        self.assertEqual(run_wishlist_alerts(now=self.start + timedelta(minutes=11))['alerts'], 0)
+
+    def test_rate_limits_per_user(self):
+        Product.objects.filter(pk=self.sofa.pk).update(discount_price=900, updated_at=self.start + timedelta(minutes=5))
+        run_wishlist_alerts(now=self.start + timedelta(minutes=10))
+        Product.objects.filter(pk=self.sofa.pk).update(discount_price=700, updated_at=self.start + timedelta(minutes=15))
+        result = run_wishlist_alerts(now=self.start + timedelta(minutes=20))
+        self.assertEqual((result['alerts'], result['emails']), (2, 0))
+        self.assertEqual(WishlistAlert.objects.filter(sent_at__isnull=True).count(), 2)
+
+        result = run_wishlist_alerts(now=self.start + timedelta(hours=25))
+        self.assertEqual(result['emails'], 2)
+        self.assertIn('S/ 900.00 a S/ 700.00', OutboxEmail.objects.filter(kind='wishlist_alert').latest('pk').body)
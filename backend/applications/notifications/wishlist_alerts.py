@@ -0,0 +1,199 @@
+"""
+Alertas de wishlist: bajadas de precio y productos que vuelven a tener stock.
+
+En lugar de revisar cada fila de Wishlist en cada corrida, el job solo mira
+los productos con `updated_at` posterior a la marca de agua de la corrida
+anterior (con un pequeño solape para transacciones que confirmaron tarde) y
+que están en alguna wishlist. Cada uno se compara contra su último estado
+conocido (ProductSnapshot), así que repasar un producto no genera alertas
+duplicadas. Las alertas se agrupan por usuario en un único email que se
+encola en el outbox, como máximo uno cada WISHLIST_ALERT_INTERVAL_HOURS;
+las alertas de un usuario limitado esperan a la siguiente ventana.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from applications.cart.models import Wishlist, unit_price_expression
+from applications.products.models import Product
+from .models import JobWatermark, OutboxEmail, ProductSnapshot, WishlistAlert
+from .outbox import enqueue_emails
+
+WATERMARK = 'wishlist_alerts'
+
+# Margen sobre la marca de agua: `updated_at` se fija antes del COMMIT
+OVERLAP = timedelta(minutes=5)
+
+
+def wishlisted_products():
+    return Product.objects.filter(Exists(Wishlist.objects.filter(product_id=OuterRef('pk'))))
+
+
+def _changed_batch(since, until, after_pk, batch_size):
+    return list(
+        wishlisted_products()
+        .filter(pk__gt=after_pk, updated_at__gt=since, updated_at__lte=until, alert_snapshot__isnull=False)
+        .annotate(
+            new_price=unit_price_expression(prefix=''),
+            old_price=F('alert_snapshot__final_price'),
+            was_in_stock=F('alert_snapshot__in_stock'),
+        )
+        .order_by('pk')
+        .values('pk', 'stock', 'new_price', 'old_price', 'was_in_stock')[:batch_size]
+    )
+
+
+@transaction.atomic
+def _record_changes(rows, now):
+    """
+    Actualiza los snapshots del lote y crea las alertas para los usuarios
+    que tienen esos productos en su wishlist. Retorna cuántas creó.
+    """
+    snapshots, changes = [], {}
+    for row in rows:
+        in_stock = row['stock'] > 0
+        if row['new_price'] == row['old_price'] and in_stock == row['was_in_stock']:
+            continue
+        snapshots.append(ProductSnapshot(product_id=row['pk'], final_price=row['new_price'], in_stock=in_stock, seen_at=now))
+        if in_stock and not row['was_in_stock']:
+            changes[row['pk']] = ('back_in_stock', row['old_price'], row['new_price'])
+        elif in_stock and row['new_price'] < row['old_price']:
+            changes[row['pk']] = ('price_drop', row['old_price'], row['new_price'])
+    ProductSnapshot.objects.bulk_update(snapshots, ['final_price', 'in_stock', 'seen_at'])
+    if not changes:
+        return 0
+    alerts = [
+        WishlistAlert(user_id=user_id, product_id=product_id, kind=changes[product_id][0],
+                      old_price=changes[product_id][1], new_price=changes[product_id][2])
+        for user_id, product_id in Wishlist.objects.filter(product_id__in=changes).order_by().values_list('user_id', 'product_id')
+    ]
+    WishlistAlert.objects.bulk_create(alerts)
+    return len(alerts)
+
+
+def detect_changes(since, until, batch_size):
+    """
+    Recorre por lotes de pk los productos modificados en (since, until]
+    """
+    created, after_pk = 0, 0
+    while True:
+        rows = _changed_batch(since, until, after_pk, batch_size)
+        if rows:
+            created += _record_changes(rows, until)
+        if len(rows) < batch_size:
+            return created
+        after_pk = rows[-1]['pk']
+
+
+def seed_snapshots(batch_size, now):
+    """
+    Guarda el estado inicial de los productos recién agregados a alguna
+    wishlist; el primer cambio se mide contra este estado.
+    """
+    seeded = 0
+    missing = (
+        wishlisted_products()
+        .filter(alert_snapshot__isnull=True)
+        .annotate(current_price=unit_price_expression(prefix=''))
+        .order_by('pk')
+        .values_list('pk', 'current_price', 'stock')
+    )
+    while True:
+        rows = list(missing[:batch_size])
+        ProductSnapshot.objects.bulk_create(
+            [ProductSnapshot(product_id=pk, final_price=price, in_stock=stock > 0, seen_at=now) for pk, price, stock in rows],
+            ignore_conflicts=True,
+        )
+        seeded += len(rows)
+        if len(rows) < batch_size:
+            return seeded
+
+
+def alert_email(user, alerts):
+    lines = []
+    for alert in alerts:
+        if alert.kind == 'back_in_stock':
+            lines.append(f"- {alert.product.name}: volvió a tener stock (S/ {alert.new_price})")
+        else:
+            lines.append(f"- {alert.product.name}: bajó de S/ {alert.old_price} a S/ {alert.new_price}")
+    body = (
+        f"Hola {user.first_name or user.username},\n\n"
+        "Hay novedades en productos de tu lista de deseos:\n\n"
+        + "\n".join(lines)
+        + f"\n\nVer tu lista: {settings.FRONTEND_URL}/wishlist"
+    )
+    return OutboxEmail(kind='wishlist_alert', to=user.email, subject='Novedades en tu lista de deseos', body=body)
+
+
+@transaction.atomic
+def _dispatch_users(user_ids, now):
+    pending = (
+        WishlistAlert.objects.select_for_update(skip_locked=True, of=('self',))
+        .filter(user_id__in=user_ids, sent_at__isnull=True)
+        .select_related('user', 'product')
+        .only('kind', 'old_price', 'new_price', 'product_id', 'product__name',
+              'user__username', 'user__first_name', 'user__email')
+        .order_by('user_id', 'product_id', '-created_at')
+    )
+    by_user, alert_ids = defaultdict(dict), []
+    for alert in pending:
+        alert_ids.append(alert.pk)
+        # Solo la alerta más reciente de cada producto
+        by_user[alert.user_id].setdefault(alert.product_id, alert)
+    emails = [
+        alert_email(alerts[0].user, alerts)
+        for alerts in (list(products.values()) for products in by_user.values())
+        if alerts[0].user.email
+    ]
+    enqueue_emails(emails)
+    WishlistAlert.objects.filter(pk__in=alert_ids).update(sent_at=now)
+    return len(emails)
+
+
+def dispatch_alerts(now, batch_size):
+    """
+    Un email por usuario con alertas pendientes, salvo los que ya
+    recibieron uno dentro de WISHLIST_ALERT_INTERVAL_HOURS.
+    """
+    window_start = now - timedelta(hours=settings.WISHLIST_ALERT_INTERVAL_HOURS)
+    recently_notified = WishlistAlert.objects.filter(user_id=OuterRef('user_id'), sent_at__gt=window_start)
+    users = (
+        WishlistAlert.objects.filter(sent_at__isnull=True)
+        .exclude(Exists(recently_notified))
+        .values_list('user_id', flat=True)
+        .distinct()
+        .order_by('user_id')
+    )
+    sent, after = 0, 0
+    while True:
+        user_ids = list(users.filter(user_id__gt=after)[:batch_size])
+        if user_ids:
+            sent += _dispatch_users(user_ids, now)
+        if len(user_ids) < batch_size:
+            return sent
+        after = user_ids[-1]
+
+
+def run_wishlist_alerts(batch_size=None, now=None):
+    """
+    Una corrida completa: detectar cambios desde la marca de agua, crear
+    snapshots nuevos, encolar emails y avanzar la marca de agua.
+    """
+    batch_size = batch_size or settings.WISHLIST_ALERT_BATCH_SIZE
+    now = now or timezone.now()
+    watermark = JobWatermark.objects.filter(name=WATERMARK).first()
+
+    created = 0
+    if watermark is not None:
+        created = detect_changes(watermark.value - OVERLAP, now, batch_size)
+    seeded = seed_snapshots(batch_size, now)
+    emails = dispatch_alerts(now, batch_size)
+    JobWatermark.objects.bulk_create(
+        [JobWatermark(name=WATERMARK, value=now)],
+        update_conflicts=True, unique_fields=['name'], update_fields=['value'],
+    )
+    return {'alerts': created, 'snapshots': seeded, 'emails': emails}
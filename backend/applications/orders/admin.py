@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem, OrderStatusHistory
+from .models import ArchivedOrder, Order, OrderItem, OrderStatusHistory
+from .transitions import transition_orders
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -14,9 +15,42 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'user__username', 'email', 'full_name']
     inlines = [OrderItemInline]
     readonly_fields = ['subtotal', 'shipping_cost', 'tax', 'discount', 'total', 'created_at', 'updated_at']
+    actions = ['mark_as_processing', 'mark_as_shipped', 'mark_as_in_transit', 'mark_as_delivered', 'mark_as_cancelled']
+
+    def _transition(self, request, queryset, target):
+        numbers = queryset.values_list('order_number', flat=True)
+        updated, skipped = transition_orders(numbers, target, user=request.user, comment='Cambio masivo desde admin')
+        self.message_user(request, f'{len(updated)} órdenes actualizadas, {len(skipped)} omitidas (transición no permitida).')
+
+    def mark_as_processing(self, request, queryset):
+        self._transition(request, queryset, 'processing')
+    mark_as_processing.short_description = 'Marcar como En Preparación'
+
+    def mark_as_shipped(self, request, queryset):
+        self._transition(request, queryset, 'shipped')
+    mark_as_shipped.short_description = 'Marcar como Enviado'
+
+    def mark_as_in_transit(self, request, queryset):
+        self._transition(request, queryset, 'in_transit')
+    mark_as_in_transit.short_description = 'Marcar como En Tránsito'
+
+    def mark_as_delivered(self, request, queryset):
+        self._transition(request, queryset, 'delivered')
+    mark_as_delivered.short_description = 'Marcar como Entregado'
+
+    def mark_as_cancelled(self, request, queryset):
+        self._transition(request, queryset, 'cancelled')
+    mark_as_cancelled.short_description = 'Cancelar órdenes (restaura stock)'
 
 @admin.register(OrderStatusHistory)
 class OrderStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ['order', 'status', 'comment', 'created_by', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['order__order_number', 'comment']
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'status', 'total', 'created_at', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['order_number', 'user__username']
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
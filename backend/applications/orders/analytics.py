@@ -0,0 +1,182 @@
+"""
+Rollups de ventas (diario × producto, diario × categoría y totales diarios
+por método de pago).
+
+Se mantienen de forma incremental: al crear una orden se suman sus líneas
+y al cancelarla se restan, siempre en el día de creación de la orden. Cada
+evento cuesta un número fijo de consultas por tabla (insertar las filas que
+falten y un UPDATE con incrementos F()) en su propia transacción corta,
+que corre después del commit de la orden (`transaction.on_commit`): así el
+checkout no retiene los bloqueos de las filas del día, compartidas por
+todas las órdenes. Si esa escritura falla, la orden queda igual y
+`backfill` reconstruye el rango desde las órdenes, por bloques de días
+(sin tocar los días que ya tienen órdenes archivadas).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrder, DailyCategorySales, DailyProductSales, DailySales, Order, OrderItem
+
+ZERO = Decimal('0')
+
+# Estados que no cuentan como venta
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def _counter_field(name):
+    if name == 'revenue':
+        return DecimalField(max_digits=14, decimal_places=2)
+    return IntegerField()
+
+
+def _apply(model, key_fields, deltas):
+    """
+    Suma `deltas` ({clave: {contador: valor}}) sobre las filas del rollup.
+    Dos consultas: crear las filas que falten e incrementar con un UPDATE.
+    """
+    deltas = {key: values for key, values in deltas.items() if None not in key}
+    if not deltas:
+        return
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in deltas],
+        ignore_conflicts=True,
+    )
+    conditions = {key: Q(**dict(zip(key_fields, key))) for key in deltas}
+    counters = next(iter(deltas.values())).keys()
+    changes = {
+        counter: F(counter) + Case(
+            *[When(conditions[key], then=Value(values[counter])) for key, values in deltas.items()],
+            default=Value(0),
+            output_field=_counter_field(counter),
+        )
+        for counter in counters
+    }
+    model.objects.filter(reduce(or_, conditions.values())).update(**changes)
+
+
+def _record(day_rows, product_rows, sign):
+    daily = defaultdict(lambda: {'orders': 0, 'units': 0, 'revenue': ZERO})
+    for day, payment_method, orders, units, revenue in day_rows:
+        row = daily[(day, payment_method)]
+        row['orders'] += sign * orders
+        row['units'] += sign * units
+        row['revenue'] += sign * revenue
+
+    products = defaultdict(lambda: {'units': 0, 'revenue': ZERO})
+    categories = defaultdict(lambda: {'units': 0, 'revenue': ZERO})
+    for day, product_id, category_id, units, revenue in product_rows:
+        for row in (products[(day, product_id)], categories[(day, category_id)]):
+            row['units'] += sign * units
+            row['revenue'] += sign * revenue
+
+    _apply(DailySales, ('date', 'payment_method'), daily)
+    _apply(DailyProductSales, ('date', 'product_id'), products)
+    _apply(DailyCategorySales, ('date', 'category_id'), categories)
+
+
+@transaction.atomic
+def record_order(order, lines):
+    """
+    Suma una orden recién creada. `lines` son (producto, cantidad, subtotal)
+    ya en memoria, por lo que no se vuelve a leer la orden.
+    """
+    day = timezone.localdate(order.created_at)
+    units = sum(quantity for _, quantity, _ in lines)
+    _record(
+        [(day, order.payment_method, 1, units, order.total)],
+        [(day, product.pk, product.category_id, quantity, subtotal) for product, quantity, subtotal in lines],
+        sign=1,
+    )
+
+
+@transaction.atomic
+def record_cancellations(order_ids):
+    """
+    Resta las órdenes canceladas (en su día de creación)
+    """
+    orders = Order.objects.filter(pk__in=order_ids)
+    _record(_order_rows(orders), _item_rows(OrderItem.objects.filter(order_id__in=order_ids)), sign=-1)
+
+
+def _order_rows(orders):
+    units = dict(
+        ((row['day'], row['payment_method']), row['units'])
+        for row in OrderItem.objects.filter(order__in=orders)
+        .values(day=TruncDate('order__created_at'), payment_method=F('order__payment_method'))
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    totals = (
+        orders.values('payment_method', day=TruncDate('created_at'))
+        .annotate(orders=Count('pk'), revenue=Sum('total'))
+        .order_by()
+    )
+    return [
+        (row['day'], row['payment_method'], row['orders'],
+         units.get((row['day'], row['payment_method']), 0), row['revenue'] or ZERO)
+        for row in totals
+    ]
+
+
+def _item_rows(items):
+    rows = (
+        items.values('product_id', day=TruncDate('order__created_at'), category_id=F('product__category_id'))
+        .annotate(units=Sum('quantity'), revenue=Sum('subtotal'))
+        .order_by()
+    )
+    return [
+        (row['day'], row['product_id'], row['category_id'], row['units'], row['revenue'] or ZERO)
+        for row in rows
+    ]
+
+
+def archived_until():
+    """
+    Último día con órdenes archivadas (ver archive.py), o None. Esas
+    órdenes ya no están en las tablas vivas, así que los rollups de esos
+    días no se pueden reconstruir y se conservan tal cual.
+    """
+    last = ArchivedOrder.objects.aggregate(last=Max('created_at'))['last']
+    return timezone.localdate(last) if last else None
+
+
+def backfill(date_from, date_to, chunk_days=31, log=None):
+    """
+    Recalcula los rollups entre `date_from` y `date_to` (inclusive) desde
+    las órdenes, un bloque de `chunk_days` días por transacción. El inicio
+    se recorta al día siguiente a la última orden archivada; retorna el
+    primer día recalculado (None si todo el rango estaba archivado).
+    """
+    if chunk_days < 1:
+        raise ValueError('chunk_days debe ser al menos 1')
+    archived = archived_until()
+    start = max(date_from, archived + timedelta(days=1)) if archived else date_from
+    if start > date_to:
+        return None
+    first = start
+    while start <= date_to:
+        end = min(start + timedelta(days=chunk_days - 1), date_to)
+        _backfill_chunk(start, end)
+        if log:
+            log(start, end)
+        start = end + timedelta(days=1)
+    return first
+
+
+@transaction.atomic
+def _backfill_chunk(start, end):
+    for model in (DailySales, DailyProductSales, DailyCategorySales):
+        model.objects.filter(date__range=(start, end)).delete()
+
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    orders = Order.objects.filter(created_at__gte=since, created_at__lt=until).exclude(status__in=EXCLUDED_STATUSES)
+    _record(_order_rows(orders), _item_rows(OrderItem.objects.filter(order__in=orders)), sign=1)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'applications.orders'
+
+    def ready(self):
+        """
+        Importa las señales cuando la app está lista
+        """
+        import applications.orders.signals
@@ -0,0 +1,102 @@
+"""
+Archivado de órdenes antiguas.
+
+Las órdenes finalizadas (entregadas, canceladas o reembolsadas) más viejas
+que el horizonte configurado se copian por lotes a `ArchivedOrder` (una
+fila por orden con el detalle en JSON) y se borran de las tablas vivas
+junto con sus items e historial. El listado y detalle de órdenes del
+cliente leen ambas fuentes de forma transparente.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order
+from .serializers import OrderDetailSerializer
+from .utils import with_item_summary
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled', 'refunded')
+
+# Columnas comunes al listado compacto de órdenes vivas y archivadas
+SUMMARY_FIELDS = (
+    'id', 'order_number', 'user_id', 'status', 'total', 'is_paid', 'created_at',
+    'item_count', 'first_item_name', 'first_item_quantity',
+)
+
+
+def archive_cutoff(days=None):
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def archive_orders(cutoff, batch_size=500, log=None):
+    """
+    Archiva lotes hasta que no queden órdenes elegibles. Retorna el total.
+    """
+    total = 0
+    while True:
+        archived = _archive_batch(cutoff, batch_size)
+        if not archived:
+            return total
+        total += archived
+        if log:
+            log(total)
+
+
+@transaction.atomic
+def _archive_batch(cutoff, batch_size):
+    orders = list(
+        archivable_orders(cutoff)
+        .select_for_update(skip_locked=True, of=('self',))
+        .order_by('pk')
+        .prefetch_related('items', 'history')[:batch_size]
+    )
+    if not orders:
+        return 0
+
+    rows = []
+    for order in orders:
+        items = sorted(order.items.all(), key=lambda item: item.pk)
+        rows.append(ArchivedOrder(
+            id=order.pk,
+            order_number=order.order_number,
+            user_id=order.user_id,
+            status=order.status,
+            total=order.total,
+            is_paid=order.is_paid,
+            created_at=order.created_at,
+            item_count=len(items),
+            first_item_name=items[0].product_name if items else None,
+            first_item_quantity=items[0].quantity if items else None,
+            payload=OrderDetailSerializer(order).data,
+        ))
+    ArchivedOrder.objects.bulk_create(rows)
+    Order.objects.filter(pk__in=[order.pk for order in orders]).delete()
+    return len(orders)
+
+
+def order_history(user):
+    """
+    Listado compacto de órdenes vivas y archivadas del usuario en una sola
+    consulta (UNION ALL), ordenado por fecha y paginable.
+    """
+    live = with_item_summary(Order.objects.filter(user=user).order_by()).values(*SUMMARY_FIELDS)
+    archived = ArchivedOrder.objects.filter(user=user).order_by().values(*SUMMARY_FIELDS)
+    return live.union(archived, all=True).order_by('-created_at', '-id')
+
+
+def archived_detail(user, order_number):
+    """
+    Detalle guardado de una orden archivada del usuario, o None
+    """
+    return (
+        ArchivedOrder.objects.filter(user=user, order_number=order_number)
+        .values_list('payload', flat=True)
+        .first()
+    )
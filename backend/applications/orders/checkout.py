@@ -0,0 +1,136 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Now
+
+from applications.products.inventory import release_stock, reserve_stock
+from applications.products.models import Product
+from .models import Order, OrderItem
+from .analytics import record_order
+from .coupons import CouponUnavailable, find_coupon, redeem_coupon
+from .pricing import quote
+from .tasks import send_order_confirmation_email
+
+
+class InsufficientStock(Exception):
+    """
+    Se lanza cuando el stock cambió entre la validación y la escritura
+    """
+
+
+def load_products(product_ids):
+    """
+    Obtiene en una sola consulta los productos activos de la orden,
+    indexados por id
+    """
+    return Product.objects.filter(is_active=True).in_bulk(set(product_ids))
+
+
+def requested_quantities(items):
+    """
+    Suma las cantidades pedidas por producto (un producto puede repetirse)
+    """
+    quantities = Counter()
+    for item in items:
+        quantities[item['product_id']] += item['quantity']
+    return quantities
+
+
+def decrement_stock(quantities, sharded=()):
+    """
+    Descuenta el stock de todos los productos con un único UPDATE.
+    Cada fila solo se actualiza si aún tiene stock suficiente, así que
+    retorna False si algún producto se quedó sin unidades.
+    Los productos en modo ledger (`sharded`) reservan sobre sus shards.
+    """
+    for product_id in sharded:
+        if product_id in quantities and not reserve_stock(product_id, quantities[product_id]):
+            return False
+    quantities = {pid: qty for pid, qty in quantities.items() if pid not in sharded}
+    if not quantities:
+        return True
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(pk=product_id, stock__gte=quantity)
+    updated = Product.objects.filter(condition).update(
+        stock=Case(
+            *[When(pk=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+            output_field=IntegerField(),
+        ),
+        updated_at=Now(),
+    )
+    return updated == len(quantities)
+
+
+def restore_stock(quantities, sharded=()):
+    """
+    Inverso de `decrement_stock` (ej. órdenes canceladas): un único UPDATE
+    para los productos normales y devolución a shards para los de modo ledger.
+    """
+    for product_id in sharded:
+        if product_id in quantities:
+            release_stock(product_id, quantities[product_id])
+    quantities = {pid: qty for pid, qty in quantities.items() if pid not in sharded}
+    if not quantities:
+        return
+    Product.objects.filter(pk__in=quantities).update(
+        stock=Case(
+            *[When(pk=product_id, then=F('stock') + quantity) for product_id, quantity in quantities.items()],
+            output_field=IntegerField(),
+        ),
+        updated_at=Now(),
+    )
+
+
+@transaction.atomic
+def place_order(user, items, products, coupon_code=None, **order_fields):
+    """
+    Crea la orden con sus items y descuenta stock en una transacción.
+    `products` es el diccionario ya cargado por `load_products` durante
+    la validación, de modo que no se vuelve a consultar cada producto.
+    Los montos salen del motor de precios (`pricing.quote`).
+    """
+    lines = [(products[item['product_id']], item['quantity']) for item in items]
+    coupon = find_coupon(coupon_code)
+    prices = quote([(product.pk, product.final_price, quantity) for product, quantity in lines], coupon)
+
+    order = Order.objects.create(
+        user=user,
+        subtotal=prices.subtotal,
+        shipping_cost=prices.shipping_cost,
+        tax=prices.tax,
+        discount=prices.discount,
+        total=prices.total,
+        **order_fields,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=product,
+            product_name=product.name,
+            product_sku=product.sku,
+            product_price=line.unit_price,
+            quantity=quantity,
+            subtotal=line.subtotal,
+        )
+        for (product, quantity), line in zip(lines, prices.lines)
+    ])
+
+    sharded = {product.pk for product, _ in lines if product.sharded_stock}
+    if not decrement_stock(requested_quantities(items), sharded):
+        raise InsufficientStock("Stock insuficiente para completar la orden.")
+
+    if coupon_code:
+        if coupon is None:
+            raise CouponUnavailable("El cupón no está disponible.")
+        redeem_coupon(coupon, user, order)
+
+    # Se encola en la misma transacción: si la orden falla, no hay email
+    send_order_confirmation_email(order.email or user.email, order.order_number)
+
+    # Los rollups se suman después del commit: las filas del día son las
+    # mismas para todas las órdenes y bloquearlas aquí serializaría el checkout
+    rollup_lines = [(product, quantity, line.subtotal) for (product, quantity), line in zip(lines, prices.lines)]
+    transaction.on_commit(lambda: record_order(order, rollup_lines), robust=True)
+    return order
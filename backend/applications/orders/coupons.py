@@ -0,0 +1,94 @@
+"""
+Consulta y canje de cupones.
+
+Las definiciones se guardan en una caché en memoria del proceso con TTL
+corto para que `validate-coupon` no consulte la base en cada tecla. El
+canje es un único UPDATE condicional (activo, no vencido y bajo el límite)
+que incrementa `used_count` de forma atómica, más una fila en el ledger
+por usuario.
+"""
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Coupon, CouponRedemption
+
+# Máximo de códigos memorizados (incluye códigos inexistentes)
+CACHE_MAX_ENTRIES = 1024
+
+_cache = OrderedDict()
+
+
+class CouponUnavailable(Exception):
+    """
+    El cupón no existe, está inactivo, vencido o agotó sus usos
+    """
+
+
+def get_coupon(code):
+    """
+    Retorna la definición del cupón (o None) desde la caché en memoria.
+    `used_count` puede estar desactualizado hasta COUPON_CACHE_SECONDS;
+    el canje en SQL es la verificación definitiva.
+    """
+    if not code:
+        return None
+    now = time.monotonic()
+    cached = _cache.get(code)
+    if cached and cached[0] > now:
+        return cached[1]
+    coupon = Coupon.objects.filter(code=code).first()
+    _cache[code] = (now + settings.COUPON_CACHE_SECONDS, coupon)
+    _cache.move_to_end(code)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return coupon
+
+
+def find_coupon(code):
+    """
+    Cupón aplicable (activo, vigente y con usos disponibles) o None
+    """
+    coupon = get_coupon(code)
+    if coupon is not None and coupon.is_redeemable():
+        return coupon
+    return None
+
+
+def clear_coupon_cache():
+    _cache.clear()
+
+
+@receiver([post_save, post_delete], sender=Coupon)
+def _forget_coupon(sender, instance, **kwargs):
+    _cache.pop(instance.code, None)
+
+
+def redeem_coupon(coupon, user, order=None):
+    """
+    Canjea el cupón con un único UPDATE que verifica estado, vencimiento
+    y límite de usos. Debe llamarse dentro de una transacción: la fila del
+    cupón queda bloqueada hasta el commit, lo que serializa también la
+    verificación del límite por usuario.
+    """
+    now = timezone.now()
+    updated = Coupon.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+        Q(usage_limit__isnull=True) | Q(used_count__lt=F('usage_limit')),
+        pk=coupon.pk,
+        is_active=True,
+    ).update(used_count=F('used_count') + 1)
+    if not updated:
+        raise CouponUnavailable("El cupón no está disponible.")
+
+    if coupon.per_user_limit is not None:
+        used_by_user = CouponRedemption.objects.filter(coupon=coupon, user=user).count()
+        if used_by_user >= coupon.per_user_limit:
+            raise CouponUnavailable("Ya usaste este cupón el máximo de veces permitido.")
+
+    return CouponRedemption.objects.create(coupon=coupon, user=user, order=order)
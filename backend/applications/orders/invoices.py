@@ -0,0 +1,140 @@
+"""
+Facturas PDF renderizadas una sola vez y servidas desde disco.
+
+Cada archivo se nombra con el número de orden y un hash del contenido
+facturable (`<order_number>-<hash>.pdf`), así que un cambio de estado o
+de pago genera un archivo nuevo y el hash sirve directamente como ETag.
+El render corre en un pool de hilos en segundo plano; con
+INVOICE_WORKERS = 0 se hace en línea (útil en tests y comandos). Un render
+fallido se registra y deja una marca en la caché por INVOICE_FAILURE_TTL
+segundos, durante la cual la vista responde 503 en vez de reintentar.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .models import Order
+from .pdf_generator import generate_invoice_pdf
+
+logger = logging.getLogger('applications.orders')
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def invoice_root():
+    return Path(getattr(settings, 'INVOICE_ROOT', Path(settings.MEDIA_ROOT) / 'invoices'))
+
+
+def invoice_hash(order):
+    """
+    Hash de los datos que aparecen en la factura (usa los items ya cargados)
+    """
+    payload = {
+        'order_number': order.order_number,
+        'status': order.status,
+        'is_paid': order.is_paid,
+        'full_name': order.full_name,
+        'phone': order.phone,
+        'address': [order.address_line1, order.city, order.state],
+        'totals': [str(order.subtotal), str(order.shipping_cost), str(order.tax), str(order.discount), str(order.total)],
+        'items': [[item.product_name, item.quantity, str(item.product_price)] for item in order.items.all()],
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:20]
+
+
+def invoice_filename(order, digest=None):
+    digest = digest or invoice_hash(order)
+    return f"{order.order_number}-{digest}.pdf"
+
+
+def invoice_path(order, digest=None):
+    return invoice_root() / invoice_filename(order, digest)
+
+
+def render_invoice(order_id):
+    """
+    Genera el PDF si aún no existe para el contenido actual de la orden.
+    Escribe en un archivo temporal y lo renombra, de modo que nunca se
+    sirve un PDF a medio escribir; luego borra versiones anteriores.
+    """
+    order = Order.objects.prefetch_related('items').get(pk=order_id)
+    path = invoice_path(order)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    generate_invoice_pdf(order, str(tmp_path))
+    os.replace(tmp_path, path)
+
+    for old in path.parent.glob(f"{order.order_number}-*.pdf"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def _failed_key(order_id):
+    return f'invoice:failed:{order_id}'
+
+
+def render_failed(order_id):
+    """True si el último render de la orden falló hace menos de INVOICE_FAILURE_TTL"""
+    return cache.get(_failed_key(order_id)) is not None
+
+
+def _render_logged(order_id):
+    try:
+        render_invoice(order_id)
+    except Exception:
+        logger.exception('No se pudo generar la factura de la orden %s', order_id)
+        cache.set(_failed_key(order_id), True, settings.INVOICE_FAILURE_TTL)
+
+
+def _render_in_worker(order_id):
+    try:
+        _render_logged(order_id)
+    finally:
+        with _lock:
+            _pending.discard(order_id)
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.INVOICE_WORKERS,
+                thread_name_prefix='invoices',
+            )
+        return _executor
+
+
+def schedule_invoice(order_id):
+    """
+    Encola el render de la factura (una sola vez por orden mientras esté pendiente)
+    """
+    if settings.INVOICE_WORKERS <= 0:
+        _render_logged(order_id)
+        return
+    with _lock:
+        if order_id in _pending:
+            return
+        _pending.add(order_id)
+    _get_executor().submit(_render_in_worker, order_id)
+
+
+def is_pending(order_id):
+    with _lock:
+        return order_id in _pending
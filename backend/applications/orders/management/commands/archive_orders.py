@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.orders.archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Mueve a la tabla de archivo las órdenes finalizadas más antiguas que el horizonte'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Antigüedad mínima en días (por defecto ORDER_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Órdenes por transacción')
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta las órdenes elegibles')
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--older-than-days y --batch-size deben ser positivos.')
+
+        cutoff = archive_cutoff(options['older_than_days'])
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'{count} órdenes anteriores a {cutoff:%Y-%m-%d} serían archivadas')
+            return
+
+        def log(total):
+            self.stdout.write(f'  Órdenes archivadas: {total}')
+
+        total = archive_orders(cutoff, batch_size=options['batch_size'], log=log)
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} órdenes archivadas'))
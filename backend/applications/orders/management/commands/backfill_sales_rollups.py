@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from applications.orders.analytics import backfill
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los rollups de ventas diarias desde las órdenes, por bloques de días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Fecha final inclusive (YYYY-MM-DD)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Días agregados por transacción')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = parse_date(options['date_from'] or '')
+            date_to = parse_date(options['date_to'] or '')
+        except ValueError:
+            date_from = date_to = None
+        if not date_from or not date_to or date_from > date_to:
+            raise CommandError('Rango de fechas inválido (YYYY-MM-DD).')
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days debe ser al menos 1.')
+
+        def log(start, end):
+            self.stdout.write(f'  Rollups recalculados: {start} → {end}')
+
+        start = backfill(date_from, date_to, chunk_days=options['chunk_days'], log=log)
+        if start != date_from:
+            skipped_to = date_to if start is None else start - timedelta(days=1)
+            self.stdout.write(self.style.WARNING(
+                f'  Se omitieron {date_from} → {skipped_to}: tienen órdenes archivadas y sus rollups se conservan'
+            ))
+        self.stdout.write(self.style.SUCCESS('✓ Backfill de rollups completado'))
@@ -0,0 +1,132 @@
+import itertools
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from applications.orders.invoices import invoice_filename, invoice_root
+from applications.orders.models import Order
+from applications.orders.pdf_generator import render_invoice_bytes
+
+
+class Command(BaseCommand):
+    help = 'Genera en paralelo las facturas PDF de las órdenes de un rango de fechas (cierre de mes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', required=True, help='Fecha final inclusive (YYYY-MM-DD)')
+        parser.add_argument('--output', help='Directorio destino (por defecto INVOICE_ROOT)')
+        parser.add_argument('--zip', dest='zip_path', help="Escribir un único zip ('-' para stdout)")
+        parser.add_argument('--workers', type=int, default=None, help='Procesos de render')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Órdenes leídas por lote')
+
+    def handle(self, *args, **options):
+        date_from = parse_date(options['date_from'] or '')
+        date_to = parse_date(options['date_to'] or '')
+        if not date_from or not date_to:
+            raise CommandError('Las fechas deben tener formato YYYY-MM-DD.')
+
+        start = timezone.make_aware(datetime.combine(date_from, dt_time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), dt_time.min))
+        orders = (
+            Order.objects.filter(created_at__gte=start, created_at__lt=end)
+            .prefetch_related('items')
+            .order_by('pk')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        zip_path = options['zip_path']
+        log = self.stderr if zip_path == '-' else self.stdout
+        sink = ZipSink(zip_path) if zip_path else DirectorySink(options['output'] or invoice_root())
+
+        rendered = skipped = pages = 0
+        started = time.monotonic()
+        with sink, ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            while True:
+                chunk = list(itertools.islice(orders, options['chunk_size']))
+                if not chunk:
+                    break
+                pending = []
+                for order in chunk:
+                    name = invoice_filename(order)
+                    if sink.exists(name):
+                        skipped += 1
+                    else:
+                        pending.append((name, order))
+
+                results = pool.map(render_invoice_bytes, [order for _, order in pending])
+                for (name, _), (content, page_count) in zip(pending, results):
+                    sink.write(name, content)
+                    rendered += 1
+                    pages += page_count
+
+                elapsed = time.monotonic() - started
+                log.write(
+                    f'  {rendered} facturas ({pages} páginas), {skipped} omitidas, '
+                    f'{pages / elapsed if elapsed else 0:.1f} pág/s'
+                )
+
+        elapsed = time.monotonic() - started
+        log.write(self.style.SUCCESS(
+            f'✓ {rendered} facturas generadas, {skipped} ya existían. '
+            f'{pages} páginas en {elapsed:.1f}s ({pages / elapsed if elapsed else 0:.1f} pág/s)'
+        ))
+
+
+class DirectorySink:
+    """
+    Un PDF por orden; los ya generados se omiten (reanudable)
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def __enter__(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.existing = {path.name for path in self.root.glob('*.pdf')}
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def exists(self, name):
+        return name in self.existing
+
+    def write(self, name, content):
+        tmp_path = self.root / f'{name}.tmp'
+        tmp_path.write_bytes(content)
+        tmp_path.replace(self.root / name)
+
+
+class ZipSink:
+    """
+    Todas las facturas en un zip. Si el archivo ya existe se abre en modo
+    append y se omiten las entradas presentes; '-' escribe a stdout.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        if self.path == '-':
+            self.zip = zipfile.ZipFile(sys.stdout.buffer, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            mode = 'a' if Path(self.path).exists() else 'w'
+            self.zip = zipfile.ZipFile(self.path, mode, zipfile.ZIP_DEFLATED)
+        self.existing = set(self.zip.namelist())
+        return self
+
+    def __exit__(self, *exc):
+        self.zip.close()
+        return False
+
+    def exists(self, name):
+        return name in self.existing
+
+    def write(self, name, content):
+        self.zip.writestr(name, content)
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from applications.products.models import Product
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from applications.products.models import Category, Product
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -52,6 +55,12 @@ class Order(models.Model):
         verbose_name = 'Orden'
         verbose_name_plural = 'Órdenes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
+            # created_at crece con el id: un BRIN es diminuto y sirve los rangos de fechas
+            BrinIndex(fields=['created_at'], name='orders_order_created_brin'),
+        ]
 
     def __str__(self):
         return f"Orden {self.order_number} - {self.user.username}"
@@ -102,7 +111,115 @@ class Coupon(models.Model):
     is_active = models.BooleanField(default=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     usage_limit = models.IntegerField(null=True, blank=True)
+    per_user_limit = models.IntegerField(null=True, blank=True)
     used_count = models.IntegerField(default=0)
 
     def __str__(self):
         return self.code
+
+    def is_redeemable(self, now=None):
+        """Activo, no vencido y con usos disponibles (según used_count leído)"""
+        now = now or timezone.now()
+        if not self.is_active:
+            return False
+        if self.expires_at and self.expires_at <= now:
+            return False
+        if self.usage_limit is not None and self.used_count >= self.usage_limit:
+            return False
+        return True
+
+class CouponRedemption(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coupon_redemptions')
+    order = models.OneToOneField(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='coupon_redemption')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Canje de Cupón'
+        verbose_name_plural = 'Canjes de Cupones'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['coupon', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon.code} - {self.user.username}"
+
+class ArchivedOrder(models.Model):
+    """
+    Orden finalizada movida fuera de las tablas vivas (ver archive.py).
+    Conserva el mismo id y número; `payload` guarda el detalle completo
+    (items e historial) tal como lo entrega la API.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    is_paid = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    item_count = models.IntegerField(default=0)
+    first_item_name = models.CharField(max_length=255, null=True, blank=True)
+    first_item_quantity = models.PositiveIntegerField(null=True, blank=True)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Orden Archivada'
+        verbose_name_plural = 'Órdenes Archivadas'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Orden archivada {self.order_number}"
+
+class DailySales(models.Model):
+    """Totales diarios por método de pago (rollup incremental, ver analytics.py)"""
+    date = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_CHOICES)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta Diaria'
+        verbose_name_plural = 'Ventas Diarias'
+        ordering = ['-date']
+        unique_together = [('date', 'payment_method')]
+
+    def __str__(self):
+        return f"{self.date} {self.payment_method}: {self.revenue}"
+
+class DailyProductSales(models.Model):
+    """Unidades e ingresos diarios por producto"""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta Diaria por Producto'
+        verbose_name_plural = 'Ventas Diarias por Producto'
+        ordering = ['-date']
+        unique_together = [('date', 'product')]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.units}"
+
+class DailyCategorySales(models.Model):
+    """Unidades e ingresos diarios por categoría"""
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta Diaria por Categoría'
+        verbose_name_plural = 'Ventas Diarias por Categoría'
+        ordering = ['-date']
+        unique_together = [('date', 'category')]
+
+    def __str__(self):
+        return f"{self.date} {self.category_id}: {self.units}"
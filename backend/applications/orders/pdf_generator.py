@@ -1,9 +1,17 @@
+import io
+
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from datetime import datetime
 
+BOTTOM_MARGIN = 1 * inch
+
 def generate_invoice_pdf(order, file_path):
+    """
+    Dibuja la factura en `file_path` (ruta o archivo binario).
+    Retorna el número de páginas generadas.
+    """
     c = canvas.Canvas(file_path, pagesize=letter)
     width, height = letter
 
@@ -25,9 +33,19 @@ def generate_invoice_pdf(order, file_path):
 
     c.setFont("Helvetica", 12)
     for item in order.items.all():
+        if y < BOTTOM_MARGIN:
+            # Órdenes largas continúan en una página nueva
+            c.showPage()
+            c.setFont("Helvetica", 12)
+            y = height - 1 * inch
         c.drawString(1 * inch, y, f"{item.quantity} x {item.product_name} - S/ {item.product_price:.2f}")
         y -= 0.25 * inch
 
+    if y < BOTTOM_MARGIN + 1.5 * inch:
+        c.showPage()
+        c.setFont("Helvetica", 12)
+        y = height - 1 * inch
+
     y -= 0.25 * inch
     c.drawString(1 * inch, y, f"Subtotal: S/ {order.subtotal:.2f}")
     y -= 0.25 * inch
@@ -35,7 +53,21 @@ def generate_invoice_pdf(order, file_path):
     y -= 0.25 * inch
     c.drawString(1 * inch, y, f"IVA: S/ {order.tax:.2f}")
     y -= 0.25 * inch
+    if order.discount:
+        c.drawString(1 * inch, y, f"Descuento: -S/ {order.discount:.2f}")
+        y -= 0.25 * inch
     c.drawString(1 * inch, y, f"Total: S/ {order.total:.2f}")
 
+    pages = c.getPageNumber()
     c.showPage()
     c.save()
+    return pages
+
+def render_invoice_bytes(order):
+    """
+    Genera la factura en memoria; retorna (contenido PDF, páginas).
+    Pensada para ejecutarse en procesos hijos (la orden debe traer sus items).
+    """
+    buffer = io.BytesIO()
+    pages = generate_invoice_pdf(order, buffer)
+    return buffer.getvalue(), pages
@@ -5,4 +5,5 @@ class IsOwner(permissions.BasePermission):
     Permiso personalizado: solo el usuario dueño puede acceder o modificar la orden.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        # Compara ids para no cargar el usuario de la orden
+        return obj.user_id == request.user.id
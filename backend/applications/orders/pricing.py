@@ -0,0 +1,120 @@
+"""
+Motor de precios compartido por carrito, checkout y validación de cupones.
+
+`quote()` es una función pura: recibe líneas (product_id, precio unitario,
+cantidad) y un cupón opcional y retorna el desglose en Decimal, sin tocar
+la base de datos. Las reglas de impuestos se memorizan y los cupones se
+obtienen de la caché de `coupons.find_coupon`.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+CENTS = Decimal('0.01')
+ZERO = Decimal('0')
+
+
+def to_money(value):
+    return Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class PriceLine:
+    product_id: int
+    unit_price: Decimal
+    quantity: int
+    subtotal: Decimal
+
+
+@dataclass(frozen=True)
+class Quote:
+    lines: list = field(default_factory=list)
+    subtotal: Decimal = ZERO
+    shipping_cost: Decimal = ZERO
+    tax: Decimal = ZERO
+    discount: Decimal = ZERO
+    total: Decimal = ZERO
+    coupon_code: str = None
+
+    def as_dict(self):
+        return {
+            'lines': [
+                {
+                    'product_id': line.product_id,
+                    'unit_price': str(line.unit_price),
+                    'quantity': line.quantity,
+                    'subtotal': str(line.subtotal),
+                }
+                for line in self.lines
+            ],
+            'subtotal': str(self.subtotal),
+            'shipping_cost': str(self.shipping_cost),
+            'tax': str(self.tax),
+            'discount': str(self.discount),
+            'total': str(self.total),
+            'coupon_code': self.coupon_code,
+        }
+
+
+@lru_cache(maxsize=None)
+def tax_rate():
+    return Decimal(str(getattr(settings, 'PRICING_TAX_RATE', '0.18')))
+
+
+@lru_cache(maxsize=None)
+def shipping_cost():
+    return to_money(str(getattr(settings, 'PRICING_SHIPPING_COST', '10')))
+
+
+@receiver(setting_changed)
+def _reset_tax_rules(setting, **kwargs):
+    if setting in ('PRICING_TAX_RATE', 'PRICING_SHIPPING_COST'):
+        tax_rate.cache_clear()
+        shipping_cost.cache_clear()
+
+
+def line_subtotal(unit_price, quantity):
+    return to_money(unit_price * quantity)
+
+
+def coupon_discount(coupon, subtotal):
+    """
+    Descuento de un cupón sobre el subtotal; nunca mayor que el subtotal
+    """
+    if coupon is None:
+        return ZERO
+    if coupon.discount_type == 'amount':
+        discount = coupon.discount_value
+    elif coupon.discount_type == 'percent':
+        discount = subtotal * coupon.discount_value / 100
+    else:
+        discount = ZERO
+    return to_money(min(discount, subtotal))
+
+
+def quote(lines, coupon=None):
+    """
+    Cotiza una lista de líneas (product_id, precio unitario, cantidad).
+    Impuesto sobre el subtotal, envío fijo y descuento del cupón.
+    """
+    priced = [
+        PriceLine(product_id, to_money(unit_price), quantity, line_subtotal(unit_price, quantity))
+        for product_id, unit_price, quantity in lines
+    ]
+    subtotal = sum((line.subtotal for line in priced), ZERO)
+    shipping = shipping_cost() if priced else ZERO
+    tax = to_money(subtotal * tax_rate())
+    discount = coupon_discount(coupon, subtotal)
+    return Quote(
+        lines=priced,
+        subtotal=subtotal,
+        shipping_cost=shipping,
+        tax=tax,
+        discount=discount,
+        total=subtotal + shipping + tax - discount,
+        coupon_code=coupon.code if coupon else None,
+    )
@@ -1,8 +1,8 @@
 from rest_framework import serializers
-from decimal import Decimal
 from django.utils import timezone
 from .models import Order, OrderItem, OrderStatusHistory, Coupon
-from applications.products.models import Product
+from .checkout import InsufficientStock, load_products, place_order, requested_quantities
+from .coupons import CouponUnavailable, find_coupon
 
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,13 +22,30 @@ class OrderStatusHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_by', 'created_at']
 
 class OrderListSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, read_only=True)
+    """
+    Vista compacta: cantidad de items y primer item (ver utils.with_item_summary).
+    Acepta también filas de `archive.order_history` (diccionarios).
+    """
+    user = serializers.IntegerField(source='user_id', read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    first_item = serializers.SerializerMethodField()
     class Meta:
         model = Order
         fields = [
             'id', 'order_number', 'user', 'status', 'total', 'is_paid',
-            'created_at', 'items'
+            'created_at', 'item_count', 'first_item'
         ]
+        read_only_fields = ['status', 'total', 'is_paid']
+
+    def get_first_item(self, obj):
+        if not isinstance(obj, dict):
+            obj = {
+                'first_item_name': getattr(obj, 'first_item_name', None),
+                'first_item_quantity': getattr(obj, 'first_item_quantity', None),
+            }
+        if not obj['first_item_name']:
+            return None
+        return {'product_name': obj['first_item_name'], 'quantity': obj['first_item_quantity']}
 
 class OrderDetailSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -36,20 +53,15 @@ class OrderDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = ['status', 'total', 'is_paid', 'paid_at']
 
 class OrderCreateItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField()
 
     def validate(self, data):
-        try:
-            product = Product.objects.get(id=data['product_id'], is_active=True)
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Producto no encontrado o inactivo.")
         if data['quantity'] < 1:
             raise serializers.ValidationError("La cantidad debe ser al menos 1.")
-        if data['quantity'] > product.stock:
-            raise serializers.ValidationError(f"Stock insuficiente ({product.stock})")
         return data
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -66,6 +78,20 @@ class OrderCreateSerializer(serializers.ModelSerializer):
     def validate_items(self, value):
         if not value or len(value) == 0:
             raise serializers.ValidationError("Seleccione al menos un producto.")
+
+        # Una sola consulta para todos los productos; se reutiliza en create()
+        self.products = load_products(item['product_id'] for item in value)
+        for product_id, quantity in requested_quantities(value).items():
+            product = self.products.get(product_id)
+            if product is None:
+                raise serializers.ValidationError("Producto no encontrado o inactivo.")
+            if quantity > product.stock:
+                raise serializers.ValidationError(f"Stock insuficiente ({product.stock})")
+        return value
+
+    def validate_coupon_code(self, value):
+        if value and find_coupon(value) is None:
+            raise serializers.ValidationError("Cupón inválido, vencido o agotado.")
         return value
 
     def create(self, validated_data):
@@ -78,60 +104,29 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         validated_data.pop('is_paid', None)
         validated_data.pop('paid_at', None)
 
-        subtotal = Decimal('0')
-        for item in items_data:
-            product = Product.objects.get(id=item['product_id'])
-            subtotal += product.final_price * item['quantity']
-
-        shipping_cost = Decimal('10')
-        tax = subtotal * Decimal('0.18')
-        discount = Decimal('0')
-        applied_coupon = None
-
-        if coupon_code:
-            try:
-                coupon = Coupon.objects.get(code=coupon_code, is_active=True)
-                if coupon.discount_type == 'amount':
-                    discount = coupon.discount_value
-                elif coupon.discount_type == 'percent':
-                    discount = subtotal * (coupon.discount_value / 100)
-                applied_coupon = coupon
-            except Coupon.DoesNotExist:
-                pass
-
-        total = subtotal + shipping_cost + tax - discount
-
-        order = Order.objects.create(
-            user=user,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            tax=tax,
-            discount=discount,
-            total=total,
-            status='confirmed',
-            is_paid=True,
-            paid_at=timezone.now(),
-            **validated_data,
-        )
-        for item in items_data:
-            product = Product.objects.get(id=item['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                product_name=product.name,
-                product_sku=getattr(product, 'sku', ''),
-                product_price=product.final_price,
-                quantity=item['quantity'],
-                subtotal=product.final_price * item['quantity'],
+        try:
+            return place_order(
+                user,
+                items_data,
+                self.products,
+                coupon_code=coupon_code,
+                status='confirmed',
+                is_paid=True,
+                paid_at=timezone.now(),
+                **validated_data,
             )
-            product.stock -= item['quantity']
-            product.save()
-        if applied_coupon:
-            applied_coupon.used_count += 1
-            applied_coupon.save()
-        return order
+        except InsufficientStock as e:
+            raise serializers.ValidationError({'items': [str(e)]})
+        except CouponUnavailable as e:
+            raise serializers.ValidationError({'coupon_code': [str(e)]})
 
 class CouponSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coupon
         fields = "__all__"
+
+class BulkTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    orders = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    tracking_numbers = serializers.DictField(child=serializers.CharField(max_length=100), required=False)
+    comment = serializers.CharField(required=False, allow_blank=True)
@@ -1,20 +1,8 @@
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.utils import timezone
-from .models import Order, OrderStatusHistory, OrderItem
-from applications.products.models import Product
-
-@receiver(pre_save, sender=Order)
-def calculate_totals(sender, instance, **kwargs):
-    # Calcula subtotal sumando items
-    if instance.pk is None:
-        subtotal = 0
-        for item in instance.items.all():
-            subtotal += item.subtotal
-        instance.subtotal = subtotal
-        instance.tax = subtotal * 0.18  # 18% IVA ejemplo
-        instance.total = subtotal + instance.shipping_cost + instance.tax - instance.discount
-    # Se puede agregar más lógica
+from .models import Order, OrderStatusHistory
+from .invoices import schedule_invoice
 
 @receiver(post_save, sender=Order)
 def create_status_history(sender, instance, created, **kwargs):
@@ -27,10 +15,8 @@ def create_status_history(sender, instance, created, **kwargs):
         )
 
 @receiver(post_save, sender=Order)
-def update_stock(sender, instance, created, **kwargs):
-    if created:
-        for item in instance.items.all():
-            product = item.product
-            if product:
-                product.stock = max(product.stock - item.quantity, 0)
-                product.save()
+def render_invoice_on_change(sender, instance, **kwargs):
+    # El render se omite si el contenido facturable no cambió (mismo hash)
+    if instance.is_paid or instance.status != 'pending':
+        order_id = instance.pk
+        transaction.on_commit(lambda: schedule_invoice(order_id))
@@ -1,13 +1,18 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from applications.cart.cleanup import purge_expired_sessions, purge_stale_carts
+from applications.notifications.outbox import enqueue_email
 
 @shared_task
 def send_order_confirmation_email(user_email, order_number):
+    # Solo encola: el dispatcher del outbox hace el envío real
     subject = f"Confirmación de Orden {order_number}"
     message = f"Gracias por su compra. Su orden número {order_number} ha sido recibida."
-    send_mail(subject, message, 'no-reply@ecommerce.com', [user_email])
+    return enqueue_email(user_email, subject, message, kind='order_confirmation').pk
 
 @shared_task
 def clean_old_carts():
-    # Aquí la lógica para limpiar carritos antiguos
-    pass
+    # Purga por lotes de carritos abandonados y sesiones expiradas
+    return {
+        'carts': purge_stale_carts(),
+        'sessions': purge_expired_sessions(),
+    }
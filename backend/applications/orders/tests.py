@@ -1,12 +1,42 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Cart, CartItem
-from applications.products.models import Product
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from applications.cart.models import Cart, CartItem
+from applications.notifications.models import OutboxEmail
+from applications.products.inventory import enable_sharding
+from applications.products.models import Category, Product, StockShard
+from datetime import timedelta
+from django.utils import timezone
+from .analytics import backfill
+from .archive import archive_cutoff, archive_orders
+from .coupons import clear_coupon_cache
+from .invoices import _render_in_worker, invoice_path, is_pending, render_failed
+from .models import (
+    ArchivedOrder, Coupon, CouponRedemption, DailyCategorySales, DailyProductSales, DailySales,
+    Order, OrderItem, OrderStatusHistory
+)
+from .transitions import transition_orders
+from .pricing import quote
 
 class CartTestCase(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
-        self.product = Product.objects.create(name='Silla', price=50, stock=20, is_active=True)
+        self.category = Category.objects.create(name='Sillas')
+        self.product = Product.objects.create(
+            name='Silla', sku='SIL-001', description='Silla', category=self.category,
+            price=50, stock=20, is_active=True
+        )
         self.cart = Cart.objects.create(user=self.user)
         self.cart_item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
 
@@ -17,9 +47,513 @@ class CartTestCase(TestCase):
         self.assertEqual(self.cart.total_items, 2)
 
     def test_add_item(self):
-        new_item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=3)
+        other = Product.objects.create(
+            name='Banco', sku='BAN-001', description='Banco', category=self.category,
+            price=30, stock=20, is_active=True
+        )
+        new_item = CartItem.objects.create(cart=self.cart, product=other, quantity=3)
         self.assertEqual(self.cart.total_items, 5)
 
     def test_remove_item(self):
         self.cart_item.delete()
         self.assertEqual(self.cart.items.count(), 0)
+
+class CheckoutMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(name='Mesas')
+        self.products = [
+            Product.objects.create(
+                name=f'Mesa {i}', sku=f'MES-{i:03d}', description='Mesa', category=self.category,
+                price=100, stock=10, is_active=True
+            )
+            for i in range(5)
+        ]
+
+    def payload(self, products, quantity=2):
+        return {
+            'full_name': 'Ana Pérez', 'email': 'ana@example.com', 'phone': '999999999',
+            'address_line1': 'Av. Siempre Viva 123', 'city': 'Lima', 'state': 'Lima',
+            'postal_code': '15001', 'country': 'Perú',
+            'items': [{'product_id': p.id, 'quantity': quantity} for p in products],
+        }
+
+    def place(self, products, quantity=2):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/orders/', self.payload(products, quantity), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(ctx.captured_queries)
+
+class CheckoutTestCase(CheckoutMixin, TestCase):
+    def test_checkout_creates_items_and_decrements_stock(self):
+        self.place(self.products[:2], quantity=3)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.subtotal, Decimal('600'))
+        self.assertEqual(order.total, Decimal('600') + Decimal('10') + Decimal('108'))
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 7)
+
+    def test_checkout_query_count_is_constant(self):
+        single = self.place(self.products[:1])
+        many = self.place(self.products)
+        self.assertEqual(single, many)
+        self.assertEqual(OrderItem.objects.count(), 6)
+
+    def test_checkout_queues_confirmation_email(self):
+        self.place(self.products[:1])
+        email = OutboxEmail.objects.get(kind='order_confirmation')
+        self.assertEqual(email.to, 'ana@example.com')
+        self.assertIn(Order.objects.get().order_number, email.subject)
+
+    def test_checkout_rejects_insufficient_stock(self):
+        response = self.client.post('/api/orders/', self.payload(self.products[:1], quantity=11), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_duplicate_lines_are_checked_against_total_stock(self):
+        payload = self.payload([self.products[0], self.products[0]], quantity=6)
+        response = self.client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_reserves_from_stock_shards(self):
+        enable_sharding(self.products[0], shards=4)
+        self.place(self.products[:2], quantity=3)
+        self.assertEqual(sum(StockShard.objects.values_list('quantity', flat=True)), 7)
+        # El modelo de lectura se actualiza en la reconciliación, no en el checkout
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 10)
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[1].stock, 7)
+
+    def test_checkout_applies_coupon(self):
+        Coupon.objects.create(code='DESC10', discount_type='percent', discount_value=10)
+        payload = self.payload(self.products[:1], quantity=1)
+        payload['coupon_code'] = 'DESC10'
+        response = self.client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.discount, Decimal('10.00'))
+        self.assertEqual(order.total, Decimal('118.00'))
+
+class CouponRedemptionTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        clear_coupon_cache()
+
+    def order_with_coupon(self, code):
+        payload = self.payload(self.products[:1], quantity=1)
+        payload['coupon_code'] = code
+        return self.client.post('/api/orders/', payload, format='json')
+
+    def test_usage_limit_enforced_in_sql_even_with_cached_definition(self):
+        Coupon.objects.create(code='UNICO', discount_type='amount', discount_value=5, usage_limit=1)
+        self.assertEqual(self.order_with_coupon('UNICO').status_code, 201)
+        # La definición en caché aún dice used_count=0; el UPDATE condicional la rechaza
+        response = self.order_with_coupon('UNICO')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('coupon_code', response.data)
+        self.assertEqual(Coupon.objects.get(code='UNICO').used_count, 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_coupon_is_rejected(self):
+        Coupon.objects.create(
+            code='VIEJO', discount_type='amount', discount_value=5,
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        response = self.order_with_coupon('VIEJO')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/orders/validate-coupon/', {'code': 'VIEJO'}).data['valid'], False)
+
+    def test_per_user_limit_uses_redemption_ledger(self):
+        Coupon.objects.create(code='UNAVEZ', discount_type='amount', discount_value=5, per_user_limit=1)
+        self.assertEqual(self.order_with_coupon('UNAVEZ').status_code, 201)
+        self.assertEqual(self.order_with_coupon('UNAVEZ').status_code, 400)
+        redemption = CouponRedemption.objects.get()
+        self.assertEqual(redemption.user, self.user)
+        self.assertEqual(Coupon.objects.get(code='UNAVEZ').used_count, 1)
+
+    def test_validate_coupon_is_served_from_cache(self):
+        Coupon.objects.create(code='RAPIDO', discount_type='percent', discount_value=15)
+        self.client.post('/api/orders/validate-coupon/', {'code': 'RAPIDO'})
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/orders/validate-coupon/', {'code': 'RAPIDO'})
+        self.assertTrue(response.data['valid'])
+
+class OrderListingTestCase(CheckoutMixin, TestCase):
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_is_compact_and_constant(self):
+        self.place(self.products[:1], quantity=1)
+        single, _ = self.count_queries('/api/orders/')
+        for _ in range(4):
+            self.place(self.products, quantity=1)
+        many, response = self.count_queries('/api/orders/')
+        self.assertEqual(single, many)
+        first = response.data['results'][0]
+        self.assertNotIn('items', first)
+        self.assertEqual(first['item_count'], 5)
+        self.assertEqual(first['first_item'], {'product_name': 'Mesa 0', 'quantity': 1})
+
+    def test_detail_prefetches_items_and_history(self):
+        self.place(self.products[:1], quantity=1)
+        small = Order.objects.get()
+        small_count, _ = self.count_queries(f'/api/orders/{small.order_number}/')
+        self.place(self.products, quantity=1)
+        large = Order.objects.exclude(pk=small.pk).get()
+        large_count, response = self.count_queries(f'/api/orders/{large.order_number}/')
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data['items']), 5)
+        self.assertEqual(len(response.data['history']), 1)
+
+class OrderArchiveTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for _ in range(3):
+            self.place(self.products[:2], quantity=1)
+        self.old = list(Order.objects.order_by('pk')[:2])
+        Order.objects.filter(pk__in=[o.pk for o in self.old]).update(
+            status='delivered', created_at=timezone.now() - timedelta(days=400)
+        )
+
+    def test_archives_only_old_finished_orders(self):
+        Order.objects.exclude(pk__in=[o.pk for o in self.old]).update(created_at=timezone.now() - timedelta(days=400))
+        archived = archive_orders(archive_cutoff(365), batch_size=1)
+        self.assertEqual(archived, 2)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[o.pk for o in self.old]).exists())
+        self.assertEqual(ArchivedOrder.objects.get(pk=self.old[0].pk).item_count, 2)
+
+    def test_history_reads_live_and_archived_orders(self):
+        archive_orders(archive_cutoff(365))
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response.data['count'], 3)
+        numbers = [row['order_number'] for row in response.data['results']]
+        self.assertEqual(numbers[-2:], [o.order_number for o in reversed(self.old)])
+        self.assertEqual(response.data['results'][-1]['first_item'], {'product_name': 'Mesa 0', 'quantity': 1})
+
+        detail = self.client.get(f'/api/orders/{self.old[0].order_number}/')
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(len(detail.data['items']), 2)
+        self.assertEqual(detail.data['status'], 'delivered')
+
+        other = User.objects.create_user(username='otro', password='pass')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/orders/{self.old[0].order_number}/').status_code, 404)
+
+class OrderTransitionTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for _ in range(3):
+            self.place(self.products[:2], quantity=1)
+        self.numbers = list(Order.objects.values_list('order_number', flat=True))
+        self.staff = User.objects.create_user(username='ops', password='pass', is_staff=True)
+
+    def bulk(self, payload):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        return client.post('/api/orders/bulk-transition/', payload, format='json')
+
+    def test_only_allowed_transitions_are_applied(self):
+        response = self.bulk({'status': 'shipped', 'orders': self.numbers})
+        self.assertEqual(response.data['updated'], 0)
+        self.assertEqual(sorted(response.data['skipped']), sorted(self.numbers))
+
+        self.bulk({'status': 'processing', 'orders': self.numbers})
+        tracking = {self.numbers[0]: 'TRK-1'}
+        response = self.bulk({'status': 'shipped', 'orders': self.numbers, 'tracking_numbers': tracking})
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        self.assertEqual(Order.objects.get(order_number=self.numbers[0]).tracking_number, 'TRK-1')
+        self.assertEqual(OrderStatusHistory.objects.filter(status='shipped').count(), 3)
+
+    def test_batch_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as one:
+            transition_orders(self.numbers[:1], 'processing')
+        with CaptureQueriesContext(connection) as many:
+            transition_orders(self.numbers[1:], 'processing')
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+
+    def test_bulk_cancel_restores_stock(self):
+        transition_orders(self.numbers, 'cancelled', comment='Sin pago')
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 10)
+        self.assertEqual(OrderStatusHistory.objects.filter(status='cancelled').count(), 3)
+
+    def test_customer_cancel_uses_state_machine(self):
+        response = self.client.put(f'/api/orders/{self.numbers[0]}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[1].stock, 8)
+        response = self.client.put(f'/api/orders/{self.numbers[0]}/cancel/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_cannot_be_edited_outside_the_state_machine(self):
+        url = f'/api/orders/{self.numbers[0]}/'
+        for method in ('patch', 'put', 'delete'):
+            response = getattr(self.client, method)(url, {'status': 'delivered', 'total': '0.01'}, format='json')
+            self.assertEqual(response.status_code, 405)
+        order = Order.objects.get(order_number=self.numbers[0])
+        self.assertEqual(order.status, 'confirmed')
+        self.assertFalse(OrderStatusHistory.objects.filter(status='delivered').exists())
+
+    def test_bulk_transition_requires_staff(self):
+        response = self.client.post('/api/orders/bulk-transition/', {'status': 'processing', 'orders': self.numbers}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+class SalesRollupTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Los rollups (y las facturas) se aplican en on_commit
+        invoice_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, invoice_root, ignore_errors=True)
+        override = override_settings(INVOICE_ROOT=invoice_root, INVOICE_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def place(self, products, quantity=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().place(products, quantity)
+
+    def cancel(self, numbers):
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_orders(numbers, 'cancelled')
+
+    def snapshot(self):
+        return (
+            sorted(DailySales.objects.values_list('date', 'payment_method', 'orders', 'units', 'revenue')),
+            sorted(DailyProductSales.objects.values_list('date', 'product_id', 'units', 'revenue')),
+            sorted(DailyCategorySales.objects.values_list('date', 'category_id', 'units', 'revenue')),
+        )
+
+    def test_rollups_follow_orders_and_cancellations(self):
+        self.place(self.products[:2], quantity=2)
+        self.place(self.products[:1], quantity=1)
+        daily = DailySales.objects.get()
+        self.assertEqual((daily.orders, daily.units), (2, 5))
+        self.assertEqual(DailyProductSales.objects.get(product=self.products[0]).units, 3)
+        self.assertEqual(DailyCategorySales.objects.get().revenue, Decimal('500.00'))
+
+        self.cancel([Order.objects.order_by('pk').first().order_number])
+        daily.refresh_from_db()
+        self.assertEqual((daily.orders, daily.units), (1, 1))
+        self.assertEqual(DailyProductSales.objects.get(product=self.products[1]).units, 0)
+
+    def test_checkout_does_not_touch_rollup_rows(self):
+        self.place(self.products[:1])
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/orders/', self.payload(self.products[:2]), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'orders_daily' in q['sql']])
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(DailySales.objects.get().orders, 2)
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.place(self.products[:3], quantity=2)
+        self.place(self.products[1:], quantity=1)
+        self.cancel([Order.objects.order_by('pk').first().order_number])
+        incremental = self.snapshot()
+        DailySales.objects.all().delete()
+        today = timezone.localdate().isoformat()
+        call_command('backfill_sales_rollups', '--from', today, '--to', today, stdout=io.StringIO())
+        # El backfill no crea filas en cero para lo cancelado
+        rebuilt = self.snapshot()
+        self.assertEqual(rebuilt[0], incremental[0])
+        self.assertEqual([row for row in incremental[1] if row[2]], rebuilt[1])
+
+    def test_backfill_keeps_rollups_of_archived_days(self):
+        self.place(self.products[:2], quantity=1)
+        self.place(self.products[:1], quantity=1)
+        old_day = timezone.localdate() - timedelta(days=400)
+        old_order = Order.objects.order_by('pk').first()
+        Order.objects.filter(pk=old_order.pk).update(
+            status='delivered', created_at=timezone.now() - timedelta(days=400)
+        )
+        today = timezone.localdate()
+        backfill(old_day, today)
+        self.assertEqual(DailySales.objects.get(date=old_day).orders, 1)
+
+        archive_orders(archive_cutoff(365))
+        out = io.StringIO()
+        call_command('backfill_sales_rollups', '--from', old_day.isoformat(), '--to', today.isoformat(), stdout=out)
+        self.assertIn('Se omitieron', out.getvalue())
+        self.assertEqual(DailySales.objects.get(date=old_day).orders, 1)
+        self.assertEqual(DailyProductSales.objects.get(date=old_day, product=self.products[1]).units, 1)
+        self.assertEqual(DailySales.objects.get(date=today).orders, 1)
+        self.assertIsNone(backfill(old_day, old_day))
+
+    def test_backfill_rejects_empty_chunks(self):
+        today = timezone.localdate().isoformat()
+        for chunk_days in ('0', '-3'):
+            with self.assertRaisesMessage(CommandError, '--chunk-days'):
+                call_command('backfill_sales_rollups', '--from', today, '--to', today, '--chunk-days', chunk_days)
+        with self.assertRaises(ValueError):
+            backfill(timezone.localdate(), timezone.localdate(), chunk_days=0)
+        with self.assertRaisesMessage(CommandError, 'Rango de fechas'):
+            call_command('backfill_sales_rollups', '--from', '2024-13-01', '--to', today)
+
+    def test_analytics_endpoints_are_staff_only(self):
+        self.place(self.products[:2], quantity=1)
+        self.assertEqual(self.client.get('/api/orders/analytics/daily/').status_code, 403)
+        staff = User.objects.create_user(username='finanzas', password='pass', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        with self.assertNumQueries(1):
+            response = client.get('/api/orders/analytics/daily/')
+        self.assertEqual(response.data[0]['orders'], 1)
+        self.assertEqual(response.data[0]['average_order_value'], Decimal('246.00'))
+        response = client.get('/api/orders/analytics/products/')
+        self.assertEqual(len(response.data), 2)
+        response = client.get('/api/orders/analytics/products/?limit=-5')
+        self.assertEqual(len(response.data), 1)
+
+    def test_analytics_rejects_invalid_ranges(self):
+        staff = User.objects.create_user(username='finanzas', password='pass', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        for query in ('from=2024-13-01', 'to=ayer', 'from=2024-03-02&to=2024-03-01', 'from=2020-01-01&to=2024-01-01'):
+            for endpoint in ('daily', 'payment-methods', 'products', 'categories'):
+                response = client.get(f'/api/orders/analytics/{endpoint}/?{query}')
+                self.assertEqual(response.status_code, 400, (endpoint, query))
+        response = client.get('/api/orders/analytics/daily/?from=2024-01-01&to=2024-12-31')
+        self.assertEqual(response.status_code, 200)
+
+class InvoiceTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.invoice_root, ignore_errors=True)
+        override = override_settings(INVOICE_ROOT=self.invoice_root, INVOICE_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.place(self.products[:2])
+        self.order = Order.objects.get(user=self.user)
+        self.addCleanup(cache.clear)
+
+    def url(self):
+        return f'/api/orders/{self.order.order_number}/invoice/'
+
+    def download(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_invoice_is_rendered_once_and_served_with_etag(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        etag = response['ETag']
+
+        with mock.patch('applications.orders.invoices.generate_invoice_pdf') as generate:
+            response = self.client.get(self.url())
+            self.assertEqual(response.status_code, 200)
+            b''.join(response.streaming_content)
+            generate.assert_not_called()
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_status_change_produces_new_file(self):
+        old_path = invoice_path(self.order)
+        self.download()
+        self.assertTrue(old_path.exists())
+
+        self.order.status = 'shipped'
+        self.order.save()
+        new_path = invoice_path(self.order)
+        self.download()
+        self.assertTrue(new_path.exists())
+        self.assertFalse(old_path.exists())
+
+    @override_settings(INVOICE_WORKERS=2)
+    def test_pending_invoice_returns_202(self):
+        with mock.patch('applications.orders.views.schedule_invoice') as schedule:
+            response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        schedule.assert_called_once_with(self.order.pk)
+
+    def test_failed_render_is_logged_and_returns_503(self):
+        error = mock.patch('applications.orders.invoices.generate_invoice_pdf', side_effect=OSError('disco lleno'))
+        with error as generate, self.assertLogs('applications.orders', 'ERROR') as logs:
+            response = self.client.get(self.url())
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '60')
+            # Mientras dura la marca no se reintenta el render
+            self.assertEqual(self.client.get(self.url()).status_code, 503)
+        self.assertEqual(generate.call_count, 1)
+        self.assertTrue(render_failed(self.order.pk))
+        self.assertIn('disco lleno', logs.output[0])
+
+    def test_worker_failure_is_logged_and_clears_pending(self):
+        with mock.patch('applications.orders.invoices.generate_invoice_pdf', side_effect=OSError('disco lleno')), \
+                self.assertLogs('applications.orders', 'ERROR'):
+            _render_in_worker(self.order.pk)
+        self.assertTrue(render_failed(self.order.pk))
+        self.assertFalse(is_pending(self.order.pk))
+
+    def test_file_removed_before_open_is_still_pending(self):
+        with mock.patch('applications.orders.views.schedule_invoice'), \
+                mock.patch('pathlib.Path.exists', return_value=True):
+            response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 202)
+
+class GenerateInvoicesCommandTestCase(CheckoutMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.place(self.products[:2])
+        self.place(self.products[2:])
+        self.target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.target, ignore_errors=True)
+        today = timezone.localdate().isoformat()
+        self.args = ['generate_invoices', '--from', today, '--to', today, '--workers', '2']
+
+    def test_renders_directory_and_resumes(self):
+        out = io.StringIO()
+        call_command(*self.args, '--output', self.target, stdout=out)
+        files = sorted(Path(self.target).glob('*.pdf'))
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].read_bytes().startswith(b'%PDF'))
+        self.assertIn('2 facturas generadas', out.getvalue())
+
+        out = io.StringIO()
+        call_command(*self.args, '--output', self.target, stdout=out)
+        self.assertIn('0 facturas generadas, 2 ya existían', out.getvalue())
+
+    def test_renders_zip(self):
+        zip_path = Path(self.target) / 'facturas.zip'
+        call_command(*self.args, '--zip', str(zip_path), stdout=io.StringIO())
+        with zipfile.ZipFile(zip_path) as archive:
+            names = archive.namelist()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(name.startswith('ORD-') for name in names))
+
+class PricingTestCase(SimpleTestCase):
+    def test_quote_breakdown(self):
+        result = quote([(1, Decimal('19.99'), 3), (2, Decimal('5'), 1)])
+        self.assertEqual([line.subtotal for line in result.lines], [Decimal('59.97'), Decimal('5.00')])
+        self.assertEqual(result.subtotal, Decimal('64.97'))
+        self.assertEqual(result.tax, Decimal('11.69'))
+        self.assertEqual(result.total, Decimal('86.66'))
+
+    def test_amount_coupon_never_exceeds_subtotal(self):
+        coupon = Coupon(code='GRANDE', discount_type='amount', discount_value=Decimal('500'))
+        result = quote([(1, Decimal('20'), 1)], coupon)
+        self.assertEqual(result.discount, Decimal('20.00'))
+        self.assertEqual(result.coupon_code, 'GRANDE')
+
+    @override_settings(PRICING_TAX_RATE='0.10', PRICING_SHIPPING_COST='0')
+    def test_tax_rules_follow_settings(self):
+        result = quote([(1, Decimal('100'), 1)])
+        self.assertEqual(result.tax, Decimal('10.00'))
+        self.assertEqual(result.total, Decimal('110.00'))
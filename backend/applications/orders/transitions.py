@@ -0,0 +1,122 @@
+"""
+Máquina de estados de las órdenes.
+
+`transition_orders` mueve órdenes en lotes: por cada lote bloquea las filas
+que están en un estado de origen permitido, aplica un único
+UPDATE ... WHERE status IN (permitidos), escribe el historial con
+bulk_create y ejecuta los efectos secundarios (restaurar stock al cancelar)
+con UPDATEs agrupados, además de descontar las ventas de los rollups.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, Sum, Value, When
+from django.utils import timezone
+
+from .analytics import record_cancellations
+from .checkout import restore_stock
+from .invoices import schedule_invoice
+from .models import Order, OrderItem, OrderStatusHistory
+
+TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'processing', 'cancelled'},
+    'processing': {'shipped', 'cancelled'},
+    'shipped': {'in_transit', 'delivered'},
+    'in_transit': {'delivered'},
+    'delivered': {'refunded'},
+    'cancelled': set(),
+    'refunded': set(),
+}
+
+# Estados desde los que el propio cliente puede cancelar
+CUSTOMER_CANCELLABLE = ('pending', 'confirmed')
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def allowed_sources(target):
+    """
+    Estados desde los que se puede pasar a `target`
+    """
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f"Estado desconocido: {target}")
+    return [source for source, targets in TRANSITIONS.items() if target in targets]
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def transition_orders(order_numbers, target, user=None, comment=None,
+                      tracking_numbers=None, sources=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Mueve las órdenes indicadas a `target`. `tracking_numbers` es un dict
+    opcional {order_number: tracking} (archivos de transportistas) y
+    `sources` restringe los estados de origen. Retorna (actualizadas, omitidas)
+    como listas de números de orden.
+    """
+    sources = [s for s in allowed_sources(target) if sources is None or s in sources]
+    order_numbers = list(dict.fromkeys(order_numbers))
+    tracking_numbers = tracking_numbers or {}
+    updated = []
+    for start in range(0, len(order_numbers), batch_size):
+        batch = order_numbers[start:start + batch_size]
+        updated.extend(_transition_batch(batch, target, sources, user, comment, tracking_numbers))
+    done = set(updated)
+    skipped = [number for number in order_numbers if number not in done]
+    return updated, skipped
+
+
+@transaction.atomic
+def _transition_batch(order_numbers, target, sources, user, comment, tracking_numbers):
+    rows = list(
+        Order.objects.select_for_update()
+        .filter(order_number__in=order_numbers, status__in=sources)
+        .values_list('pk', 'order_number')
+    )
+    if not rows:
+        return []
+    ids = [pk for pk, _ in rows]
+
+    changes = {'status': target, 'updated_at': timezone.now()}
+    if target == 'delivered':
+        changes['delivered_at'] = changes['updated_at']
+    tracked = [(number, tracking_numbers[number]) for _, number in rows if number in tracking_numbers]
+    if tracked:
+        changes['tracking_number'] = Case(
+            *[When(order_number=number, then=Value(tracking)) for number, tracking in tracked],
+            default='tracking_number',
+            output_field=CharField(),
+        )
+    Order.objects.filter(pk__in=ids, status__in=sources).update(**changes)
+
+    OrderStatusHistory.objects.bulk_create([
+        OrderStatusHistory(order_id=pk, status=target, comment=comment, created_by=user)
+        for pk in ids
+    ])
+
+    if target == 'cancelled':
+        _restore_cancelled_stock(ids)
+        transaction.on_commit(lambda: record_cancellations(ids), robust=True)
+
+    transaction.on_commit(lambda: [schedule_invoice(pk) for pk in ids])
+    return [number for _, number in rows]
+
+
+def _restore_cancelled_stock(order_ids):
+    quantities = {}
+    sharded = set()
+    totals = (
+        OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False)
+        .values('product_id', 'product__sharded_stock')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    for row in totals:
+        quantities[row['product_id']] = row['total']
+        if row['product__sharded_stock']:
+            sharded.add(row['product_id'])
+    restore_stock(quantities, sharded)
@@ -1,11 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, validate_coupon
+from .views import (
+    OrderViewSet, validate_coupon,
+    sales_daily, sales_by_payment_method, sales_by_product, sales_by_category
+)
 
 router = DefaultRouter()
 router.register('', OrderViewSet, basename='orders')
 
 urlpatterns = [
     path('validate-coupon/', validate_coupon, name='validate-coupon'),
+    path('analytics/daily/', sales_daily, name='analytics-daily'),
+    path('analytics/payment-methods/', sales_by_payment_method, name='analytics-payment-methods'),
+    path('analytics/products/', sales_by_product, name='analytics-products'),
+    path('analytics/categories/', sales_by_category, name='analytics-categories'),
     path('', include(router.urls)),
 ]
@@ -1,4 +1,5 @@
-from .models import Order
+from django.db.models import Count, OuterRef, Subquery
+from .models import Order, OrderItem
 
 def get_user_orders(user):
     """
@@ -6,3 +7,14 @@ def get_user_orders(user):
     """
     return Order.objects.filter(user=user).order_by('-created_at')
 
+def with_item_summary(queryset):
+    """
+    Anota cantidad de items y el primer item (vista previa) en la misma
+    consulta del listado, sin cargar todas las líneas de cada orden.
+    """
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('pk')
+    return queryset.annotate(
+        item_count=Count('items'),
+        first_item_name=Subquery(first_item.values('product_name')[:1]),
+        first_item_quantity=Subquery(first_item.values('quantity')[:1]),
+    )
@@ -1,29 +1,51 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-import io
+from django.utils.dateparse import parse_date
+from django.db.models import F, Sum
+from datetime import timedelta
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 from drf_spectacular.utils import extend_schema
 
-from .models import Order, Coupon
+from applications.monitoring.mixins import InstrumentedViewMixin
+from .models import Order, DailySales, DailyProductSales, DailyCategorySales
 from .serializers import (
-    OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer, CouponSerializer
+    OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer, CouponSerializer,
+    BulkTransitionSerializer
 )
 from .permissions import IsOwner
+from .archive import archived_detail, order_history
+from .coupons import find_coupon
+from .invoices import invoice_hash, invoice_path, render_failed, schedule_invoice
+from .transitions import CUSTOMER_CANCELLABLE, transition_orders
 from .utils import get_user_orders
 
 @extend_schema(tags=['Orders'])
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(
+    InstrumentedViewMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+    mixins.RetrieveModelMixin, viewsets.GenericViewSet,
+):
+    """
+    Sin update ni destroy: el estado solo cambia por `transition_orders`
+    (acciones cancel y bulk-transition).
+    """
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     serializer_class = OrderListSerializer
     lookup_field = 'order_number'
 
     def get_queryset(self):
         user = self.request.user
-        return Order.objects.filter(user=user).order_by('-created_at')
+        queryset = Order.objects.filter(user=user).order_by('-created_at')
+        if self.action == 'list':
+            return order_history(user)
+        if self.action == 'retrieve':
+            return queryset.prefetch_related('items', 'history')
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -35,55 +57,201 @@ class OrderViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(status='confirmed', is_paid=True, paid_at=timezone.now())
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de una orden; si ya fue archivada se sirve el detalle guardado
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            payload = archived_detail(request.user, kwargs['order_number'])
+            if payload is None:
+                raise
+            return Response(payload)
+
     @action(detail=True, methods=['put'], url_path='cancel')
     def cancel_order(self, request, order_number=None):
         order = get_object_or_404(Order, order_number=order_number, user=request.user)
-        if order.status not in ['pending', 'confirmed']:
+        if order.status not in CUSTOMER_CANCELLABLE:
+            return Response({"error": "No se puede cancelar esta orden"}, status=status.HTTP_400_BAD_REQUEST)
+        updated, _ = transition_orders(
+            [order.order_number], 'cancelled', user=request.user,
+            comment='Cancelada por el cliente', sources=CUSTOMER_CANCELLABLE,
+        )
+        if not updated:
             return Response({"error": "No se puede cancelar esta orden"}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = 'cancelled'
-        order.save()
-        for item in order.items.all():
-            if item.product:
-                item.product.stock += item.quantity
-                item.product.save()
         return Response({"message": "Orden cancelada y stock restaurado"}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='bulk-transition', permission_classes=[permissions.IsAdminUser])
+    def bulk_transition(self, request):
+        """
+        Cambia el estado de muchas órdenes (ej. archivo del transportista)
+        POST /api/orders/bulk-transition/
+        """
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        updated, skipped = transition_orders(
+            data['orders'], data['status'], user=request.user,
+            comment=data.get('comment'), tracking_numbers=data.get('tracking_numbers'),
+        )
+        return Response({
+            "updated": len(updated),
+            "skipped": skipped,
+        }, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'], url_path='invoice')
     def get_invoice(self, request, order_number=None):
-        order = get_object_or_404(Order, order_number=order_number, user=request.user)
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer)
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(100, 800, f"Factura: {order.order_number}")
-        p.setFont("Helvetica", 12)
-        p.drawString(100, 780, f"Cliente: {order.full_name}")
-        p.drawString(100, 760, f"Fecha: {order.created_at.strftime('%d/%m/%Y')}")
-        y = 740
-        p.setFont("Helvetica-Bold", 11)
-        p.drawString(100, y, "Producto     Cantidad     Precio")
-        y -= 20
-        p.setFont("Helvetica", 11)
-        for item in order.items.all():
-            p.drawString(100, y, f"{item.product_name[:15]:<15}{item.quantity:<10}{item.product_price:<8}")
-            y -= 18
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(100, y-10, f"Total: S/ {order.total}")
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return HttpResponse(buffer, content_type='application/pdf')
+        """
+        Descarga la factura PDF ya renderizada (con ETag).
+        Si aún se está generando responde 202 con Retry-After, y 503 si
+        el último render falló.
+        """
+        order = get_object_or_404(
+            Order.objects.prefetch_related('items'), order_number=order_number, user=request.user
+        )
+        digest = invoice_hash(order)
+        etag = quote_etag(digest)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+
+        path = invoice_path(order, digest)
+        if not path.exists() and not render_failed(order.pk):
+            schedule_invoice(order.pk)
+        # Un render nuevo puede borrar el archivo entre exists() y open()
+        try:
+            invoice = open(path, 'rb')
+        except FileNotFoundError:
+            if render_failed(order.pk):
+                retry_after = settings.INVOICE_FAILURE_TTL
+                return Response(
+                    {"detail": "No se pudo generar la factura.", "retry_after": retry_after},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': str(retry_after)},
+                )
+            retry_after = settings.INVOICE_RETRY_AFTER
+            return Response(
+                {"detail": "La factura se está generando.", "retry_after": retry_after},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': str(retry_after)},
+            )
+
+        response = FileResponse(
+            invoice, content_type='application/pdf',
+            filename=f"factura-{order.order_number}.pdf",
+        )
+        response['ETag'] = etag
+        return response
 
 @extend_schema(tags=['Orders'])
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def validate_coupon(request):
-    code = request.data.get('code')
-    try:
-        coupon = Coupon.objects.get(code=code, is_active=True)
-        return Response({
-            "valid": True,
-            "discount": str(coupon.discount_value),
-            "type": coupon.discount_type
-        })
-    except Coupon.DoesNotExist:
+    coupon = find_coupon(request.data.get('code'))
+    if coupon is None:
         return Response({"valid": False, "discount": "0"})
+    return Response({
+        "valid": True,
+        "discount": str(coupon.discount_value),
+        "type": coupon.discount_type
+    })
+
+
+def _query_date(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ['Fecha inválida, usa YYYY-MM-DD.']})
+    return parsed
+
+
+def _analytics_range(request):
+    """
+    Rango ?from=&to= (por defecto los últimos 30 días); a lo más
+    ANALYTICS_MAX_DAYS días
+    """
+    date_to = _query_date(request, 'to') or timezone.localdate()
+    date_from = _query_date(request, 'from') or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise ValidationError({'from': ['Debe ser anterior o igual a "to".']})
+    if (date_to - date_from).days >= settings.ANALYTICS_MAX_DAYS:
+        raise ValidationError({'from': [f'El rango no puede superar {settings.ANALYTICS_MAX_DAYS} días.']})
+    return date_from, date_to
+
+@extend_schema(tags=['Orders'])
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def sales_daily(request):
+    """
+    Ventas por día (lee solo los rollups)
+    GET /api/orders/analytics/daily/?from=YYYY-MM-DD&to=YYYY-MM-DD&payment_method=
+    """
+    date_from, date_to = _analytics_range(request)
+    rows = DailySales.objects.filter(date__range=(date_from, date_to))
+    payment_method = request.query_params.get('payment_method')
+    if payment_method:
+        rows = rows.filter(payment_method=payment_method)
+    days = rows.values('date').annotate(
+        orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue')
+    ).order_by('date')
+    return Response([
+        {
+            'date': day['date'],
+            'orders': day['orders'],
+            'units': day['units'],
+            'revenue': day['revenue'],
+            'average_order_value': round(day['revenue'] / day['orders'], 2) if day['orders'] else 0,
+        }
+        for day in days
+    ])
+
+@extend_schema(tags=['Orders'])
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def sales_by_payment_method(request):
+    """
+    Totales por método de pago en el rango
+    GET /api/orders/analytics/payment-methods/
+    """
+    date_from, date_to = _analytics_range(request)
+    rows = DailySales.objects.filter(date__range=(date_from, date_to)).values('payment_method').annotate(
+        orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue')
+    ).order_by('-revenue')
+    return Response(list(rows))
+
+@extend_schema(tags=['Orders'])
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def sales_by_product(request):
+    """
+    Productos más vendidos en el rango
+    GET /api/orders/analytics/products/?limit=20
+    """
+    date_from, date_to = _analytics_range(request)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    rows = DailyProductSales.objects.filter(date__range=(date_from, date_to)).values(
+        'product_id', name=F('product__name')
+    ).annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('-units')[:limit]
+    return Response(list(rows))
+
+@extend_schema(tags=['Orders'])
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def sales_by_category(request):
+    """
+    Ventas por categoría en el rango
+    GET /api/orders/analytics/categories/
+    """
+    date_from, date_to = _analytics_range(request)
+    rows = DailyCategorySales.objects.filter(date__range=(date_from, date_to)).values(
+        'category_id', name=F('category__name')
+    ).annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('-revenue')
+    return Response(list(rows))
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Brand, Material, Product, ProductImage, ProductSpecification, Review
+from .models import Category, Brand, Material, Product, ProductImage, ProductSpecification, Review, StockShard
 
 
 class ProductImageInline(admin.TabularInline):
@@ -28,6 +28,20 @@ class ProductSpecificationInline(admin.TabularInline):
     fields = ('name', 'value', 'order')
 
 
+class StockShardInline(admin.TabularInline):
+    """
+    Inline de solo lectura con las shards de stock (modo ledger)
+    """
+    model = StockShard
+    extra = 0
+    can_delete = False
+    fields = ('index', 'quantity')
+    readonly_fields = ('index', 'quantity')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     """
@@ -140,11 +154,11 @@ class ProductAdmin(admin.ModelAdmin):
     readonly_fields = (
         'created_at', 'updated_at', 'views_count', 
         'final_price_display', 'average_rating_display', 
-        'review_count_display', 'stock_status'
+        'review_count_display', 'stock_status', 'sharded_stock'
     )
     list_editable = ('is_featured', 'is_active')
     filter_horizontal = ('materials',)
-    inlines = [ProductImageInline, ProductSpecificationInline]
+    inlines = [ProductImageInline, ProductSpecificationInline, StockShardInline]
     
     fieldsets = (
         ('Información Básica', {
@@ -157,7 +171,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price', 'discount_price', 'final_price_display')
         }),
         ('Inventario', {
-            'fields': ('stock', 'min_stock', 'stock_status')
+            'fields': ('stock', 'min_stock', 'sharded_stock', 'stock_status')
         }),
         ('Dimensiones y Peso', {
             'fields': ('width', 'height', 'depth', 'weight'),
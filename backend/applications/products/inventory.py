@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+
+from .models import Product, StockShard
+
+# Reintentos sobre shards al azar antes de bloquear todas las del producto
+RESERVE_ATTEMPTS = 3
+
+
+def default_shard_count():
+    return getattr(settings, 'INVENTORY_STOCK_SHARDS', 8)
+
+
+@transaction.atomic
+def enable_sharding(product, shards=None):
+    """
+    Activa el modo ledger: reparte el stock actual del producto en N shards
+    """
+    shards = shards or default_shard_count()
+    product = Product.objects.select_for_update().get(pk=product.pk)
+    if product.sharded_stock:
+        reconcile_stock([product.pk])
+        product.refresh_from_db(fields=['stock'])
+
+    base, remainder = divmod(product.stock, shards)
+    StockShard.objects.filter(product=product).delete()
+    StockShard.objects.bulk_create([
+        StockShard(product=product, index=i, quantity=base + (1 if i < remainder else 0))
+        for i in range(shards)
+    ])
+    product.sharded_stock = True
+    product.save(update_fields=['sharded_stock'])
+    return product
+
+
+@transaction.atomic
+def disable_sharding(product):
+    """
+    Vuelve al stock en una sola fila consolidando las shards
+    """
+    reconcile_stock([product.pk])
+    StockShard.objects.filter(product=product).delete()
+    Product.objects.filter(pk=product.pk).update(sharded_stock=False)
+
+
+def reserve_stock(product_id, quantity):
+    """
+    Descuenta `quantity` de una shard al azar que tenga unidades suficientes.
+    Cada intento es un único UPDATE condicional, así que dos reservas
+    concurrentes solo compiten si caen en la misma shard. Si ninguna shard
+    alcanza por sí sola se descuenta de varias bajo bloqueo.
+    Retorna False si el producto no tiene stock suficiente.
+    """
+    for _ in range(RESERVE_ATTEMPTS):
+        candidate = StockShard.objects.filter(
+            product_id=product_id, quantity__gte=quantity
+        ).order_by('?').values('pk')[:1]
+        updated = StockShard.objects.filter(
+            pk__in=Subquery(candidate), quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity)
+        if updated:
+            return True
+    return _reserve_across_shards(product_id, quantity)
+
+
+@transaction.atomic
+def _reserve_across_shards(product_id, quantity):
+    shards = list(
+        StockShard.objects.select_for_update()
+        .filter(product_id=product_id, quantity__gt=0)
+        .order_by('pk')
+    )
+    if sum(shard.quantity for shard in shards) < quantity:
+        return False
+    pending = quantity
+    for shard in shards:
+        taken = min(shard.quantity, pending)
+        shard.quantity -= taken
+        pending -= taken
+        if pending == 0:
+            break
+    StockShard.objects.bulk_update(shards, ['quantity'])
+    return True
+
+
+def release_stock(product_id, quantity):
+    """
+    Devuelve unidades (ej. orden cancelada) a una shard al azar
+    """
+    candidate = StockShard.objects.filter(product_id=product_id).order_by('?').values('pk')[:1]
+    StockShard.objects.filter(pk__in=Subquery(candidate)).update(quantity=F('quantity') + quantity)
+
+
+def reconcile_stock(product_ids=None):
+    """
+    Actualiza el modelo de lectura `Product.stock` con la suma de las shards.
+    Un solo UPDATE para todos los productos en modo ledger.
+    """
+    totals = StockShard.objects.filter(
+        product=OuterRef('pk')
+    ).order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    queryset = Product.objects.filter(sharded_stock=True)
+    if product_ids is not None:
+        queryset = queryset.filter(pk__in=product_ids)
+    return queryset.update(
+        stock=Coalesce(Subquery(totals, output_field=IntegerField()), 0),
+        updated_at=Now(),
+    )
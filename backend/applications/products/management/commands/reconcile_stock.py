@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from applications.products.inventory import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = 'Actualiza Product.stock con la suma de las shards (productos en modo ledger)'
+
+    def handle(self, *args, **options):
+        updated = reconcile_stock()
+        self.stdout.write(self.style.SUCCESS(f'✓ {updated} productos reconciliados'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from applications.products.inventory import disable_sharding, enable_sharding
+from applications.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Activa o desactiva el modo ledger (stock en shards) para productos muy demandados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('skus', nargs='+', help='SKU de los productos')
+        parser.add_argument('--shards', type=int, default=None, help='Número de shards por producto')
+        parser.add_argument('--disable', action='store_true', help='Consolidar las shards y volver al stock normal')
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(sku__in=options['skus'])
+        missing = set(options['skus']) - set(products.values_list('sku', flat=True))
+        if missing:
+            raise CommandError(f"Productos no encontrados: {', '.join(sorted(missing))}")
+
+        for product in products:
+            if options['disable']:
+                disable_sharding(product)
+                self.stdout.write(f'  Stock consolidado: {product.sku}')
+            else:
+                enable_sharding(product, options['shards'])
+                self.stdout.write(self.style.SUCCESS(f'✓ Modo ledger activado: {product.sku}'))
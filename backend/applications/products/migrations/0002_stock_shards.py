@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:26
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sharded_stock',
+            field=models.BooleanField(default=False, help_text='Stock repartido en shards (modo ledger para productos muy demandados)'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('quantity', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Shard de Stock',
+                'verbose_name_plural': 'Shards de Stock',
+                'ordering': ['product', 'index'],
+                'unique_together': {('product', 'index')},
+            },
+        ),
+    ]
@@ -146,6 +146,10 @@ class Product(models.Model):
         default=5,
         help_text="Stock mínimo para alertas"
     )
+    sharded_stock = models.BooleanField(
+        default=False,
+        help_text="Stock repartido en shards (modo ledger para productos muy demandados)"
+    )
     
     # Dimensiones (importantes para muebles)
     width = models.DecimalField(
@@ -258,6 +262,33 @@ class Product(models.Model):
         self.save(update_fields=['views_count'])
 
 
+class StockShard(models.Model):
+    """
+    Contador parcial del stock de un producto en modo ledger.
+    Las reservas descuentan de una shard al azar para repartir la
+    contención; `Product.stock` se reconcilia periódicamente con la suma.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_shards'
+    )
+    index = models.PositiveIntegerField()
+    quantity = models.IntegerField(
+        default=0,
+        validators=[MinValueValidator(0)]
+    )
+    
+    class Meta:
+        verbose_name = 'Shard de Stock'
+        verbose_name_plural = 'Shards de Stock'
+        ordering = ['product', 'index']
+        unique_together = ('product', 'index')
+    
+    def __str__(self):
+        return f"{self.product.name} - Shard {self.index}: {self.quantity}"
+
+
 class ProductImage(models.Model):
     """
     Imágenes del producto (múltiples imágenes por producto)
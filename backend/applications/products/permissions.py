@@ -28,7 +28,7 @@ class IsOwnerOrAdmin(permissions.BasePermission):
             return True
         
         # El dueño puede editar su review
-        return obj.user == request.user
+        return request.user.is_authenticated and obj.user_id == request.user.pk
 
 
 class HasPurchasedProduct(permissions.BasePermission):
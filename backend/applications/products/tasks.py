@@ -0,0 +1,7 @@
+from celery import shared_task
+from .inventory import reconcile_stock
+
+@shared_task
+def reconcile_sharded_stock():
+    # Refresca Product.stock (modelo de lectura) para productos en modo ledger
+    return reconcile_stock()
@@ -0,0 +1,46 @@
+from django.test import TestCase
+from applications.products.inventory import (
+    disable_sharding, enable_sharding, reconcile_stock, release_stock, reserve_stock
+)
+from applications.products.models import Category, Product, StockShard
+
+
+class StockShardTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Sofás')
+        self.product = Product.objects.create(
+            name='Sofá', sku='SOF-001', description='Sofá', category=category,
+            price=500, stock=10, is_active=True
+        )
+
+    def test_enable_sharding_splits_stock(self):
+        enable_sharding(self.product, shards=4)
+        quantities = list(StockShard.objects.filter(product=self.product).values_list('quantity', flat=True))
+        self.assertEqual(quantities, [3, 3, 2, 2])
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.sharded_stock)
+
+    def test_reserve_and_reconcile(self):
+        enable_sharding(self.product, shards=4)
+        self.assertTrue(reserve_stock(self.product.pk, 2))
+        # Ninguna shard tiene 5 unidades: se reparte entre varias
+        self.assertTrue(reserve_stock(self.product.pk, 5))
+        self.assertFalse(reserve_stock(self.product.pk, 4))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        reconcile_stock()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertTrue(self.product.is_in_stock)
+        self.assertTrue(self.product.is_low_stock)
+
+    def test_release_and_disable(self):
+        enable_sharding(self.product, shards=2)
+        reserve_stock(self.product.pk, 4)
+        release_stock(self.product.pk, 1)
+        disable_sharding(self.product)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        self.assertFalse(self.product.sharded_stock)
+        self.assertFalse(StockShard.objects.exists())
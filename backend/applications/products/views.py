@@ -8,6 +8,7 @@ from django.db.models import Q, Count, Avg
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
 
+from applications.monitoring.mixins import InstrumentedViewMixin
 from .models import Category, Brand, Material, Product, Review
 from .serializers import (
     CategoryListSerializer, CategoryDetailSerializer,
@@ -20,7 +21,7 @@ from .filters import ProductFilter
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
 
 @extend_schema(tags=['Products'])
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de categorías
     GET /api/products/categories/ - Listar categorías
@@ -63,7 +64,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 @extend_schema(tags=['Products'])
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de marcas
     """
@@ -77,7 +78,7 @@ class BrandViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=['Products'])
-class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
+class MaterialViewSet(InstrumentedViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet solo lectura para materiales
     """
@@ -88,7 +89,7 @@ class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 @extend_schema(tags=['Products'])
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet completo para productos con filtros y búsqueda
     """
@@ -191,7 +192,7 @@ class ProductViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=['Products'])
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de reviews
     """
@@ -0,0 +1,78 @@
+"""
+Autenticación JWT con caché del usuario.
+
+`JWTAuthentication` consulta la fila del usuario en cada request y luego
+las vistas cargan `request.user.profile` con otra consulta. Aquí el
+usuario (con su perfil unido) se guarda en la caché AUTH_USER_CACHE_ALIAS
+durante AUTH_USER_CACHE_SECONDS. Las señales de User/UserProfile (ver
+signals.py) borran la entrada tras el commit al guardar, borrar o cambiar
+la contraseña; los cambios hechos con `QuerySet.update()` se ven al vencer
+el TTL.
+Con AUTH_USER_CACHE = False se vuelve a leer la base en cada request.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Invalida la entrada del usuario en la caché de autenticación"""
+    user_cache().delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Igual que JWTAuthentication, pero resuelve el usuario del token desde
+    la caché (un solo SELECT con el perfil cuando no está).
+    """
+
+    def load_user(self, user_id):
+        queryset = self.user_model.objects.select_related('profile')
+        lookup = {api_settings.USER_ID_FIELD: user_id}
+        if not settings.AUTH_USER_CACHE:
+            return queryset.get(**lookup)
+
+        key = user_cache_key(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = queryset.get(**lookup)
+            user_cache().set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+        return user
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.load_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Mismo esquema OpenAPI (Bearer JWT) que JWTAuthentication"""
+    target_class = CachedJWTAuthentication
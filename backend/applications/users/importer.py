@@ -0,0 +1,236 @@
+"""
+Importación masiva de usuarios (clientes B2B) desde JSON Lines.
+
+Cada línea es un usuario:
+
+    {"username": "...", "email": "...", "first_name": "...", "last_name": "...",
+     "password": "..." | "password_hash": "pbkdf2_sha256$...",
+     "profile": {"phone": "...", "default_city": "...", ...},
+     "addresses": [{"label": "...", "address_line1": "...", "city": "...",
+                    "state": "...", "postal_code": "...", "is_default": true}]}
+
+El archivo se lee por lotes sin cargarlo completo. Las contraseñas en
+claro se hashean en un pool de procesos (PBKDF2 es CPU puro) y los hashes
+ya calculados se aceptan tal cual. Cada lote son tres `bulk_create`
+(User, UserProfile, Address) en una transacción: no se disparan las
+señales de post_save, así que el perfil se crea aquí y no en
+`create_user_profile`. Como `Address.save()` tampoco corre, el invariante
+de una sola dirección por defecto se aplica al armar las filas. Los emails
+no pueden repetirse (sin distinguir mayúsculas) ni en el archivo ni contra
+la base; se verifican con una consulta por lote.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Upper
+
+from .models import Address, UserProfile
+
+USER_FIELDS = ('first_name', 'last_name')
+PROFILE_FIELDS = (
+    'phone', 'birth_date', 'default_address_line1', 'default_address_line2',
+    'default_city', 'default_state', 'default_postal_code', 'default_country',
+)
+ADDRESS_FIELDS = (
+    'label', 'address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country',
+)
+
+
+class InvalidRecord(ValueError):
+    """Registro inválido: se reporta con su número de línea y se omite"""
+
+
+def read_records(lines):
+    """
+    Genera (número de línea, registro) saltando líneas vacías. Las líneas
+    que no son JSON se entregan como InvalidRecord para reportarlas.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, InvalidRecord(f'JSON inválido: {exc}')
+            continue
+        if not isinstance(record, dict):
+            yield number, InvalidRecord('Cada línea debe ser un objeto JSON')
+            continue
+        yield number, record
+
+
+def validate(instance, exclude):
+    """Valida longitudes, formatos y choices sin tocar la base"""
+    try:
+        instance.clean_fields(exclude=exclude)
+    except ValidationError as exc:
+        raise InvalidRecord('; '.join(f'{field}: {" ".join(errors)}' for field, errors in exc.message_dict.items()))
+
+
+def build_user(record):
+    username = User.normalize_username(str(record.get('username') or '').strip())
+    if not username:
+        raise InvalidRecord('Falta username')
+    user = User(
+        username=username,
+        email=User.objects.normalize_email(record.get('email') or ''),
+        **{field: record.get(field) or '' for field in USER_FIELDS},
+    )
+    for field in ('password', 'password_hash'):
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise InvalidRecord(f'{field} debe ser texto')
+    if record.get('password_hash'):
+        try:
+            identify_hasher(record['password_hash'])
+        except ValueError:
+            raise InvalidRecord('password_hash con formato desconocido')
+        user.password = record['password_hash']
+    validate(user, exclude=['password'])
+    return user
+
+
+def build_profile(record):
+    data = record.get('profile') or {}
+    if not isinstance(data, dict):
+        raise InvalidRecord('profile debe ser un objeto')
+    profile = UserProfile(**{field: data[field] for field in PROFILE_FIELDS if field in data})
+    validate(profile, exclude=['user', 'avatar'])
+    return profile
+
+
+def build_addresses(record):
+    """
+    Direcciones del registro; si varias vienen marcadas por defecto solo
+    la última conserva la marca, igual que al guardarlas una a una con
+    Address.save() (cada default desmarca las anteriores).
+    """
+    addresses = []
+    for data in record.get('addresses') or []:
+        if not isinstance(data, dict):
+            raise InvalidRecord('Cada dirección debe ser un objeto')
+        address = Address(
+            is_default=bool(data.get('is_default')),
+            **{field: data[field] for field in ADDRESS_FIELDS if data.get(field) is not None},
+        )
+        validate(address, exclude=['user'])
+        addresses.append(address)
+    for address in [address for address in addresses if address.is_default][:-1]:
+        address.is_default = False
+    return addresses
+
+
+class UserImporter:
+    """
+    `workers` procesos para hashear contraseñas (0 = en el proceso actual)
+    """
+
+    def __init__(self, batch_size=1000, workers=0):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def run(self, lines, log=None):
+        records = read_records(lines)
+        executor = ProcessPoolExecutor(self.workers, initializer=django.setup) if self.workers else None
+        try:
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch, executor)
+                if log:
+                    log(self.created, self.skipped, len(self.errors))
+        finally:
+            if executor:
+                executor.shutdown()
+        return {'created': self.created, 'skipped': self.skipped, 'errors': sorted(self.errors)}
+
+    def hash_passwords(self, passwords, executor):
+        if executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+    def parse(self, batch):
+        """
+        Filas válidas del lote como (número de línea, usuario, contraseña,
+        perfil, direcciones)
+        """
+        rows, seen, seen_emails = [], set(), set()
+        for number, record in batch:
+            try:
+                if isinstance(record, InvalidRecord):
+                    raise record
+                user = build_user(record)
+                profile = build_profile(record)
+                addresses = build_addresses(record)
+            except InvalidRecord as exc:
+                self.errors.append((number, str(exc)))
+                continue
+            if user.username in seen:
+                self.errors.append((number, f'username {user.username} repetido en el archivo'))
+                continue
+            email = user.email.upper()
+            if email and email in seen_emails:
+                self.errors.append((number, f'email {user.email} repetido en el archivo'))
+                continue
+            seen.add(user.username)
+            seen_emails.add(email)
+            rows.append((number, user, record.get('password'), profile, addresses))
+        return rows
+
+    def exclude_registered_emails(self, rows):
+        """Reporta y quita las filas cuyo email ya usa otro usuario (una consulta)"""
+        emails = {user.email.upper() for _, user, *_ in rows if user.email}
+        if not emails:
+            return rows
+        registered = set(
+            User.objects.annotate(email_upper=Upper('email'))
+            .filter(email_upper__in=emails).values_list('email_upper', flat=True)
+        )
+        valid = []
+        for row in rows:
+            number, user = row[:2]
+            if user.email and user.email.upper() in registered:
+                self.errors.append((number, f'email {user.email} ya está registrado'))
+            else:
+                valid.append(row)
+        return valid
+
+    def import_batch(self, batch, executor):
+        rows = self.parse(batch)
+        existing = set(
+            User.objects.filter(username__in=[user.username for _, user, *_ in rows]).values_list('username', flat=True)
+        )
+        self.skipped += sum(1 for _, user, *_ in rows if user.username in existing)
+        rows = self.exclude_registered_emails([row for row in rows if row[1].username not in existing])
+        if not rows:
+            return
+
+        # Sin password ni hash: contraseña inutilizable (make_password(None))
+        pending = [(user, password) for _, user, password, *_ in rows if not user.password]
+        hashed = self.hash_passwords([password or None for _, password in pending], executor)
+        for (user, _), password_hash in zip(pending, hashed):
+            user.password = password_hash
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([user for _, user, *_ in rows])
+            profiles, addresses = [], []
+            for user, (*_, profile, user_addresses) in zip(users, rows):
+                profile.user = user
+                profiles.append(profile)
+                for address in user_addresses:
+                    address.user = user
+                    addresses.append(address)
+            UserProfile.objects.bulk_create(profiles)
+            Address.objects.bulk_create(addresses)
+        self.created += len(users)
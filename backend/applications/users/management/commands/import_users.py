@@ -0,0 +1,41 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.users.importer import UserImporter
+
+
+class Command(BaseCommand):
+    help = 'Importa usuarios con perfil y direcciones desde un archivo JSON Lines (ver users/importer.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo .jsonl ('-' para leer de stdin)")
+        parser.add_argument('--batch-size', type=int, default=1000, help='Usuarios por transacción')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Procesos para hashear contraseñas (0 = en este proceso)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 0:
+            raise CommandError('--batch-size debe ser positivo y --workers no puede ser negativo.')
+
+        def log(created, skipped, errors):
+            self.stdout.write(f'  Creados: {created}, existentes: {skipped}, con error: {errors}')
+
+        importer = UserImporter(batch_size=options['batch_size'], workers=options['workers'])
+        if options['path'] == '-':
+            result = importer.run(sys.stdin, log=log)
+        else:
+            try:
+                with open(options['path'], encoding='utf-8') as lines:
+                    result = importer.run(lines, log=log)
+            except OSError as exc:
+                raise CommandError(f'No se pudo leer {options["path"]}: {exc}')
+
+        for number, message in result['errors']:
+            self.stderr.write(f'  Línea {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {result['created']} usuarios creados, {result['skipped']} ya existían, {len(result['errors'])} con error"
+        ))
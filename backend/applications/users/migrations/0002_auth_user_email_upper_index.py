@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:57
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # Índice para los lookups email__iexact, que Django traduce a UPPER(email::text)
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS users_auth_user_email_upper '
+                'ON auth_user (UPPER(email::text))',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS users_auth_user_email_upper',
+        ),
+    ]
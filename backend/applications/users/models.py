@@ -2,7 +2,51 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 
-class UserProfile(models.Model):
+class DirtyFieldsMixin:
+    """
+    Recuerda los valores leídos de la base para que save() escriba solo las
+    columnas modificadas (más las auto_now) y no escriba nada si no cambió
+    ninguna. Un save() con update_fields explícito no se modifica.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """Campos modificados desde la carga, o None si no viene de la base"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        changed = []
+        for field in self._meta.concrete_fields:
+            if field.attname in loaded:
+                if getattr(self, field.attname) != loaded[field.attname]:
+                    changed.append(field.name)
+            elif field.attname in self.__dict__:
+                # Campo diferido asignado sin haberlo leído
+                changed.append(field.name)
+        return changed
+
+    def save(self, *args, **kwargs):
+        if not args and kwargs.get('update_fields') is None and not self._state.adding:
+            changed = self.changed_fields()
+            if changed is not None:
+                if not changed:
+                    return
+                auto_now = [f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)]
+                kwargs['update_fields'] = set(changed) | set(auto_now)
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+
+class UserProfile(DirtyFieldsMixin, models.Model):
     """
     Perfil extendido del usuario con información adicional
     """
@@ -10,9 +10,9 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         if request.user and request.user.is_staff:
             return True
         
-        # El dueño puede ver su propio objeto
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
+        # El dueño puede ver su propio objeto (compara ids, sin cargar obj.user)
+        if hasattr(obj, 'user_id'):
+            return request.user.is_authenticated and obj.user_id == request.user.pk
         
         return obj == request.user
 
@@ -22,6 +22,6 @@ class IsOwner(permissions.BasePermission):
     Permiso solo para el dueño
     """
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
+        if hasattr(obj, 'user_id'):
+            return request.user.is_authenticated and obj.user_id == request.user.pk
         return obj == request.user
\ No newline at end of file
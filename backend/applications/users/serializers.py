@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from applications.cart.tokens import parse_cart_token
 from .models import UserProfile, Address
 from .validators import validate_age
 
@@ -36,7 +38,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         """
         Verifica que el email sea único
         """
-        if User.objects.filter(email=value).exists():
+        if User.objects.filter(email__iexact=value).exists():
             raise serializers.ValidationError("Este email ya está registrado.")
         return value.lower()
     
@@ -135,18 +137,20 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         """
-        Actualiza tanto el User como el UserProfile
+        Actualiza tanto el User como el UserProfile, escribiendo solo las
+        columnas que cambiaron
         """
         user_data = validated_data.pop('user', {})
         
         # Actualizar User
-        if user_data:
-            user = instance.user
-            user.first_name = user_data.get('first_name', user.first_name)
-            user.last_name = user_data.get('last_name', user.last_name)
-            user.save()
+        user = instance.user
+        changed = [attr for attr, value in user_data.items() if getattr(user, attr) != value]
+        if changed:
+            for attr in changed:
+                setattr(user, attr, user_data[attr])
+            user.save(update_fields=changed)
         
-        # Actualizar UserProfile
+        # Actualizar UserProfile (save() omite la escritura si nada cambió)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -239,7 +243,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         """
         user = self.context['request'].user
         user.set_password(self.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return user
 
 
@@ -249,15 +253,19 @@ class PasswordResetRequestSerializer(serializers.Serializer):
     """
     email = serializers.EmailField(required=True)
     
-    def validate_email(self, value):
+    def validate(self, attrs):
         """
-        Verifica que el email exista en la base de datos
+        Verifica que el email exista (sin distinguir mayúsculas, usa el
+        índice sobre UPPER(email)) y deja el usuario en validated_data
         """
-        if not User.objects.filter(email=value).exists():
+        user = User.objects.filter(email__iexact=attrs['email']).order_by('pk').first()
+        if user is None:
             raise serializers.ValidationError(
-                "No existe un usuario con este email."
+                {"email": "No existe un usuario con este email."}
             )
-        return value.lower()
+        attrs['email'] = attrs['email'].lower()
+        attrs['user'] = user
+        return attrs
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
@@ -282,4 +290,14 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 {"new_password": "Las contraseñas no coinciden."}
             )
-        return attrs
\ No newline at end of file
+        return attrs
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """
+    Login JWT que acepta opcionalmente el carrito anónimo a fusionar
+    """
+    cart_token = serializers.CharField(required=False, allow_blank=True, write_only=True)
+
+    def validate(self, attrs):
+        self.cart_key = parse_cart_token(attrs.get('cart_token'))
+        return super().validate(attrs)
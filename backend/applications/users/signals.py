@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from .authentication import forget_user
 from .models import UserProfile
 
 
@@ -13,10 +15,18 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
     """
-    Guarda el perfil cuando se guarda el usuario
+    Invalida el usuario cacheado por la autenticación JWT (incluye
+    cambios de contraseña, que se guardan con user.save()). Se hace tras
+    el commit: antes, otro request podría volver a cachear la fila vieja.
     """
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def forget_cached_profile(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: forget_user(user_id))
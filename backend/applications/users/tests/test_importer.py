@@ -0,0 +1,97 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from applications.users.importer import UserImporter
+from applications.users.models import Address, UserProfile
+
+
+def jsonl(*records):
+    return [json.dumps(record) if isinstance(record, dict) else record for record in records]
+
+
+class UserImportTest(TestCase):
+    def test_bulk_import_creates_profiles_and_single_default_address(self):
+        User.objects.create_user(username='existente', password='pass')
+        address = {'label': 'Oficina', 'address_line1': 'Av. 1', 'city': 'Santiago', 'state': 'RM', 'postal_code': '8320000'}
+        lines = jsonl(
+            {'username': 'empresa1', 'email': 'Compras@Empresa1.CL', 'password': 'clave-1',
+             'profile': {'phone': '+56911111111', 'birth_date': '1990-05-01'},
+             'addresses': [dict(address, is_default=True), dict(address, label='Bodega', is_default=True)]},
+            {'username': 'empresa2', 'password_hash': make_password('clave-2')},
+            {'username': 'existente'},
+            'no es json',
+            {'username': 'empresa1'},
+            {'username': 'empresa3', 'profile': {'birth_date': 'ayer'}},
+            {'username': 'empresa4', 'addresses': [{'label': 'Casa'}]},
+        )
+        # Lote 1: usernames existentes, emails registrados + 3 INSERT (y el
+        # savepoint); lote 2: solo la consulta de existentes; lote 3 no tiene
+        # filas válidas
+        with self.assertNumQueries(8):
+            result = UserImporter(batch_size=3).run(lines)
+
+        self.assertEqual((result['created'], result['skipped']), (2, 2))
+        self.assertEqual([number for number, _ in result['errors']], [4, 6, 7])
+        empresa1 = User.objects.get(username='empresa1')
+        self.assertTrue(empresa1.check_password('clave-1'))
+        self.assertEqual(empresa1.email, 'Compras@empresa1.cl')
+        self.assertTrue(User.objects.get(username='empresa2').check_password('clave-2'))
+        self.assertEqual(UserProfile.objects.get(user=empresa1).phone, '+56911111111')
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='empresa').count(), 2)
+        self.assertEqual(list(Address.objects.filter(user=empresa1).order_by('pk').values_list('label', 'is_default')),
+                         [('Oficina', False), ('Bodega', True)])
+
+    def test_last_default_address_wins_like_address_save(self):
+        address = {'address_line1': 'Av. 1', 'city': 'Santiago', 'state': 'RM', 'postal_code': '8320000'}
+        lines = jsonl({'username': 'sucursales', 'addresses': [
+            dict(address, label='Casa matriz', is_default=True),
+            dict(address, label='Bodega'),
+            dict(address, label='Sucursal', is_default=True),
+        ]})
+        UserImporter().run(lines)
+        imported = list(Address.objects.filter(user__username='sucursales').order_by('pk').values_list('label', 'is_default'))
+
+        user = User.objects.create_user(username='una-a-una', password='pass')
+        for data in json.loads(lines[0])['addresses']:
+            Address.objects.create(user=user, **data)
+        saved = list(Address.objects.filter(user=user).order_by('pk').values_list('label', 'is_default'))
+        self.assertEqual(imported, saved)
+        self.assertEqual(imported, [('Casa matriz', False), ('Bodega', False), ('Sucursal', True)])
+
+    def test_rejects_repeated_emails_and_non_text_passwords(self):
+        User.objects.create_user(username='registrado', email='ventas@empresa.cl', password='pass')
+        lines = jsonl(
+            {'username': 'nuevo1', 'email': 'Compras@Empresa.cl'},
+            {'username': 'nuevo2', 'email': 'COMPRAS@empresa.cl'},
+            {'username': 'nuevo3', 'email': 'Ventas@Empresa.CL'},
+            {'username': 'nuevo4', 'password': 123},
+            {'username': 'nuevo5', 'password_hash': ['x']},
+            {'username': 'nuevo6', 'email': ''},
+            {'username': 'nuevo7', 'email': ''},
+        )
+        result = UserImporter(batch_size=10).run(lines)
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['errors'], [
+            (2, 'email COMPRAS@empresa.cl repetido en el archivo'),
+            (3, 'email Ventas@empresa.cl ya está registrado'),
+            (4, 'password debe ser texto'),
+            (5, 'password_hash debe ser texto'),
+        ])
+        self.assertEqual(
+            sorted(User.objects.filter(username__startswith='nuevo').values_list('username', flat=True)),
+            ['nuevo1', 'nuevo6', 'nuevo7'],
+        )
+
+    def test_command_hashes_in_process_pool(self):
+        lines = jsonl(*[{'username': f'pool{i}', 'password': f'clave-{i}'} for i in range(4)])
+        out = StringIO()
+        with mock.patch('sys.stdin', StringIO('\n'.join(lines))):
+            call_command('import_users', '-', '--workers', '2', '--batch-size', '2', stdout=out)
+        self.assertIn('4 usuarios creados', out.getvalue())
+        self.assertTrue(User.objects.get(username='pool3').check_password('clave-3'))
@@ -0,0 +1,232 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+from rest_framework.test import APIClient
+
+from applications.cart.models import Cart, CartItem
+from applications.users.authentication import user_cache, user_cache_key
+from applications.users.models import UserProfile
+from applications.products.models import Category, Product
+
+from applications.notifications.models import OutboxEmail
+from applications.notifications.outbox import dispatch_outbox
+
+
+class TransactionalEmailTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register_queues_welcome_email(self):
+        response = self.client.post('/api/users/register/', {
+            'username': 'ana', 'email': 'ana@example.com', 'first_name': 'Ana', 'last_name': 'Pérez',
+            'password': 'Segura#2024', 'password2': 'Segura#2024',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().kind, 'welcome')
+
+        dispatch_outbox()
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+
+    def test_password_reset_queues_email(self):
+        User.objects.create_user(username='luis', email='luis@example.com', password='pass')
+        response = self.client.post('/api/users/reset-password/', {'email': 'luis@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        email = OutboxEmail.objects.get(kind='password_reset')
+        self.assertIn('/reset-password/', email.body)
+
+
+class LoginCartMergeTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Mesas')
+        self.products = [
+            Product.objects.create(
+                name=f'Mesa {i}', sku=f'MES-{i:03d}', description='Mesa', category=category,
+                price=100, stock=3, is_active=True
+            )
+            for i in range(5)
+        ]
+
+    def login_with_cart(self, username, products, quantity=2):
+        User.objects.create_user(username=username, password='pass')
+        client = APIClient()
+        for product in products:
+            client.post('/api/cart/items/', {'product_id': product.pk, 'quantity': quantity}, format='json')
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/users/token/', {'username': username, 'password': 'pass'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(ctx.captured_queries), response
+
+    def test_login_merges_anonymous_cart_in_constant_queries(self):
+        single, _ = self.login_with_cart('uno', self.products[:1])
+        many, response = self.login_with_cart('cinco', self.products)
+        self.assertEqual(single, many)
+        self.assertEqual(response.data['cart_items_merged'], 5)
+        self.assertIn('access', response.data)
+
+    def test_merge_caps_quantities_at_stock(self):
+        user = User.objects.create_user(username='tope', password='pass')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        client = APIClient()
+        added = client.post('/api/cart/items/', {'product_id': self.products[0].pk, 'quantity': 2}, format='json')
+        response = APIClient().post(
+            '/api/users/token/', {'username': 'tope', 'password': 'pass', 'cart_token': added['X-Cart-Token']}, format='json'
+        )
+        self.assertEqual(response.data['cart_items_merged'], 1)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 3)
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cache', password='pass', first_name='Ana')
+        token = APIClient().post('/api/users/token/', {'username': 'cache', 'password': 'pass'}, format='json')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.data['access']}")
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries if 'auth_user' in q['sql'] or 'users_userprofile' in q['sql']]
+
+    def test_user_and_profile_come_from_cache(self):
+        self.user_queries()
+        _, queries = self.user_queries()
+        self.assertEqual(queries, [])
+
+    def test_saves_and_password_changes_invalidate_after_commit(self):
+        self.user_queries()
+        key = user_cache_key(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Beatriz'
+            self.user.save()
+            # Hasta el commit la entrada sigue en la caché
+            self.assertIsNotNone(user_cache().get(key))
+        self.assertIsNone(user_cache().get(key))
+        response, queries = self.user_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['first_name'], 'Beatriz')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('nueva-clave-123')
+            self.user.save()
+        self.assertEqual(len(self.user_queries()[1]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.phone = '+56912345678'
+            profile.save()
+        self.assertEqual(len(self.user_queries()[1]), 1)
+
+    @override_settings(AUTH_USER_CACHE=False)
+    def test_toggle_reads_fresh_rows(self):
+        self.user_queries()
+        self.assertEqual(len(self.user_queries()[1]), 1)
+
+
+class ProfileWriteCountTest(TestCase):
+    """
+    Cada endpoint escribe solo las filas y columnas que cambian
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='escritor', password='clave-segura-123', first_name='Ana')
+        token = APIClient().post('/api/users/token/', {'username': 'escritor', 'password': 'clave-segura-123'}, format='json')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.data['access']}")
+
+    def writes(self, method, url, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+
+    def test_profile_updates_write_changed_columns_only(self):
+        self.assertEqual(self.writes('patch', '/api/users/profile/', {'first_name': 'Ana', 'default_country': 'Chile'}), [])
+
+        writes = self.writes('patch', '/api/users/profile/', {'phone': '+56912345678'})
+        self.assertEqual(len(writes), 1)
+        self.assertIn('users_userprofile', writes[0])
+        self.assertNotIn('default_city', writes[0])
+
+        writes = self.writes('patch', '/api/users/profile/', {'first_name': 'Beatriz'})
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"first_name"', writes[0])
+        self.assertNotIn('"password"', writes[0])
+
+    def test_password_change_writes_one_column(self):
+        writes = self.writes('put', '/api/users/change-password/', {
+            'old_password': 'clave-segura-123', 'new_password': 'otra-clave-456', 'new_password2': 'otra-clave-456',
+        })
+        self.assertEqual(len(writes), 1)
+        self.assertIn('SET "password"', writes[0])
+        self.assertNotIn('"first_name"', writes[0])
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '5/min', 'login_username': '2/min', 'register_ip': '1/hour',
+        'password_reset_ip': '5/hour', 'password_reset_email': '1/hour',
+    },
+})
+class AuthThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        User.objects.create_user(username='victima', email='Victima@Example.com', password='pass')
+
+    def test_login_is_limited_per_username_before_hashing(self):
+        client = APIClient()
+        for _ in range(2):
+            self.assertEqual(client.post('/api/users/token/', {'username': 'victima', 'password': 'x'}).status_code, 401)
+        with mock.patch.object(PBKDF2PasswordHasher, 'verify') as verify, CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/users/token/', {'username': 'VICTIMA', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        verify.assert_not_called()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        # Otro usuario desde la misma IP aún puede intentar
+        self.assertEqual(client.post('/api/users/token/', {'username': 'otro', 'password': 'x'}).status_code, 401)
+
+    def test_register_is_limited_per_ip(self):
+        data = {'username': 'nuevo', 'email': 'nuevo@example.com', 'password': 'Clave-Segura-123',
+                'password2': 'Clave-Segura-123', 'first_name': 'N', 'last_name': 'U'}
+        self.assertEqual(self.client.post('/api/users/register/', data).status_code, 201)
+        self.assertEqual(self.client.post('/api/users/register/', dict(data, username='otro')).status_code, 429)
+
+    def test_spoofed_forwarded_for_does_not_reset_ip_limit(self):
+        data = {'username': 'nuevo', 'email': 'nuevo@example.com', 'password': 'Clave-Segura-123',
+                'password2': 'Clave-Segura-123', 'first_name': 'N', 'last_name': 'U'}
+        self.assertEqual(self.client.post('/api/users/register/', data).status_code, 201)
+        response = self.client.post(
+            '/api/users/register/', dict(data, username='otro'), HTTP_X_FORWARDED_FOR='198.51.100.7'
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_for_counts_only_trusted_proxies(self):
+        data = {'username': 'victima', 'password': 'x'}
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        rest_framework['DEFAULT_THROTTLE_RATES'] = dict(rest_framework['DEFAULT_THROTTLE_RATES'], login_username=None)
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            for spoofed in range(5):
+                response = self.client.post(
+                    '/api/users/token/', data, HTTP_X_FORWARDED_FOR=f'198.51.100.{spoofed}, 203.0.113.9'
+                )
+                self.assertEqual(response.status_code, 401)
+            response = self.client.post('/api/users/token/', data, HTTP_X_FORWARDED_FOR='198.51.100.99, 203.0.113.9')
+            self.assertEqual(response.status_code, 429)
+            response = self.client.post('/api/users/token/', data, HTTP_X_FORWARDED_FOR='203.0.113.10')
+            self.assertEqual(response.status_code, 401)
+
+    def test_reset_matches_email_case_insensitively_and_limits_per_email(self):
+        response = self.client.post('/api/users/reset-password/', {'email': 'victima@example.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OutboxEmail.objects.get(kind='password_reset').to, 'Victima@example.com')
+        response = self.client.post('/api/users/reset-password/', {'email': 'VICTIMA@example.com'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
@@ -0,0 +1,55 @@
+"""
+Límites de intentos para login, registro y recuperación de contraseña.
+
+Son throttles de DRF (ventana deslizante guardada en la caché de Django),
+así que se evalúan en `initial()`, antes de validar el serializer: un
+intento rechazado no llega a calcular ningún hash PBKDF2 ni a consultar
+la base. Cada endpoint se limita por IP y, además, por el usuario o email
+atacado, de modo que repartir intentos entre muchas IPs tampoco sirve.
+Las tasas se configuran en REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+"""
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class AuthRateThrottle(SimpleRateThrottle):
+    """
+    Base: lee la tasa en cada request (respeta override_settings) y, si
+    `field` está definido, usa ese dato del body como clave en vez de la IP.
+    """
+    field = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if self.field is None:
+            ident = self.get_ident(request)
+        else:
+            value = request.data.get(self.field) if hasattr(request.data, 'get') else None
+            if not value or not isinstance(value, str):
+                return None
+            ident = value.strip().lower()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginIPThrottle(AuthRateThrottle):
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(AuthRateThrottle):
+    scope = 'login_username'
+    field = 'username'
+
+
+class RegisterIPThrottle(AuthRateThrottle):
+    scope = 'register_ip'
+
+
+class PasswordResetIPThrottle(AuthRateThrottle):
+    scope = 'password_reset_ip'
+
+
+class PasswordResetEmailThrottle(AuthRateThrottle):
+    scope = 'password_reset_email'
+    field = 'email'
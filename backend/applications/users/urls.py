@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from .views import (
+    LoginAPIView,
     UserRegistrationAPIView,
     UserProfileViewSet,
     ChangePasswordAPIView,
@@ -16,7 +17,7 @@ router.register('addresses', AddressViewSet, basename='address')
 
 urlpatterns = [
     # Autenticación JWT
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', LoginAPIView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     # Registro
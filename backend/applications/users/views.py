@@ -6,15 +6,18 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
 
+from applications.monitoring.mixins import InstrumentedViewMixin
 from .models import UserProfile, Address
 from .serializers import (
     UserRegistrationSerializer,
@@ -23,9 +26,47 @@ from .serializers import (
     AddressSerializer,
     ChangePasswordSerializer,
     PasswordResetRequestSerializer,
-    PasswordResetConfirmSerializer
+    PasswordResetConfirmSerializer,
+    LoginSerializer
+)
+from .throttles import (
+    LoginIPThrottle,
+    LoginUsernameThrottle,
+    PasswordResetEmailThrottle,
+    PasswordResetIPThrottle,
+    RegisterIPThrottle,
 )
 from .permissions import IsOwner, IsOwnerOrAdmin
+from applications.notifications.outbox import enqueue_email
+from applications.cart.tokens import request_cart_key
+from applications.cart.utils import merge_carts
+
+@extend_schema(tags=['Users'])
+class LoginAPIView(TokenObtainPairView):
+    """
+    Login JWT. Si llega `cart_token` (o la cookie/cabecera del carrito)
+    fusiona el carrito anónimo con el del usuario.
+    POST /api/users/token/
+    """
+    serializer_class = LoginSerializer
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        data = dict(serializer.validated_data)
+        cart_key = serializer.cart_key or request_cart_key(request)
+        if cart_key:
+            _, data['cart_items_merged'] = merge_carts(serializer.user, cart_key)
+        response = Response(data, status=status.HTTP_200_OK)
+        if cart_key:
+            response.delete_cookie(settings.CART_TOKEN_COOKIE)
+        return response
+
 
 @extend_schema(tags=['Users'])
 class UserRegistrationAPIView(generics.CreateAPIView):
@@ -36,29 +77,26 @@ class UserRegistrationAPIView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [RegisterIPThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        with transaction.atomic():
+            user = serializer.save()
+            # Email de bienvenida al outbox, en la misma transacción que el usuario
+            enqueue_email(
+                user.email,
+                subject='¡Bienvenido a Home Store!',
+                body=f'Hola {user.first_name},\n\n'
+                     f'Gracias por registrarte en Home Store.\n\n'
+                     f'Tu cuenta ha sido creada exitosamente.',
+                kind='welcome',
+            )
         
         # Generar tokens JWT
         refresh = RefreshToken.for_user(user)
         
-        # Enviar email de bienvenida (opcional)
-        try:
-            send_mail(
-                subject='¡Bienvenido a Home Store!',
-                message=f'Hola {user.first_name},\n\n'
-                        f'Gracias por registrarte en Home Store.\n\n'
-                        f'Tu cuenta ha sido creada exitosamente.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
-        except:
-            pass
-        
         return Response({
             'user': {
                 'id': user.id,
@@ -76,7 +114,7 @@ class UserRegistrationAPIView(generics.CreateAPIView):
 
 
 @extend_schema(tags=['Users'])
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de perfil de usuario
     GET /api/users/profile/ - Obtener perfil
@@ -150,13 +188,13 @@ class PasswordResetRequestAPIView(generics.GenericAPIView):
     """
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [PasswordResetIPThrottle, PasswordResetEmailThrottle]
     
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        email = serializer.validated_data['email']
-        user = User.objects.get(email=email)
+        user = serializer.validated_data['user']
         
         # Generar token
         token = default_token_generator.make_token(user)
@@ -165,27 +203,21 @@ class PasswordResetRequestAPIView(generics.GenericAPIView):
         # URL de reset (ajustar según tu frontend)
         reset_url = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}/"
         
-        # Enviar email
-        try:
-            send_mail(
-                subject='Recuperación de contraseña - Home Store',
-                message=f'Hola {user.first_name},\n\n'
-                        f'Has solicitado restablecer tu contraseña.\n\n'
-                        f'Haz clic en el siguiente enlace para crear una nueva contraseña:\n'
-                        f'{reset_url}\n\n'
-                        f'Si no solicitaste esto, ignora este email.\n\n'
-                        f'El enlace expira en 24 horas.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-            return Response({
-                'message': 'Se ha enviado un email con instrucciones para restablecer tu contraseña.'
-            }, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({
-                'error': 'Error al enviar el email. Intenta nuevamente.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Encolar email (lo envía el dispatcher del outbox)
+        enqueue_email(
+            user.email,
+            subject='Recuperación de contraseña - Home Store',
+            body=f'Hola {user.first_name},\n\n'
+                 f'Has solicitado restablecer tu contraseña.\n\n'
+                 f'Haz clic en el siguiente enlace para crear una nueva contraseña:\n'
+                 f'{reset_url}\n\n'
+                 f'Si no solicitaste esto, ignora este email.\n\n'
+                 f'El enlace expira en 24 horas.',
+            kind='password_reset',
+        )
+        return Response({
+            'message': 'Se ha enviado un email con instrucciones para restablecer tu contraseña.'
+        }, status=status.HTTP_200_OK)
 
 
 @extend_schema(tags=['Users'])
@@ -220,14 +252,14 @@ class PasswordResetConfirmAPIView(generics.GenericAPIView):
         
         # Actualizar contraseña
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         
         return Response({
             'message': 'Contraseña restablecida exitosamente'
         }, status=status.HTTP_200_OK)
 
 @extend_schema(tags=['Users'])
-class AddressViewSet(viewsets.ModelViewSet):
+class AddressViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """
     CRUD completo para direcciones del usuario
     GET /api/users/addresses/ - Listar direcciones
@@ -8,6 +8,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Load environment variables from .env
 load_dotenv()
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
     'applications.orders',
     'applications.users',
     'applications.cart',
+    'applications.notifications',
+    'applications.monitoring',
 ]
 
 # ===============================
@@ -53,6 +56,8 @@ INSTALLED_APPS = [
 # ===============================
 
 MIDDLEWARE = [
+    # Primero, para medir toda la cadena (ver monitoring/middleware.py)
+    'applications.monitoring.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -72,6 +77,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 CORS_ALLOW_CREDENTIALS = True  # Permitir envío de cookies
+# Token del carrito anónimo (ver cart/tokens.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-cart-token')
+CORS_EXPOSE_HEADERS = ['X-Cart-Token']
 
 # ===============================
 # REST Framework
@@ -79,13 +87,25 @@ CORS_ALLOW_CREDENTIALS = True  # Permitir envío de cookies
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'applications.users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Proxies inversos delante de Django: la IP de los throttles se toma de
+    # X-Forwarded-For contando NUM_PROXIES desde la derecha. Con 0 se usa
+    # REMOTE_ADDR y la cabecera (que el cliente puede falsificar) se ignora
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Límites de login/registro/reset (ver users/throttles.py), en la caché default
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP', '30/min'),
+        'login_username': os.getenv('THROTTLE_LOGIN_USERNAME', '5/min'),
+        'register_ip': os.getenv('THROTTLE_REGISTER_IP', '10/hour'),
+        'password_reset_ip': os.getenv('THROTTLE_PASSWORD_RESET_IP', '10/hour'),
+        'password_reset_email': os.getenv('THROTTLE_PASSWORD_RESET_EMAIL', '3/hour'),
+    },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
@@ -94,6 +114,14 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# Caché del usuario autenticado (ver users/authentication.py); False = leer
+# siempre de la base. Con la caché LocMem por defecto (sin REDIS_URL) la
+# invalidación solo llega al proceso actual: los demás workers ven los
+# cambios (incluida una contraseña nueva) al vencer AUTH_USER_CACHE_SECONDS
+AUTH_USER_CACHE = os.getenv('AUTH_USER_CACHE', 'True') == 'True'
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', '60'))
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS', 'default')
+
 # ===============================
 # URLs / Templates / WSGI
 # ===============================
@@ -172,6 +200,138 @@ SESSION_COOKIE_DOMAIN = None  # Configurar el dominio correcto en producción
 CSRF_COOKIE_SAMESITE = 'None'
 CSRF_COOKIE_SECURE = False
 
+# ===============================
+# Inventory
+# ===============================
+
+# Número de shards por producto en modo ledger (ver products/inventory.py)
+INVENTORY_STOCK_SHARDS = int(os.getenv('INVENTORY_STOCK_SHARDS', '8'))
+
+# ===============================
+# Pricing
+# ===============================
+
+PRICING_SHIPPING_COST = os.getenv('PRICING_SHIPPING_COST', '10')
+PRICING_TAX_RATE = os.getenv('PRICING_TAX_RATE', '0.18')
+
+# TTL de la caché en memoria de cupones (endpoint validate-coupon)
+COUPON_CACHE_SECONDS = int(os.getenv('COUPON_CACHE_SECONDS', '30'))
+
+# ===============================
+# Invoices
+# ===============================
+
+# PDFs de facturas renderizados en segundo plano (ver orders/invoices.py)
+INVOICE_ROOT = Path(os.getenv('INVOICE_ROOT', BASE_DIR / 'media' / 'invoices'))
+INVOICE_WORKERS = int(os.getenv('INVOICE_WORKERS', '2'))
+INVOICE_RETRY_AFTER = int(os.getenv('INVOICE_RETRY_AFTER', '2'))
+# Segundos que un render fallido responde 503 antes de reintentarse
+INVOICE_FAILURE_TTL = int(os.getenv('INVOICE_FAILURE_TTL', '60'))
+
+# Órdenes finalizadas con más días que este horizonte se archivan (ver orders/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+
+# Días máximos que abarca una consulta de los endpoints de analytics
+ANALYTICS_MAX_DAYS = int(os.getenv('ANALYTICS_MAX_DAYS', '366'))
+
+# ===============================
+# Cache
+# ===============================
+
+# Redis en producción (REDIS_URL); caché en memoria local si no está definido
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ===============================
+# Cart
+# ===============================
+
+# Purga de carritos abandonados (ver cart/cleanup.py)
+CART_ANONYMOUS_TTL_DAYS = int(os.getenv('CART_ANONYMOUS_TTL_DAYS', '30'))
+CART_INACTIVE_TTL_DAYS = int(os.getenv('CART_INACTIVE_TTL_DAYS', '90'))
+CART_PURGE_BATCH_SIZE = int(os.getenv('CART_PURGE_BATCH_SIZE', '1000'))
+CART_PURGE_SLEEP = float(os.getenv('CART_PURGE_SLEEP', '0.1'))
+
+# Backend de los carritos anónimos (ver cart/storage.py): en caché solo
+# llegan a la base al iniciar sesión. Los carritos y sus bloqueos deben
+# verse desde todos los workers, así que sin REDIS_URL (LocMem, una caché
+# por proceso) se guardan en las tablas Cart/CartItem
+CART_ANONYMOUS_STORAGE = os.getenv('CART_ANONYMOUS_STORAGE', (
+    'applications.cart.storage.CacheCartStorage' if os.getenv('REDIS_URL')
+    else 'applications.cart.storage.DatabaseCartStorage'
+))
+CART_CACHE_ALIAS = os.getenv('CART_CACHE_ALIAS', 'default')
+# Bloqueo de escritura de los carritos en caché: TTL de la clave y espera
+# máxima antes de responder 409 (segundos)
+CART_LOCK_TIMEOUT = int(os.getenv('CART_LOCK_TIMEOUT', '5'))
+CART_LOCK_WAIT = float(os.getenv('CART_LOCK_WAIT', '2'))
+
+# Los carritos anónimos se identifican con un token firmado, sin sesión
+CART_TOKEN_COOKIE = 'cart_token'
+CART_TOKEN_HEADER = 'X-Cart-Token'
+
+# ===============================
+# Email
+# ===============================
+
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@homestore.com')
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+
+# Outbox de emails transaccionales (ver notifications/outbox.py)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '100'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_RETRY_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETRY_SECONDS', '60'))
+EMAIL_OUTBOX_MAX_RETRY_SECONDS = int(os.getenv('EMAIL_OUTBOX_MAX_RETRY_SECONDS', '3600'))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', '300'))
+
+# Alertas de wishlist: como máximo un email por usuario cada N horas
+WISHLIST_ALERT_INTERVAL_HOURS = int(os.getenv('WISHLIST_ALERT_INTERVAL_HOURS', '24'))
+WISHLIST_ALERT_BATCH_SIZE = int(os.getenv('WISHLIST_ALERT_BATCH_SIZE', '500'))
+
+# ===============================
+# Monitoring
+# ===============================
+
+# Métricas por request: cabecera Server-Timing, log estructurado e
+# histogramas en GET /api/metrics/ (solo staff)
+PERF_METRICS = os.getenv('PERF_METRICS', 'True') == 'True'
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', str(DEBUG)) == 'True'
+# Requests más lentos o con más consultas repetidas se registran como WARNING
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '500'))
+PERF_DUPLICATE_QUERY_THRESHOLD = int(os.getenv('PERF_DUPLICATE_QUERY_THRESHOLD', '10'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'applications.monitoring': {
+            'handlers': ['console'],
+            'level': os.getenv('PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # ===============================
 # Default PK Type
 # ===============================
@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/cart/', include('applications.cart.urls')),
     path('api/orders/', include('applications.orders.urls')),    
     path('api/products/', include('applications.products.urls')),
+    path('api/metrics/', include('applications.monitoring.urls')),
 
     
     # Schema (archivo OpenAPI)